@@ -9,8 +9,27 @@ https://docs.djangoproject.com/en/4.0/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "aarons_kit.settings")
 
-application = get_asgi_application()
+django.setup(set_prefix=False)
+
+
+class AsyncReadHandler(ASGIHandler):
+    """
+    Resolves requests against aarons_kit.async_urls, so the read endpoints are
+    served by their async views.
+    """
+
+    urlconf = "aarons_kit.async_urls"
+
+    def create_request(self, scope, body_file):
+        request, error_response = super().create_request(scope, body_file)
+        if request is not None:
+            request.urlconf = self.urlconf
+        return request, error_response
+
+
+application = AsyncReadHandler()
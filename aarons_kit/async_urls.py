@@ -0,0 +1,12 @@
+"""aarons_kit URL Configuration for the ASGI application
+
+The same urls as aarons_kit.urls, with the read-only api endpoints served by
+async views. See aarons_kit_api/async_urls.py.
+"""
+from django.contrib import admin
+from django.urls import include, path, re_path
+
+urlpatterns = [
+    path("admin/", admin.site.urls),
+    re_path(r"^", include("aarons_kit_api.async_urls")),
+]
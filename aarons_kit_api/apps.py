@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class AaronsKitApiConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "aarons_kit_api"
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from aarons_kit_api.metrics import install_query_recorder
+
+        connection_created.connect(install_query_recorder)
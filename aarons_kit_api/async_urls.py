@@ -0,0 +1,38 @@
+from django.urls import re_path
+
+from aarons_kit_api import urls
+from aarons_kit_api.async_views import async_read_view
+
+# read-only endpoints served by async views under ASGI. Ingest is left sync,
+# and so is export, as the ASGI handler of Django 4.0 iterates a streamed
+# response on the event loop
+READ_VIEWS = {
+    "get_ingest_job",
+    "get_available_articles",
+    "get_article_by_title",
+    "search_articles",
+    "get_articles_by_year_range",
+    "check_article_by_title",
+    "find_missing_metadata",
+    "get_articles_by_author",
+    "get_articles_from_journal",
+    "get_article_references",
+    "get_article_cited_by",
+    "check_article_by_author",
+    "get_available_journals",
+    "get_journal_catalogue",
+    "check_article_by_journal_name",
+    "get_changes",
+}
+
+urlpatterns = [
+    re_path(
+        str(pattern.pattern),
+        async_read_view(pattern.callback),
+        pattern.default_args,
+        name=pattern.name,
+    )
+    if pattern.name in READ_VIEWS
+    else pattern
+    for pattern in urls.urlpatterns
+]
@@ -0,0 +1,47 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+
+def database_sync_to_async(func):
+    """
+    Runs blocking ORM code on a worker thread, as Django 4.0 has no async
+    query interface. Unlike sync_to_async's default, calls aren't queued on
+    the one thread sync code shares, so queries for different requests run in
+    parallel. Each worker thread has its own connection, which is closed (or
+    kept for CONN_MAX_AGE) after every call the way request_finished does it
+    for sync views.
+    """
+
+    @wraps(func)
+    def inner(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(inner, thread_sensitive=False)
+
+
+def async_read_view(view):
+    """
+    Async version of a sync read-only view for the ASGI application. The view
+    queries and renders its response on a worker thread, so the event loop
+    only has to send it and a slow client doesn't hold a thread.
+    """
+
+    def render(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if hasattr(response, "render"):
+            response.render()
+        return response
+
+    run = database_sync_to_async(render)
+
+    @wraps(view)
+    async def async_view(request, *args, **kwargs):
+        return await run(request, *args, **kwargs)
+
+    return async_view
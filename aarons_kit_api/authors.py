@@ -0,0 +1,40 @@
+import re
+import unicodedata
+
+# "and" only as a whole word, so names like "Alexander" stay in one piece
+AUTHOR_SEPARATOR = re.compile(r"\s*(?:;|&|\band\b)\s*", re.IGNORECASE)
+WHITESPACE = re.compile(r"\s+")
+
+
+def parse_author_names(authors):
+    """
+    Splits a JSTOR author string such as "A. Smith, B. Jones and C. Brown" into
+    individual names. Commas only separate names when every comma separated
+    part has more than one word, so "Smith, John" stays a single name.
+    """
+    if not authors:
+        return []
+
+    names = []
+    for part in AUTHOR_SEPARATOR.split(authors):
+        part = part.strip(" ,")
+        if not part:
+            continue
+
+        pieces = [piece.strip() for piece in part.split(",")]
+        if len(pieces) > 1 and all(len(piece.split()) > 1 for piece in pieces):
+            names.extend(pieces)
+        else:
+            names.append(WHITESPACE.sub(" ", part))
+
+    return names
+
+
+def author_name_key(name):
+    """
+    Case-folded, accent-stripped, whitespace-collapsed form of an author name,
+    used to recognise the same author however the scraper spelled the name.
+    """
+    decomposed = unicodedata.normalize("NFKD", name)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return WHITESPACE.sub(" ", stripped.casefold()).strip()
@@ -0,0 +1,460 @@
+import io
+import json
+import re
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from aarons_kit_api.authors import author_name_key, parse_author_names
+from aarons_kit_api.cache import bump_catalogue_version
+from aarons_kit_api.ingest import validate_record
+
+# a whole JSON string, a bracket, or the quote of a string cut off by the end
+# of the data
+JSON_TOKEN = re.compile(rb'"(?:[^"\\]|\\.)*"|["{}\[\]]', re.DOTALL)
+
+RECORD_COLUMNS = (
+    "issn",
+    "journal",
+    "alt_issn",
+    "issue_jstor_id",
+    "year",
+    "volume",
+    "number",
+    "article_jstor_id",
+    "title",
+    "abstract",
+    "url",
+)
+AUTHOR_COLUMNS = ("article_jstor_id", "author_name", "name_key")
+
+# one row per record and one per author of a record, in file order (seq), so
+# the first record that mentions a row supplies its fields like in ingest
+CREATE_STAGING_SQL = """
+CREATE TEMPORARY TABLE IF NOT EXISTS load_records (
+    seq bigserial,
+    issn text,
+    journal text,
+    alt_issn text,
+    issue_jstor_id text,
+    year integer,
+    volume integer,
+    number integer,
+    article_jstor_id text,
+    title text,
+    abstract text,
+    url text
+);
+CREATE TEMPORARY TABLE IF NOT EXISTS load_authors (
+    seq bigserial,
+    article_jstor_id text,
+    author_name text,
+    name_key text
+);
+"""
+
+# (name of the created count, statement) run in order to merge the staging
+# tables into the catalogue
+MERGE_SQL = (
+    (
+        "journals",
+        """
+        INSERT INTO aarons_kit_api_journal (issn, "journalName", "altISSN")
+        SELECT DISTINCT ON (issn) issn, journal, alt_issn
+        FROM load_records
+        ORDER BY issn, seq
+        ON CONFLICT (issn) DO NOTHING
+        """,
+    ),
+    (
+        "issues",
+        """
+        INSERT INTO aarons_kit_api_issue
+            ("issueJstorID", year, volume, number, journal_id)
+        SELECT DISTINCT ON (record.issue_jstor_id)
+            record.issue_jstor_id,
+            record.year,
+            record.volume,
+            record.number,
+            journal."journalID"
+        FROM load_records AS record
+        JOIN aarons_kit_api_journal AS journal ON journal.issn = record.issn
+        ORDER BY record.issue_jstor_id, record.seq
+        ON CONFLICT ("issueJstorID") DO NOTHING
+        """,
+    ),
+    (
+        "authors",
+        """
+        INSERT INTO aarons_kit_api_author ("authorName", name_key)
+        SELECT DISTINCT ON (name_key) author_name, name_key
+        FROM load_authors
+        ORDER BY name_key, seq
+        ON CONFLICT (name_key) DO NOTHING
+        """,
+    ),
+    (
+        "articles",
+        # with the search vector of search.UPDATE_SEARCH_VECTORS_SQL, so new
+        # articles are written once
+        """
+        INSERT INTO aarons_kit_api_article
+            ("articleJstorID", title, abstract, url, issue_id, search_vector)
+        SELECT
+            record.article_jstor_id,
+            record.title,
+            record.abstract,
+            record.url,
+            issue."issueID",
+            setweight(to_tsvector('english', record.title), 'A')
+            || setweight(to_tsvector('english', record.abstract), 'B')
+            || setweight(to_tsvector('english', coalesce(names.names, '')), 'C')
+        FROM (
+            SELECT DISTINCT ON (article_jstor_id) *
+            FROM load_records
+            ORDER BY article_jstor_id, seq
+        ) AS record
+        JOIN aarons_kit_api_issue AS issue
+            ON issue."issueJstorID" = record.issue_jstor_id
+        LEFT JOIN (
+            SELECT
+                link.article_jstor_id,
+                string_agg(author."authorName", ' ' ORDER BY link.seq) AS names
+            FROM (
+                SELECT article_jstor_id, name_key, min(seq) AS seq
+                FROM load_authors
+                GROUP BY article_jstor_id, name_key
+            ) AS link
+            JOIN aarons_kit_api_author AS author ON author.name_key = link.name_key
+            GROUP BY link.article_jstor_id
+        ) AS names ON names.article_jstor_id = record.article_jstor_id
+        ON CONFLICT ("articleJstorID") DO NOTHING
+        """,
+    ),
+    (
+        "links",
+        """
+        INSERT INTO aarons_kit_api_article_authors (article_id, author_id)
+        SELECT article."articleID", author."authorID"
+        FROM (
+            SELECT article_jstor_id, name_key, min(seq) AS seq
+            FROM load_authors
+            GROUP BY article_jstor_id, name_key
+        ) AS link
+        JOIN aarons_kit_api_article AS article
+            ON article."articleJstorID" = link.article_jstor_id
+        JOIN aarons_kit_api_author AS author ON author.name_key = link.name_key
+        ORDER BY link.seq
+        ON CONFLICT DO NOTHING
+        """,
+    ),
+)
+
+# the staged issues were just scraped, like those ingest stores (see
+# scraping.record_scraped), so they aren't due again until the scrape goes stale
+RECORD_SCRAPED_SQL = """
+INSERT INTO aarons_kit_api_issuescrape (issue_id, due, owner, scraped)
+SELECT issue."issueID", now() + make_interval(secs => %s), '', now()
+FROM (SELECT DISTINCT issue_jstor_id FROM load_records) AS record
+JOIN aarons_kit_api_issue AS issue ON issue."issueJstorID" = record.issue_jstor_id
+ORDER BY issue."issueID"
+ON CONFLICT (issue_id) DO NOTHING
+"""
+
+# as search.UPDATE_SEARCH_VECTORS_SQL, in one join, for the staged articles
+# that existed before the batch and may have gained authors
+UPDATE_SEARCH_VECTORS_SQL = """
+UPDATE aarons_kit_api_article AS article
+SET search_vector =
+    setweight(to_tsvector('english', article.title), 'A')
+    || setweight(to_tsvector('english', article.abstract), 'B')
+    || setweight(to_tsvector('english', coalesce(staged.names, '')), 'C')
+FROM (
+    SELECT article."articleID", string_agg(author."authorName", ' ') AS names
+    FROM (SELECT DISTINCT article_jstor_id FROM load_records) AS record
+    JOIN aarons_kit_api_article AS article
+        ON article."articleJstorID" = record.article_jstor_id
+    LEFT JOIN aarons_kit_api_article_authors AS article_author
+        ON article_author.article_id = article."articleID"
+    LEFT JOIN aarons_kit_api_author AS author
+        ON author."authorID" = article_author.author_id
+    WHERE article."articleID" <= %s
+    GROUP BY article."articleID"
+) AS staged
+WHERE article."articleID" = staged."articleID"
+"""
+
+# autovacuum never analyzes temporary tables and lags behind a bulk load, so
+# without fresh statistics the merge joins are planned for far fewer rows
+ANALYZE_STAGING_SQL = "ANALYZE load_records, load_authors"
+ANALYZE_CATALOGUE_SQL = """
+ANALYZE aarons_kit_api_journal, aarons_kit_api_issue, aarons_kit_api_article,
+    aarons_kit_api_author, aarons_kit_api_article_authors
+"""
+
+
+def json_elements(data):
+    """
+    Yields the start and end of every complete top-level object or array in
+    data, a piece of the inside of a JSON array, skipping over strings so
+    brackets in them don't count.
+    """
+    level = 0
+    start = 0
+    for match in JSON_TOKEN.finditer(data):
+        token = match.group()
+        if token[0] == ord('"'):
+            if len(token) == 1:
+                return
+        elif token in (b"{", b"["):
+            if level == 0:
+                start = match.start()
+            level += 1
+        else:
+            level -= 1
+            if level == 0:
+                yield start, match.end()
+
+
+def json_boundary(data):
+    end = 0
+    for _, end in json_elements(data):
+        pass
+    return end
+
+
+def ndjson_boundary(data):
+    return data.rfind(b"\n") + 1
+
+
+def detect_format(f):
+    """
+    Returns where the records of a file start and whether it holds a JSON
+    array of records rather than NDJSON.
+    """
+    f.seek(0)
+    offset = 0
+    while block := f.read(1024):
+        content = block.lstrip()
+        if content:
+            if content.startswith(b"["):
+                return offset + len(block) - len(content) + 1, True
+            break
+        offset += len(block)
+    return 0, False
+
+
+def read_chunks(f, offset, chunk_bytes, is_json):
+    """
+    Yields (offset, data) pieces of about chunk_bytes read from offset that
+    hold whole records only.
+    """
+    boundary = json_boundary if is_json else ndjson_boundary
+    f.seek(offset)
+    tail = b""
+    while True:
+        block = f.read(chunk_bytes)
+        data = tail + block
+        if not block:
+            # a last line without a newline, or whatever follows the last
+            # record of an array, which is rejected if it isn't its end
+            if data.strip(b" \t\r\n,]"):
+                yield offset, data
+            return
+
+        end = boundary(data)
+        if end:
+            yield offset, data[:end]
+            offset += end
+        tail = data[end:]
+
+
+def split_records(offset, data, is_json):
+    """
+    Yields the file offset and bytes of every record of a chunk.
+    """
+    if is_json:
+        elements = list(json_elements(data))
+        for start, end in elements:
+            yield offset + start, data[start:end]
+        # a chunk without any complete element is the malformed end of a file
+        if not elements:
+            yield offset, data
+        return
+
+    for line in data.splitlines(keepends=True):
+        if line.strip():
+            yield offset, line
+        offset += len(line)
+
+
+def copy_value(value):
+    """
+    Escapes a value for the COPY text format.
+    """
+    if value is None:
+        return "\\N"
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def copy_row(values):
+    return "\t".join(map(copy_value, values)) + "\n"
+
+
+def parse_chunk(task):
+    """
+    Parses and validates the records of a chunk into COPY rows for the
+    staging tables. Runs in the worker processes of load_file.
+    """
+    offset, data, is_json = task
+    records = []
+    authors = []
+    rejected = []
+
+    for position, raw in split_records(offset, data, is_json):
+        try:
+            metadata = json.loads(raw)
+            validate_record(metadata)
+        except ValueError as e:
+            rejected.append({"offset": position, "error": str(e)})
+            continue
+
+        records.append(
+            copy_row(
+                (
+                    metadata["issn"],
+                    metadata["journal"],
+                    metadata.get("altISSN") or "",
+                    metadata["issueJstorID"],
+                    int(metadata["year"]),
+                    int(metadata["volume"]),
+                    int(metadata["number"]),
+                    metadata["articleJstorID"],
+                    metadata["title"],
+                    metadata.get("abstract") or "",
+                    metadata.get("url") or "",
+                )
+            )
+        )
+        for name in parse_author_names(metadata.get("authors")):
+            authors.append(
+                copy_row((metadata["articleJstorID"], name, author_name_key(name)))
+            )
+
+    return (
+        offset + len(data),
+        len(records),
+        "".join(records),
+        "".join(authors),
+        rejected,
+    )
+
+
+def copy_staging(records, authors):
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            "COPY load_records (%s) FROM STDIN" % ", ".join(RECORD_COLUMNS),
+            io.StringIO(records),
+        )
+        cursor.copy_expert(
+            "COPY load_authors (%s) FROM STDIN" % ", ".join(AUTHOR_COLUMNS),
+            io.StringIO(authors),
+        )
+
+
+def merge_staging():
+    """
+    Inserts the staged records into the catalogue and empties the staging
+    tables. Returns the number of rows created per table.
+    """
+    created = {}
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(ANALYZE_STAGING_SQL)
+            cursor.execute('SELECT max("articleID") FROM aarons_kit_api_article')
+            [last_article_id] = cursor.fetchone()
+
+            for name, sql in MERGE_SQL:
+                cursor.execute(sql)
+                created[name] = cursor.rowcount
+            cursor.execute(RECORD_SCRAPED_SQL, [settings.SCRAPE_STALE_SECONDS])
+
+            cursor.execute(ANALYZE_CATALOGUE_SQL)
+            if last_article_id is not None:
+                cursor.execute(UPDATE_SEARCH_VECTORS_SQL, [last_article_id])
+
+            cursor.execute("TRUNCATE load_records, load_authors")
+
+        transaction.on_commit(bump_catalogue_version)
+
+    return created
+
+
+def load_file(f, offset, batch_size, chunk_bytes, map_chunks=map, on_batch=None):
+    """
+    Loads the JSON array or NDJSON metadata records of the binary file f from
+    offset, or from its first record. Chunks of records are
+    parsed through map_chunks, e.g. the imap of a process pool, and COPY'd into
+    staging tables that are merged into the catalogue and committed every
+    batch_size records.
+
+    After every commit on_batch is called with the offset of the first record
+    not yet loaded, to resume from, and the totals so far. Returns the totals.
+    Journal statistics aren't updated, see load_metadata.
+    """
+    start, is_json = detect_format(f)
+    if offset is None or offset < start:
+        offset = start
+
+    totals = {
+        "records": 0,
+        "rejected": [],
+        "journals": 0,
+        "issues": 0,
+        "articles": 0,
+        "authors": 0,
+        "links": 0,
+    }
+
+    with connection.cursor() as cursor:
+        cursor.execute(CREATE_STAGING_SQL)
+
+    try:
+        staged = 0
+        chunks = (
+            (chunk_offset, data, is_json)
+            for chunk_offset, data in read_chunks(f, offset, chunk_bytes, is_json)
+        )
+        for end, count, records, authors, rejected in map_chunks(parse_chunk, chunks):
+            copy_staging(records, authors)
+            staged += count
+            totals["rejected"].extend(rejected)
+            offset = end
+
+            if staged >= batch_size:
+                _commit(totals, staged)
+                staged = 0
+                if on_batch:
+                    on_batch(offset, totals)
+
+        if staged:
+            _commit(totals, staged)
+        if on_batch:
+            on_batch(offset, totals)
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TABLE IF EXISTS load_records, load_authors")
+
+    return totals
+
+
+def _commit(totals, staged):
+    for name, count in merge_staging().items():
+        totals[name] += count
+    totals["records"] += staged
@@ -0,0 +1,169 @@
+import hashlib
+import time
+from functools import partial, wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from aarons_kit_api.compression import (
+    cached_encodings,
+    compress_cached,
+    preferred_encoding,
+)
+
+CATALOGUE_VERSION_KEY = "catalogue:version"
+CATALOGUE_MODIFIED_KEY = "catalogue:modified"
+CITATIONS_VERSION_KEY = "citations:version"
+CITATIONS_MODIFIED_KEY = "citations:modified"
+
+
+def _get_version(version_key, modified_key):
+    values = cache.get_many([version_key, modified_key])
+    if version_key in values and modified_key in values:
+        return values[version_key], values[modified_key]
+
+    now = time.time()
+    cache.add(version_key, int(now * 1000), None)
+    cache.add(modified_key, now, None)
+    return cache.get(version_key), cache.get(modified_key)
+
+
+def _bump_version(version_key, modified_key):
+    try:
+        cache.incr(version_key)
+    except ValueError:
+        _get_version(version_key, modified_key)
+    cache.set(modified_key, time.time(), None)
+
+
+def get_catalogue_version():
+    """
+    Returns the catalogue version and the time it last changed. Versions start
+    from the current time in milliseconds, so a flushed cache never hands out
+    a version (and ETags) it used before.
+    """
+    return _get_version(CATALOGUE_VERSION_KEY, CATALOGUE_MODIFIED_KEY)
+
+
+def bump_catalogue_version():
+    """
+    Invalidates every cached response. Ingest calls this once its batch has
+    been committed.
+    """
+    _bump_version(CATALOGUE_VERSION_KEY, CATALOGUE_MODIFIED_KEY)
+
+
+def get_citations_version():
+    """
+    Returns the version and modification time of responses that list
+    citations, which change with the catalogue or the citations.
+    """
+    version, modified = get_catalogue_version()
+    citations_version, citations_modified = _get_version(
+        CITATIONS_VERSION_KEY, CITATIONS_MODIFIED_KEY
+    )
+    return "%s.%s" % (version, citations_version), max(modified, citations_modified)
+
+
+def bump_citations_version():
+    """
+    Invalidates the cached responses that list citations only, so extracting
+    references doesn't flush the rest of the cache article by article.
+    """
+    _bump_version(CITATIONS_VERSION_KEY, CITATIONS_MODIFIED_KEY)
+
+
+def last_modified():
+    """
+    Returns when the catalogue or the citations last changed.
+    """
+    values = cache.get_many([CATALOGUE_MODIFIED_KEY, CITATIONS_MODIFIED_KEY])
+    if CATALOGUE_MODIFIED_KEY not in values:
+        _, values[CATALOGUE_MODIFIED_KEY] = get_catalogue_version()
+    return max(values.values())
+
+
+def cache_response(view=None, *, get_version=get_catalogue_version):
+    """
+    Caches the rendered responses of a read-only view under its host, path,
+    query parameters, Accept header and the catalogue version, or the one
+    get_version returns with its modification time (None to send no
+    Last-Modified), and answers conditional GETs from the version alone:
+    by ETag only, as Last-Modified has whole seconds and versions change more
+    often, so If-Modified-Since could match a later version.
+    Each encoding of a response is compressed the first time a client asks
+    for it and cached alongside, so clients that accept gzip or brotli are
+    served without compressing on every request.
+    """
+    if view is None:
+        return partial(cache_response, get_version=get_version)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method != "GET":
+            return view(request, *args, **kwargs)
+
+        version, modified = get_version()
+        key = hashlib.sha1(
+            "\n".join(
+                [
+                    str(version),
+                    # paginated bodies link to the host and scheme they were
+                    # requested on
+                    request.scheme,
+                    request.get_host(),
+                    request.path,
+                    "&".join(sorted(request.GET.urlencode().split("&"))),
+                    request.META.get("HTTP_ACCEPT", ""),
+                ]
+            ).encode()
+        ).hexdigest()
+        etag = quote_etag(key)
+        last_modified = None if modified is None else int(modified)
+
+        response = get_conditional_response(request, etag=etag)
+        if response is not None:
+            return response
+
+        cached = cache.get("response:%s" % key)
+        changed = cached is None
+        if cached is not None:
+            response = HttpResponse(cached["content"], content_type=cached["type"])
+        else:
+            response = view(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+
+            if hasattr(response, "render"):
+                response.render()
+            cached = {
+                "content": response.content,
+                "type": response["Content-Type"],
+                "encoded": {},
+            }
+
+        encoded = cached["encoded"]
+        encoding = preferred_encoding(request, cached_encodings(cached["content"]))
+        if encoding is not None and encoding not in encoded:
+            # None when compressing doesn't pay, so it isn't tried again
+            encoded[encoding] = compress_cached(cached["content"], encoding)
+            changed = True
+        if changed:
+            cache.set("response:%s" % key, cached, settings.RESPONSE_CACHE_TIMEOUT)
+
+        if encoding is not None and encoded[encoding] is not None:
+            response.content = encoded[encoding]
+            response["Content-Length"] = str(len(response.content))
+            response["Content-Encoding"] = encoding
+            etag = "W/" + etag
+
+        response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(last_modified)
+        patch_vary_headers(response, ["Accept", "Accept-Encoding"])
+        return response
+
+    return wrapper
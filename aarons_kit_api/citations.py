@@ -0,0 +1,116 @@
+import hashlib
+import re
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import Count, Min
+
+from aarons_kit_api.cache import bump_citations_version
+from aarons_kit_api.models import Article, Citation, ReferenceExtraction
+
+try:
+    from refextract import extract_references_from_file
+except ImportError:
+    extract_references_from_file = None
+
+# JSTOR stable URLs and DOIs both end in the article's JSTOR id
+JSTOR_ID = re.compile(r"(?:jstor\.org/stable/|10\.2307/)(\d+)", re.IGNORECASE)
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def extract_references(path):
+    if extract_references_from_file is None:
+        raise ImproperlyConfigured("Extracting references requires refextract")
+    return extract_references_from_file(path)
+
+
+def cached_references(path):
+    """
+    Returns the references refextract finds in a PDF, and whether they were
+    extracted from a file with the same content before.
+    """
+    sha256 = file_sha256(path)
+    extraction = ReferenceExtraction.objects.filter(sha256=sha256).first()
+    if extraction is not None:
+        return extraction.references, True
+
+    references = extract_references(path)
+    # another worker may have extracted the same file in the meantime
+    ReferenceExtraction.objects.bulk_create(
+        [ReferenceExtraction(sha256=sha256, references=references)],
+        ignore_conflicts=True,
+    )
+    return references, False
+
+
+def resolve_references(references):
+    """
+    Returns the ids of the stored articles refextract references point to:
+    by the JSTOR id in their URL, DOI or text, or else by a title that only
+    one stored article has.
+    """
+    jstor_ids = set()
+    titles = set()
+    for reference in references:
+        found = set()
+        for field in ("url", "doi", "raw_ref"):
+            for value in reference.get(field, []):
+                found.update(JSTOR_ID.findall(value))
+
+        if found:
+            jstor_ids.update(found)
+        else:
+            titles.update(
+                " ".join(title.split()).rstrip(".,;")
+                for title in reference.get("title", [])
+            )
+
+    cited = set(
+        Article.objects.filter(articleJstorID__in=jstor_ids).values_list(
+            "articleID", flat=True
+        )
+    )
+    if titles:
+        cited.update(
+            Article.objects.filter(title__in=titles)
+            .values("title")
+            .annotate(articles=Count("articleID"), article=Min("articleID"))
+            .filter(articles=1)
+            .values_list("article", flat=True)
+        )
+    return cited
+
+
+def store_citations(article_id, cited):
+    """
+    Replaces the citations of an article with the given cited article ids and
+    returns how many there are.
+    """
+    cited = set(cited) - {article_id}
+
+    with transaction.atomic():
+        stored = set(
+            Citation.objects.filter(citing_id=article_id).values_list(
+                "cited_id", flat=True
+            )
+        )
+        if stored == cited:
+            return len(cited)
+
+        Citation.objects.filter(
+            citing_id=article_id, cited_id__in=stored - cited
+        ).delete()
+        Citation.objects.bulk_create(
+            [Citation(citing_id=article_id, cited_id=pk) for pk in cited - stored],
+            ignore_conflicts=True,
+        )
+        transaction.on_commit(bump_citations_version)
+
+    return len(cited)
@@ -0,0 +1,127 @@
+import re
+
+from asgiref.sync import sync_to_async
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# responses shorter than this aren't worth compressing
+MIN_COMPRESS_LENGTH = 200
+
+# cached payloads are compressed once per catalogue version and encoding, when
+# first asked for in it, so they can afford a slower setting than responses
+# compressed on every request. Above 9 brotli
+# gets an order of magnitude slower for a few percent
+PRECOMPRESS_BROTLI_QUALITY = 9
+BROTLI_QUALITY = 5
+
+re_q_zero = re.compile(r"\bq\s*=\s*0(\.0*)?\s*$")
+
+
+def accepted_encodings(request):
+    """
+    Returns the content codings the client accepts and those it refuses, sent
+    with q=0.
+    """
+    accepted = set()
+    refused = set()
+    for coding in request.META.get("HTTP_ACCEPT_ENCODING", "").split(","):
+        name, _, params = coding.partition(";")
+        name = name.strip().lower()
+        if name:
+            (refused if re_q_zero.search(params) else accepted).add(name)
+    return accepted, refused
+
+
+def preferred_encoding(request, available):
+    """
+    Picks brotli over gzip from the available encodings the client accepts,
+    by name or through "*" when it doesn't refuse them by name, or None to
+    send the response uncompressed.
+    """
+    accepted, refused = accepted_encodings(request)
+    for encoding in ("br", "gzip"):
+        if encoding in available and (
+            encoding in accepted or ("*" in accepted and encoding not in refused)
+        ):
+            return encoding
+    return None
+
+
+def cached_encodings(content):
+    """
+    Returns the encodings a cached response can be sent in besides identity.
+    """
+    if len(content) < MIN_COMPRESS_LENGTH:
+        return ()
+    if brotli is None:
+        return ("gzip",)
+    return ("br", "gzip")
+
+
+def compress_cached(content, encoding):
+    """
+    Returns the content of a cached response compressed with encoding, or None
+    when that wouldn't make it smaller.
+    """
+    if encoding == "br":
+        compressed = brotli.compress(content, quality=PRECOMPRESS_BROTLI_QUALITY)
+    else:
+        compressed = compress_string(content)
+    return compressed if len(compressed) < len(content) else None
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Compresses responses with brotli, when the optional brotli package is
+    installed and the client accepts it, and with gzip otherwise. Responses
+    that already carry a Content-Encoding, like compressed cached ones, are
+    passed through.
+    """
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        # compressing only touches the response, so unlike MiddlewareMixin it
+        # doesn't need to queue for the thread that sync code shares
+        return await sync_to_async(self.process_response, thread_sensitive=False)(
+            request, response
+        )
+
+    def process_response(self, request, response):
+        if response.has_header("Content-Encoding") or (
+            not response.streaming and len(response.content) < MIN_COMPRESS_LENGTH
+        ):
+            return response
+
+        available = ("br", "gzip")
+        if brotli is None or response.streaming:
+            available = ("gzip",)
+
+        # GZipMiddleware doesn't honour q=0, so only hand over to it for gzip
+        encoding = preferred_encoding(request, available)
+        if encoding == "gzip":
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        if encoding is None:
+            return response
+
+        compressed_content = brotli.compress(response.content, quality=BROTLI_QUALITY)
+        if len(compressed_content) >= len(response.content):
+            return response
+
+        response.content = compressed_content
+        response.headers["Content-Length"] = str(len(response.content))
+
+        # the compressed body is not byte-for-byte the uncompressed one
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = "br"
+
+        return response
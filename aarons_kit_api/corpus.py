@@ -0,0 +1,97 @@
+import random
+
+GIVEN_NAMES = """
+Ada Alan Amara Bongani Carla Chen Daniel Elena Fatima George Hannah
+Ibrahim Ivan Jane Kofi Lena Lindiwe Mark Mei Naledi Omar Priya Rosa
+Sipho Thandi Tomas Usha Victor Wei Yusuf
+""".split()
+
+# two letters each so every index spells a different surname
+SYLLABLES = """
+ba de fi go ka lu me ni po ru sa te vi zo ha mo
+""".split()
+
+WORDS = """
+abundance adaptation agriculture analysis ancient archive behaviour
+biology century change climate colonial community comparative
+conservation culture development dispersal ecology economic education
+empire english evidence evolution field forest genetics growth health
+history identity labour landscape language law literature market
+medieval method migration modern mystics nature network notes policy
+political population power reform religion review river rural science
+social society soil species state structure study survey theory trade
+urban variation war water women writing
+""".split()
+
+FIRST_YEAR = 1900
+YEARS = 120
+ISSUES_PER_VOLUME = 4
+
+
+def author_name(index):
+    """
+    Returns a distinct, parseable author name for every index.
+    """
+    given = GIVEN_NAMES[index % len(GIVEN_NAMES)]
+    index //= len(GIVEN_NAMES)
+
+    syllables = []
+    while index or len(syllables) < 2:
+        index, digit = divmod(index, len(SYLLABLES))
+        syllables.append(SYLLABLES[digit])
+
+    return "%s %s" % (given, "".join(syllables).capitalize())
+
+
+def _words(rng, low, high):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+
+def generate_corpus(
+    articles,
+    journals=50,
+    issues=1000,
+    authors=None,
+    authors_per_article=3,
+    seed=0,
+):
+    """
+    Yields store_metadata records for a synthetic JSTOR-like corpus.
+
+    Articles are spread evenly over the issues and the issues over the
+    journals, with volumes, numbers and years counting up within each
+    journal. Authors come from a pool of distinct names (half the number of
+    articles by default) drawn with a skew towards the start of the pool, so
+    a few prolific authors appear on many articles. A smaller pool means more
+    overlap. The same arguments always yield the same records.
+    """
+    rng = random.Random(seed)
+    journals = max(1, min(journals, articles))
+    issues = max(journals, min(issues, articles))
+    authors = max(1, authors or articles // 2)
+
+    for i in range(articles):
+        issue = i * issues // articles
+        journal = issue % journals
+        position = issue // journals
+
+        names = {
+            author_name(int(authors * rng.random() ** 2))
+            for _ in range(rng.randint(1, authors_per_article))
+        }
+
+        yield {
+            "issn": "9%07d" % journal,
+            "altISSN": "",
+            "journal": "Journal of %s %d"
+            % (WORDS[journal % len(WORDS)].title(), journal),
+            "issueJstorID": str(10**7 + issue),
+            "year": str(FIRST_YEAR + position // ISSUES_PER_VOLUME % YEARS),
+            "volume": str(position // ISSUES_PER_VOLUME + 1),
+            "number": str(position % ISSUES_PER_VOLUME + 1),
+            "articleJstorID": str(10**8 + i),
+            "title": _words(rng, 4, 12).capitalize(),
+            "abstract": _words(rng, 40, 200).capitalize() + ".",
+            "url": "https://www.jstor.org/stable/%d" % (10**8 + i),
+            "authors": " and ".join(sorted(names)),
+        }
@@ -0,0 +1,75 @@
+import json
+from collections import defaultdict
+
+from aarons_kit_api.models import Article
+
+# same fields as ArticleSerializer, read straight from the table
+ARTICLE_FIELDS = (
+    ("articleID", "articleID"),
+    ("issue", "issue_id"),
+    ("articleJstorID", "articleJstorID"),
+    ("title", "title"),
+    ("abstract", "abstract"),
+    ("url", "url"),
+)
+
+
+def iter_articles(chunk_size, articles=None):
+    """
+    Yields every article, or those in the articles queryset, as a dict shaped
+    like ArticleSerializer output.
+
+    Rows are read through a server-side cursor chunk_size at a time and the
+    authors of each chunk are fetched with one query, so memory is bounded by
+    the chunk size rather than the size of the table.
+    """
+    if articles is None:
+        articles = Article.objects.all()
+
+    rows = (
+        articles.order_by("articleID")
+        .values_list(*(column for _, column in ARTICLE_FIELDS))
+        .iterator(chunk_size=chunk_size)
+    )
+
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield from _with_authors(chunk)
+            chunk = []
+
+    if chunk:
+        yield from _with_authors(chunk)
+
+
+def _with_authors(chunk):
+    ArticleAuthor = Article.authors.through
+    links = (
+        ArticleAuthor.objects.filter(article_id__in=[row[0] for row in chunk])
+        .order_by("pk")
+        .values_list("article_id", "author_id", "author__authorName")
+    )
+
+    authors = defaultdict(list)
+    for article_id, author_id, author_name in links:
+        authors[article_id].append({"authorID": author_id, "authorName": author_name})
+
+    for row in chunk:
+        article = {name: value for (name, _), value in zip(ARTICLE_FIELDS, row)}
+        article["authors"] = authors[article["articleID"]]
+        yield article
+
+
+def render_ndjson(articles):
+    for article in articles:
+        yield json.dumps(article) + "\n"
+
+
+def render_json(articles):
+    separator = "["
+    for article in articles:
+        yield separator + json.dumps(article)
+        separator = ","
+
+    yield "[]" if separator == "[" else "]"
@@ -0,0 +1,34 @@
+from rest_framework.exceptions import ValidationError
+
+
+def get_int_param(params, name):
+    value = params.get(name)
+    if value in (None, ""):
+        return None
+
+    try:
+        return int(value)
+    except ValueError:
+        raise ValidationError({name: "must be an integer"})
+
+
+def filter_articles(queryset, params):
+    """
+    Narrows an Article queryset by the year_from, year_to, journal (ID) and
+    issn query parameters. Any combination of them can be given.
+    """
+    year_from = get_int_param(params, "year_from")
+    year_to = get_int_param(params, "year_to")
+    journal = get_int_param(params, "journal")
+    issn = params.get("issn")
+
+    if year_from is not None:
+        queryset = queryset.filter(issue__year__gte=year_from)
+    if year_to is not None:
+        queryset = queryset.filter(issue__year__lte=year_to)
+    if journal is not None:
+        queryset = queryset.filter(issue__journal_id=journal)
+    if issn:
+        queryset = queryset.filter(issue__journal__issn=issn)
+
+    return queryset
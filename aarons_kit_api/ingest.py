@@ -0,0 +1,284 @@
+import json
+
+from django.db import transaction
+
+from aarons_kit_api.authors import author_name_key, parse_author_names
+from aarons_kit_api.cache import bump_catalogue_version
+from aarons_kit_api.models import (
+    Journal,
+    Issue,
+    Article,
+    Author,
+)
+from aarons_kit_api.scraping import record_scraped
+from aarons_kit_api.search import update_search_vectors
+from aarons_kit_api.statistics import update_journal_statistics
+
+
+# record field -> (model, model field) used to validate incoming metadata
+REQUIRED_FIELDS = {
+    "issn": (Journal, "issn"),
+    "journal": (Journal, "journalName"),
+    "issueJstorID": (Issue, "issueJstorID"),
+    "year": (Issue, "year"),
+    "volume": (Issue, "volume"),
+    "number": (Issue, "number"),
+    "articleJstorID": (Article, "articleJstorID"),
+    "title": (Article, "title"),
+}
+OPTIONAL_FIELDS = {
+    "altISSN": (Journal, "altISSN"),
+    "abstract": (Article, "abstract"),
+    "url": (Article, "url"),
+    "authors": (Author, "authorName"),
+}
+
+
+def validate_record(metadata):
+    """
+    Raises ValueError when a metadata record can't be stored, so a single bad
+    record can be rejected without failing the rest of its batch.
+    """
+    if not isinstance(metadata, dict):
+        raise ValueError("record must be a JSON object")
+
+    for key, (model, field_name) in {**REQUIRED_FIELDS, **OPTIONAL_FIELDS}.items():
+        value = metadata.get(key)
+        if value is None:
+            if key in REQUIRED_FIELDS:
+                raise ValueError("missing field '%s'" % key)
+            continue
+
+        field = model._meta.get_field(field_name)
+        if field.get_internal_type() == "IntegerField":
+            try:
+                int(value)
+            except (TypeError, ValueError):
+                raise ValueError("field '%s' must be an integer" % key)
+            continue
+
+        if not isinstance(value, str):
+            raise ValueError("field '%s' must be a string" % key)
+
+        values = [value]
+        if key == "authors":
+            names = parse_author_names(value)
+            values = names + [author_name_key(name) for name in names]
+        if field.max_length and any(len(v) > field.max_length for v in values):
+            raise ValueError(
+                "field '%s' is longer than %d characters" % (key, field.max_length)
+            )
+
+
+def ingest_metadata(records):
+    """
+    Stores a batch of scraped article metadata records.
+
+    Journals, issues, articles and authors are deduplicated in memory, existing
+    rows are resolved with one IN lookup per model on their unique natural key
+    and the missing ones are inserted with ON CONFLICT DO NOTHING, so the number
+    of queries stays the same no matter how many records are in the batch and
+    concurrent ingests of the same rows don't create duplicates. The first
+    record that mentions a journal, issue or article supplies its fields, like
+    get_or_create would.
+
+    Created counts are the rows this batch tried to insert, so they can include
+    rows a concurrent ingest inserted first.
+    """
+    records = list(records)
+
+    journals_metadata = {}
+    issues_metadata = {}
+    articles_metadata = {}
+    author_names = {}
+    article_authors = {}
+
+    for metadata in records:
+        journals_metadata.setdefault(metadata["issn"], metadata)
+        issues_metadata.setdefault(metadata["issueJstorID"], metadata)
+        articles_metadata.setdefault(metadata["articleJstorID"], metadata)
+
+        keys = article_authors.setdefault(metadata["articleJstorID"], {})
+        for name in parse_author_names(metadata.get("authors")):
+            key = author_name_key(name)
+            author_names.setdefault(key, name)
+            keys.setdefault(key)
+
+    counts = {
+        "records": len(records),
+        "journals": 0,
+        "issues": 0,
+        "articles": 0,
+        "authors": 0,
+    }
+
+    with transaction.atomic():
+        # store journals
+        journals = _lookup_existing(Journal, "issn", journals_metadata)
+        new_journals = [
+            Journal(
+                issn=issn,
+                journalName=metadata["journal"],
+                altISSN=metadata.get("altISSN", ""),
+            )
+            for issn, metadata in journals_metadata.items()
+            if issn not in journals
+        ]
+        journals.update(_insert_missing(Journal, "issn", new_journals))
+        counts["journals"] = len(new_journals)
+
+        # store issues
+        issues = _lookup_existing(Issue, "issueJstorID", issues_metadata)
+        new_issues = [
+            Issue(
+                journal=journals[metadata["issn"]],
+                issueJstorID=issue_jstor_id,
+                volume=metadata["volume"],
+                number=metadata["number"],
+                year=metadata["year"],
+            )
+            for issue_jstor_id, metadata in issues_metadata.items()
+            if issue_jstor_id not in issues
+        ]
+        issues.update(_insert_missing(Issue, "issueJstorID", new_issues))
+        counts["issues"] = len(new_issues)
+        # they come from a scrape, so aren't due to be scraped again yet
+        record_scraped(issues[issue.issueJstorID].pk for issue in new_issues)
+
+        # store articles
+        articles = _lookup_existing(Article, "articleJstorID", articles_metadata)
+        new_articles = [
+            Article(
+                issue=issues[metadata["issueJstorID"]],
+                articleJstorID=article_jstor_id,
+                title=metadata["title"],
+                abstract=metadata.get("abstract", ""),
+                url=metadata.get("url", ""),
+            )
+            for article_jstor_id, metadata in articles_metadata.items()
+            if article_jstor_id not in articles
+        ]
+        articles.update(_insert_missing(Article, "articleJstorID", new_articles))
+        counts["articles"] = len(new_articles)
+
+        # store authors
+        authors = _lookup_existing(Author, "name_key", author_names)
+        new_authors = [
+            Author(authorName=name, name_key=key)
+            for key, name in author_names.items()
+            if key not in authors
+        ]
+        authors.update(_insert_missing(Author, "name_key", new_authors))
+        counts["authors"] = len(new_authors)
+
+        # link authors to articles, skipping links that already exist
+        ArticleAuthor = Article.authors.through
+        links = {
+            (articles[article_jstor_id].pk, authors[key].pk): article_jstor_id
+            for article_jstor_id, keys in article_authors.items()
+            for key in keys
+        }
+        for link in ArticleAuthor.objects.filter(
+            article_id__in=[article.pk for article in articles.values()]
+        ).values_list("article_id", "author_id"):
+            links.pop(link, None)
+        # in key order too, see _insert_missing
+        ArticleAuthor.objects.bulk_create(
+            [
+                ArticleAuthor(article_id=article_id, author_id=author_id)
+                for article_id, author_id in sorted(links)
+            ],
+            ignore_conflicts=True,
+        )
+
+        update_search_vectors(article.pk for article in articles.values())
+
+        # only journals this batch added to need recounting, so re-sent
+        # records don't count their journals again
+        changed_issues = {issue.issueJstorID for issue in new_issues}
+        changed_issues.update(article.issue.issueJstorID for article in new_articles)
+        changed_issues.update(
+            articles_metadata[article_jstor_id]["issueJstorID"]
+            for article_jstor_id in links.values()
+        )
+        update_journal_statistics(
+            issues[issue_jstor_id].journal_id for issue_jstor_id in changed_issues
+        )
+
+        transaction.on_commit(bump_catalogue_version)
+
+    return counts
+
+
+def _lookup_existing(model, field_name, keys):
+    if not keys:
+        return {}
+
+    return model.objects.in_bulk(list(keys), field_name=field_name)
+
+
+def _insert_missing(model, field_name, objects):
+    """
+    Inserts objects with ON CONFLICT DO NOTHING and reads them back by their
+    natural key, picking up rows another worker inserted in the meantime.
+
+    Rows are inserted in natural key order, so concurrent batches that share
+    keys wait for each other's in the same order instead of deadlocking.
+    """
+    if not objects:
+        return {}
+
+    objects = sorted(objects, key=lambda obj: getattr(obj, field_name))
+    model.objects.bulk_create(objects, ignore_conflicts=True)
+    return _lookup_existing(
+        model, field_name, [getattr(obj, field_name) for obj in objects]
+    )
+
+
+def ingest_records(records, batch_size, parse=None, on_batch=None):
+    """
+    Stores (position, record) pairs, committing every batch_size valid records
+    so only the current batch is held in memory. Records that can't be parsed
+    or validated are rejected by position instead of failing the rest.
+    Returns the counts for every committed batch and the rejected records.
+    """
+    batches = []
+    rejected = []
+    batch = []
+    seen = 0
+
+    def commit():
+        batches.append(ingest_metadata(batch))
+        if on_batch:
+            on_batch(seen, batches, rejected)
+
+    for position, record in records:
+        seen += 1
+        try:
+            metadata = parse(record) if parse else record
+            validate_record(metadata)
+        except ValueError as e:
+            rejected.append({"line": position, "error": str(e)})
+            continue
+
+        batch.append(metadata)
+        if len(batch) >= batch_size:
+            commit()
+            batch = []
+
+    if batch:
+        commit()
+
+    return batches, rejected
+
+
+def ingest_lines(lines, batch_size, on_batch=None):
+    """
+    Stores NDJSON metadata records read from an iterable of lines.
+    """
+    records = (
+        (line_number, line)
+        for line_number, line in enumerate(lines, start=1)
+        if line.strip()
+    )
+    return ingest_records(records, batch_size, parse=json.loads, on_batch=on_batch)
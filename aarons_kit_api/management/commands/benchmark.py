@@ -0,0 +1,503 @@
+import io
+import json
+import math
+import random
+import tempfile
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Max, Min
+from django.test import Client, override_settings
+from django.test.utils import (
+    CaptureQueriesContext,
+    setup_test_environment,
+    teardown_test_environment,
+)
+from django.urls import reverse
+from django.utils import timezone
+
+from aarons_kit_api import urls
+from aarons_kit_api.changes import latest_change_seq
+from aarons_kit_api.corpus import WORDS, generate_corpus
+from aarons_kit_api.models import (
+    Article,
+    Author,
+    Citation,
+    Issue,
+    IssueScrape,
+    Journal,
+)
+from aarons_kit_api.pdfs import store_pdf
+from aarons_kit_api.scraping import claim_issues
+from aarons_kit_api.tasks import ingest_metadata_task
+
+MAX_ARTICLES = 10_000_000
+
+
+def percentile(values, p):
+    """
+    Nearest-rank percentile of sorted values.
+    """
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+def summarize(samples):
+    latencies = sorted(latency for latency, _, _ in samples)
+    queries = [count for _, count, _ in samples]
+
+    return {
+        "requests": len(samples),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "queries_mean": round(sum(queries) / len(queries), 2),
+        "queries_max": max(queries),
+        "errors": sum(1 for _, _, code in samples if code >= 400),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Generates a synthetic JSTOR-like corpus in a throwaway test database, "
+        "ingests it through store_metadata and times every endpoint in "
+        "aarons_kit_api/urls.py. Prints the results as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--articles", type=int, default=10000)
+        parser.add_argument("--journals", type=int, default=50)
+        parser.add_argument("--issues", type=int, default=1000)
+        parser.add_argument(
+            "--authors",
+            type=int,
+            help="Distinct authors, half the articles by default. Fewer "
+            "authors means more articles share them.",
+        )
+        parser.add_argument("--authors-per-article", type=int, default=3)
+        parser.add_argument(
+            "--batch-size", type=int, default=settings.INGEST_BATCH_SIZE
+        )
+        parser.add_argument(
+            "--requests", type=int, default=100, help="Timed requests per endpoint."
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", help="Write the results to this file.")
+
+    def handle(self, *args, **options):
+        if not 1 <= options["articles"] <= MAX_ARTICLES:
+            raise CommandError("--articles must be between 1 and %d" % MAX_ARTICLES)
+
+        self.verbosity = options["verbosity"]
+        self.client = Client()
+        self.rng = random.Random(options["seed"])
+
+        self.corpus = corpus = {
+            name: options[name]
+            for name in (
+                "articles",
+                "journals",
+                "issues",
+                "authors",
+                "authors_per_article",
+                "seed",
+            )
+        }
+
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            # a private cache so timings don't depend on, or flush, a shared
+            # one, and private media for the PDFs. The replicas are of the
+            # real database, not the test one, so everything reads the primary
+            with tempfile.TemporaryDirectory() as media_root, override_settings(
+                DATABASE_REPLICAS=[],
+                CACHES={
+                    "default": {
+                        "BACKEND": "django.core.cache.backends.locmem.LocMemCache"
+                    }
+                },
+                CELERY_TASK_ALWAYS_EAGER=True,
+                CELERY_TASK_STORE_EAGER_RESULT=True,
+                MEDIA_ROOT=media_root,
+            ):
+                results = {
+                    "corpus": corpus,
+                    "ingest": self.benchmark_ingest(
+                        generate_corpus(**corpus), options["batch_size"]
+                    ),
+                    "endpoints": self.benchmark_endpoints(options["requests"]),
+                }
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        output = json.dumps(results, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output + "\n")
+        else:
+            self.stdout.write(output)
+
+    def request(self, method, path, data=None, content_type=None):
+        """
+        Returns the latency, query count and status code of one request,
+        including reading a streamed response to the end.
+        """
+        kwargs = {"content_type": content_type} if content_type else {}
+
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = getattr(self.client, method)(path, data, **kwargs)
+            if response.streaming:
+                b"".join(response.streaming_content)
+            latency = time.perf_counter() - start
+
+        return (latency, len(queries), response.status_code), response
+
+    def benchmark_ingest(self, records, batch_size):
+        samples = []
+        total = 0
+
+        records = iter(records)
+        while batch := list(islice(records, batch_size)):
+            sample, _ = self.request(
+                "post", reverse("store_metadata"), {"metadata": json.dumps(batch)}
+            )
+            samples.append(sample)
+            total += len(batch)
+
+            if self.verbosity > 1:
+                self.stderr.write("Ingested %d records" % total)
+
+        seconds = sum(latency for latency, _, _ in samples)
+        return {
+            "records": total,
+            "seconds": round(seconds, 3),
+            "records_per_second": round(total / seconds, 1),
+            "batches": summarize(samples),
+        }
+
+    def sample(self, model, field_name, count):
+        """
+        Returns field values of up to count random rows. Primary keys are
+        dense in a freshly loaded database, so this doesn't need ORDER BY
+        random().
+        """
+        high = model.objects.aggregate(high=Max("pk"))["high"] or 0
+        pks = self.rng.sample(range(1, high + 1), min(count, high))
+        return list(model.objects.filter(pk__in=pks).values_list(field_name, flat=True))
+
+    def endpoint_requests(self, count):
+        """
+        Returns, for every named url, how many requests to time and a
+        function that builds the arguments of the next one from the corpus.
+        """
+        rng = self.rng
+        titles = self.sample(Article, "title", count)
+        jstor_ids = self.sample(Article, "articleJstorID", 500)
+        authors = self.sample(Author, "authorName", count)
+        journals = list(Journal.objects.values_list("journalID", "journalName", "issn"))
+        years = Issue.objects.aggregate(low=Min("year"), high=Max("year"))
+        last_change_seq = latest_change_seq()
+        articles = self.sample(Article, "articleID", count)
+        # the corpus has no PDFs to extract references from, so the sampled
+        # articles cite each other at random
+        Citation.objects.bulk_create(
+            Citation(citing_id=article, cited_id=cited)
+            for article in articles
+            for cited in rng.sample(articles, min(len(articles), 20))
+            if cited != article
+        )
+        pdf = store_pdf(io.BytesIO(b"%PDF-1.4\n" + b"0" * 100_000))
+        Article.objects.filter(pk__in=articles).update(pdf=pdf)
+        job = ingest_metadata_task.delay([])
+
+        # writes re-send records that are already stored, so the corpus
+        # doesn't grow while it's being measured
+        stored = list(islice(generate_corpus(**self.corpus), 100))
+
+        def year_range():
+            year_from = rng.randint(years["low"], years["high"])
+            return {"year_from": year_from, "year_to": year_from + rng.randint(0, 10)}
+
+        def missing_body():
+            keys = rng.sample(jstor_ids, min(len(jstor_ids), 500))
+            return {"articleJstorIDs": keys + ["missing-%d" % i for i in range(500)]}
+
+        # the corpus counts as just scraped, so none of it is due yet
+        IssueScrape.objects.update(due=timezone.now())
+        # long enough not to run out before it's renewed
+        renewed_lease, _, _ = claim_issues(
+            "benchmark", 10, settings.SCRAPE_MAX_LEASE_SECONDS
+        )
+
+        def due_issues():
+            # claims lease issues and completed ones aren't due again for a
+            # month, so once they're used up every other issue is made due
+            if not IssueScrape.objects.filter(due__lte=timezone.now()).exists():
+                IssueScrape.objects.exclude(lease=renewed_lease).update(
+                    due=timezone.now(), lease=None, owner=""
+                )
+
+        def scrape_lease():
+            due_issues()
+            lease, _, _ = claim_issues("benchmark", 10, 60)
+            return str(lease)
+
+        def claim_request():
+            due_issues()
+            return (
+                "post",
+                reverse("claim_scrape_issues"),
+                {"owner": "benchmark", "count": 10, "lease_seconds": 60},
+                "application/json",
+            )
+
+        return {
+            "store_metadata": (
+                count,
+                lambda: (
+                    "post",
+                    reverse("store_metadata"),
+                    {"metadata": json.dumps(stored)},
+                    None,
+                ),
+            ),
+            "stream_metadata": (
+                count,
+                lambda: (
+                    "post",
+                    reverse("stream_metadata"),
+                    "\n".join(json.dumps(record) for record in stored),
+                    "application/x-ndjson",
+                ),
+            ),
+            "get_ingest_job": (
+                count,
+                lambda: (
+                    "get",
+                    reverse("get_ingest_job", kwargs={"job_id": job.id}),
+                    None,
+                    None,
+                ),
+            ),
+            "get_available_articles": (
+                count,
+                lambda: (
+                    "get",
+                    reverse("get_available_articles"),
+                    {"page_size": rng.choice((50, 500))},
+                    None,
+                ),
+            ),
+            # every request reads the whole catalogue
+            "export_articles": (
+                1,
+                lambda: (
+                    "get",
+                    reverse(
+                        "export_articles",
+                        kwargs={"export_format": rng.choice(("json", "ndjson"))},
+                    ),
+                    None,
+                    None,
+                ),
+            ),
+            "get_article_by_title": (
+                count,
+                lambda: (
+                    "get",
+                    reverse("get_article_by_title"),
+                    {"title": rng.choice(titles)},
+                    None,
+                ),
+            ),
+            "search_articles": (
+                count,
+                lambda: (
+                    "get",
+                    reverse("search_articles"),
+                    {"q": " ".join(rng.sample(WORDS, rng.randint(1, 3)))},
+                    None,
+                ),
+            ),
+            "get_articles_by_year_range": (
+                count,
+                lambda: (
+                    "get",
+                    reverse("get_articles_by_year_range"),
+                    year_range(),
+                    None,
+                ),
+            ),
+            "check_article_by_title": (
+                count,
+                lambda: (
+                    "get",
+                    reverse("check_article_by_title"),
+                    {"title": rng.choice(titles)},
+                    None,
+                ),
+            ),
+            "find_missing_metadata": (
+                count,
+                lambda: (
+                    "post",
+                    reverse("find_missing_metadata"),
+                    missing_body(),
+                    "application/json",
+                ),
+            ),
+            "get_articles_by_author": (
+                count,
+                lambda: (
+                    "get",
+                    reverse("get_articles_by_author"),
+                    {"author": rng.choice(authors)},
+                    None,
+                ),
+            ),
+            "get_articles_from_journal": (
+                count,
+                lambda: (
+                    "get",
+                    reverse("get_articles_from_journal"),
+                    {"journal": rng.choice(journals)[0]},
+                    None,
+                ),
+            ),
+            "get_article_references": (
+                count,
+                lambda: (
+                    "get",
+                    reverse(
+                        "get_article_references",
+                        kwargs={"article_id": rng.choice(articles)},
+                    ),
+                    None,
+                    None,
+                ),
+            ),
+            "get_article_cited_by": (
+                count,
+                lambda: (
+                    "get",
+                    reverse(
+                        "get_article_cited_by",
+                        kwargs={"article_id": rng.choice(articles)},
+                    ),
+                    None,
+                    None,
+                ),
+            ),
+            # nginx sends the file, so this times the lookup and redirect
+            "article_pdf": (
+                count,
+                lambda: (
+                    "get",
+                    reverse("article_pdf", kwargs={"article_id": rng.choice(articles)}),
+                    None,
+                    None,
+                ),
+            ),
+            "check_article_by_author": (
+                count,
+                lambda: (
+                    "get",
+                    reverse("check_article_by_author"),
+                    {"author": rng.choice(authors)},
+                    None,
+                ),
+            ),
+            "get_available_journals": (
+                count,
+                lambda: ("get", reverse("get_available_journals"), None, None),
+            ),
+            "get_journal_catalogue": (
+                count,
+                lambda: ("get", reverse("get_journal_catalogue"), None, None),
+            ),
+            "check_article_by_journal_name": (
+                count,
+                lambda: (
+                    "get",
+                    reverse("check_article_by_journal_name"),
+                    {"journal": rng.choice(journals)[1]},
+                    None,
+                ),
+            ),
+            "get_changes": (
+                count,
+                lambda: (
+                    "get",
+                    reverse("get_changes"),
+                    {"since": rng.randint(0, last_change_seq), "page_size": 1000},
+                    None,
+                ),
+            ),
+            "claim_scrape_issues": (count, claim_request),
+            "renew_scrape_lease": (
+                count,
+                lambda: (
+                    "post",
+                    reverse("renew_scrape_lease", kwargs={"lease": renewed_lease}),
+                    {"lease_seconds": 60},
+                    "application/json",
+                ),
+            ),
+            "complete_scrape_lease": (
+                count,
+                lambda: (
+                    "post",
+                    reverse("complete_scrape_lease", kwargs={"lease": scrape_lease()}),
+                    None,
+                    None,
+                ),
+            ),
+            "get_metrics": (
+                count,
+                lambda: ("get", reverse("get_metrics"), None, None),
+            ),
+        }
+
+    def benchmark_endpoints(self, count):
+        """
+        Times each endpoint with the response cache cleared before every
+        request (cold) and, for cached views, once more straight after (warm).
+        """
+        endpoint_requests = self.endpoint_requests(count)
+
+        missing = {pattern.name for pattern in urls.urlpatterns} - set(
+            endpoint_requests
+        )
+        if missing:
+            raise CommandError("No benchmark for %s" % ", ".join(sorted(missing)))
+
+        results = {}
+        for name, (requests, build) in endpoint_requests.items():
+            cold = []
+            warm = []
+            for _ in range(requests):
+                args = build()
+
+                cache.clear()
+                sample, response = self.request(*args)
+                cold.append(sample)
+
+                if response.has_header("ETag"):
+                    sample, _ = self.request(*args)
+                    warm.append(sample)
+
+            results[name] = {"cold": summarize(cold)}
+            if warm:
+                results[name]["warm"] = summarize(warm)
+
+            if self.verbosity > 1:
+                self.stderr.write("Benchmarked %s" % name)
+
+        return results
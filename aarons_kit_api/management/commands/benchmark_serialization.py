@@ -0,0 +1,71 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from aarons_kit_api.corpus import generate_corpus
+from aarons_kit_api.ingest import ingest_metadata
+from aarons_kit_api.models import Article
+from aarons_kit_api.renderers import MessagePackRenderer, ORJSONRenderer, msgpack
+from aarons_kit_api.serializers import ArticleSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures the per-row cost of serializing and rendering articles with "
+        "DRF's JSONRenderer, orjson, sparse fieldsets and MessagePack. Runs on "
+        "synthetic rows inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=5000)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        rows = options["rows"]
+
+        variants = [
+            ("drf_json", None, JSONRenderer()),
+            ("orjson", None, ORJSONRenderer()),
+            ("orjson_sparse", ["articleID", "title"], ORJSONRenderer()),
+        ]
+        if msgpack is not None:
+            variants.append(("msgpack", None, MessagePackRenderer()))
+
+        results = {"rows": rows}
+        with transaction.atomic():
+            ingest_metadata(generate_corpus(rows))
+
+            for name, fields, renderer in variants:
+                articles = list(
+                    ArticleSerializer.setup_eager_loading(
+                        Article.objects.order_by("articleID"), fields
+                    )[:rows]
+                )
+                results[name] = self.measure(
+                    articles, fields, renderer, options["repeat"]
+                )
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def measure(self, articles, fields, renderer, repeat):
+        serialize = render = float("inf")
+
+        for _ in range(repeat):
+            start = time.perf_counter()
+            data = ArticleSerializer(articles, many=True, fields=fields).data
+            serialized = time.perf_counter()
+            renderer.render(data)
+            rendered = time.perf_counter()
+
+            serialize = min(serialize, serialized - start)
+            render = min(render, rendered - serialized)
+
+        return {
+            "serialize_us_per_row": round(serialize / len(articles) * 1e6, 2),
+            "render_us_per_row": round(render / len(articles) * 1e6, 2),
+        }
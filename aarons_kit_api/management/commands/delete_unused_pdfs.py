@@ -0,0 +1,29 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from aarons_kit_api.pdfs import delete_unused_pdfs
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes the stored PDFs no article refers to any more, like those "
+        "replaced by a new upload, once PDF_UNUSED_SECONDS have passed since "
+        "they were last uploaded."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--seconds",
+            type=int,
+            default=settings.PDF_UNUSED_SECONDS,
+            help="How long after their last upload unused PDFs are kept.",
+        )
+
+    def handle(self, *args, **options):
+        deleted = delete_unused_pdfs(
+            timezone.now() - timedelta(seconds=options["seconds"])
+        )
+        self.stdout.write(self.style.SUCCESS("Deleted %d unused PDFs" % deleted))
@@ -0,0 +1,93 @@
+import os
+
+from celery import group
+from django.core.management.base import BaseCommand, CommandError
+
+from aarons_kit_api.models import Article
+from aarons_kit_api.pdfs import pdf_path
+from aarons_kit_api.tasks import extract_references_task
+
+
+class Command(BaseCommand):
+    help = (
+        "Queues a Celery task per stored article PDF, or per PDF in a "
+        "directory named after the JSTOR id of its article, to extract its "
+        "references and store the articles it cites. Files extracted before "
+        "are read from the extraction cache."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "directory",
+            nargs="?",
+            help="Where the PDFs are, as seen by every worker, rather than the "
+            "PDFs uploaded to api/articles/:articleId/pdf.",
+        )
+        parser.add_argument(
+            "--wait",
+            action="store_true",
+            help="Wait for the tasks to finish and print their totals.",
+        )
+
+    def directory_paths(self, directory):
+        """
+        Returns the paths of the PDFs in a directory by the id of the article
+        with their JSTOR id.
+        """
+        directory = os.path.abspath(directory)
+        if not os.path.isdir(directory):
+            raise CommandError("%s is not a directory" % directory)
+
+        paths = {
+            os.path.splitext(entry.name)[0]: entry.path
+            for entry in os.scandir(directory)
+            if entry.is_file() and entry.name.lower().endswith(".pdf")
+        }
+        articles = dict(
+            Article.objects.filter(articleJstorID__in=paths).values_list(
+                "articleJstorID", "articleID"
+            )
+        )
+
+        for jstor_id in sorted(paths.keys() - articles.keys()):
+            self.stderr.write("No article with the JSTOR id of %s" % paths[jstor_id])
+
+        return {articles[jstor_id]: paths[jstor_id] for jstor_id in articles}
+
+    def handle(self, *args, **options):
+        if options["directory"] is None:
+            paths = {
+                article_id: pdf_path(sha256)
+                for article_id, sha256 in Article.objects.exclude(pdf=None).values_list(
+                    "articleID", "pdf_id"
+                )
+            }
+        else:
+            paths = self.directory_paths(options["directory"])
+
+        if not paths:
+            self.stdout.write("No PDFs of stored articles to extract")
+            return
+
+        jobs = group(
+            extract_references_task.s(article_id, path)
+            for article_id, path in paths.items()
+        ).apply_async()
+
+        if not options["wait"]:
+            self.stdout.write("Queued %d PDFs as job %s" % (len(paths), jobs.id))
+            return
+
+        results = jobs.get()
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Extracted %d PDFs (%d from the cache): %d references, %d "
+                "citations of stored articles"
+                % (
+                    len(results),
+                    sum(result["cached"] for result in results),
+                    sum(result["references"] for result in results),
+                    sum(result["cited"] for result in results),
+                )
+            )
+        )
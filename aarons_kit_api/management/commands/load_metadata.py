@@ -0,0 +1,104 @@
+import json
+import multiprocessing
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from aarons_kit_api.bulk_load import load_file
+from aarons_kit_api.statistics import update_all_journal_statistics
+
+
+class Command(BaseCommand):
+    help = (
+        "Loads a JSON array or NDJSON file of metadata records, such as a full "
+        "JSTOR dump, much faster than store_metadata: records are parsed in a "
+        "process pool, COPY'd into staging tables and merged into the "
+        "catalogue with set-based SQL. Every committed batch saves the file "
+        "offset to resume from to PATH.offset."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="Processes parsing records, 0 to parse them in this one.",
+        )
+        parser.add_argument("--batch-size", type=int, default=50000)
+        parser.add_argument("--chunk-bytes", type=int, default=4 * 1024 * 1024)
+        parser.add_argument("--offset", type=int, help="File offset to start at.")
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Start at the offset saved by an earlier run.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        state_path = path + ".offset"
+
+        offset = options["offset"]
+        if options["resume"]:
+            try:
+                with open(state_path) as f:
+                    offset = int(f.read())
+            except FileNotFoundError:
+                raise CommandError("No offset to resume from in %s" % state_path)
+
+        start = time.perf_counter()
+
+        def on_batch(offset, totals):
+            with open(state_path + ".tmp", "w") as f:
+                f.write(str(offset))
+            os.replace(state_path + ".tmp", state_path)
+
+            seconds = time.perf_counter() - start
+            self.stdout.write(
+                "offset %d: %d records, %d rejected, %.0f records/s"
+                % (
+                    offset,
+                    totals["records"],
+                    len(totals["rejected"]),
+                    totals["records"] / seconds,
+                )
+            )
+
+        pool = None
+        map_chunks = map
+        if options["workers"] > 0:
+            # so the forked workers don't share a database connection
+            connection.close()
+            pool = multiprocessing.Pool(options["workers"])
+            map_chunks = pool.imap
+
+        try:
+            with open(path, "rb") as f:
+                totals = load_file(
+                    f,
+                    offset,
+                    options["batch_size"],
+                    options["chunk_bytes"],
+                    map_chunks=map_chunks,
+                    on_batch=on_batch,
+                )
+        finally:
+            if pool is not None:
+                pool.terminate()
+
+        # once for the whole load, rather than for every journal of every batch
+        update_all_journal_statistics()
+
+        seconds = time.perf_counter() - start
+        rejected = totals["rejected"]
+        for record in rejected:
+            self.stderr.write(
+                "Rejected the record at offset %d: %s"
+                % (record["offset"], record["error"])
+            )
+        totals["rejected"] = len(rejected)
+        totals["seconds"] = round(seconds, 1)
+        totals["records_per_second"] = round(totals["records"] / seconds)
+        self.stdout.write(json.dumps(totals, indent=2))
@@ -0,0 +1,155 @@
+import asyncio
+import json
+import socket
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from aarons_kit_api.management.commands.benchmark import percentile
+
+DEFAULT_PATHS = (
+    "/api/articles?page_size=500",
+    "/api/journals/titles",
+    "/api/journals/catalogue",
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Sends GET requests from many concurrent slow clients to one or more "
+        "running servers, e.g. the uWSGI app and the ASGI app, and prints "
+        "throughput and latency for each as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "targets",
+            nargs="+",
+            help="name=url of each server to test, e.g. "
+            "sync=http://localhost:8000 async=http://localhost:8001",
+        )
+        parser.add_argument("--concurrency", type=int, default=100)
+        parser.add_argument(
+            "--duration", type=float, default=30, help="Seconds per target."
+        )
+        parser.add_argument(
+            "--read-rate",
+            type=int,
+            default=64 * 1024,
+            help="Bytes per second each client reads the response at.",
+        )
+        parser.add_argument(
+            "--send-delay",
+            type=float,
+            default=0,
+            help="Seconds each client pauses halfway through sending its "
+            "request headers.",
+        )
+        parser.add_argument(
+            "--path",
+            action="append",
+            dest="paths",
+            help="Path to request, repeatable. Clients cycle through them.",
+        )
+
+    def handle(self, *args, **options):
+        results = {}
+        for target in options["targets"]:
+            name, _, url = target.rpartition("=")
+            url = urlsplit(url)
+            if url.scheme != "http" or not url.hostname:
+                raise CommandError("%s is not an http:// url" % target)
+
+            results[name or url.netloc] = asyncio.run(
+                self.load(
+                    url.hostname,
+                    url.port or 80,
+                    options["paths"] or DEFAULT_PATHS,
+                    options["concurrency"],
+                    options["duration"],
+                    options["read_rate"],
+                    options["send_delay"],
+                )
+            )
+
+        self.stdout.write(json.dumps(results, indent=2))
+
+    async def load(
+        self, host, port, paths, concurrency, duration, read_rate, send_delay
+    ):
+        samples = []
+        errors = 0
+        deadline = time.perf_counter() + duration
+
+        async def client(number):
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                path = paths[(number + len(samples)) % len(paths)]
+                try:
+                    samples.append(
+                        await self.fetch(host, port, path, read_rate, send_delay)
+                    )
+                except (OSError, ValueError, IndexError, asyncio.IncompleteReadError):
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client(number) for number in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+        first_bytes = sorted(first_byte for first_byte, _, _ in samples)
+        latencies = sorted(latency for _, latency, _ in samples)
+        result = {
+            "concurrency": concurrency,
+            "requests": len(samples),
+            "errors": errors + sum(1 for _, _, code in samples if code >= 400),
+            "requests_per_second": round(len(samples) / elapsed, 1),
+        }
+        for p in (50, 95, 99):
+            if samples:
+                result["first_byte_p%d_ms" % p] = round(
+                    percentile(first_bytes, p) * 1000, 1
+                )
+                result["latency_p%d_ms" % p] = round(percentile(latencies, p) * 1000, 1)
+        return result
+
+    async def fetch(self, host, port, path, read_rate, send_delay):
+        """
+        Returns the time to the first byte, the time to the whole response and
+        the status code of one request, made like a client on a slow link: the
+        headers arrive in two parts send_delay apart and the response is read
+        in small pieces at read_rate through a small receive buffer. Loopback
+        send buffers hold a few MB, so on one machine only responses bigger
+        than that keep a server waiting on the reader.
+        """
+        chunk_size = 4096
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, chunk_size)
+        sock.setblocking(False)
+
+        start = time.perf_counter()
+        try:
+            await asyncio.get_running_loop().sock_connect(sock, (host, port))
+        except OSError:
+            sock.close()
+            raise
+        reader, writer = await asyncio.open_connection(sock=sock)
+
+        try:
+            writer.write(("GET %s HTTP/1.1\r\nHost: %s\r\n" % (path, host)).encode())
+            if send_delay:
+                await writer.drain()
+                await asyncio.sleep(send_delay)
+            writer.write(b"Accept-Encoding: identity\r\nConnection: close\r\n\r\n")
+            await writer.drain()
+
+            status_line = await reader.readline()
+            first_byte = time.perf_counter() - start
+            code = int(status_line.split()[1])
+
+            while chunk := await reader.read(chunk_size):
+                await asyncio.sleep(len(chunk) / read_rate)
+        finally:
+            writer.close()
+
+        return first_byte, time.perf_counter() - start, code
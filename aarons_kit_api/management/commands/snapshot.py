@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from aarons_kit_api.snapshots import create_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Writes the catalogue as sharded, gzip-compressed NDJSON files with a "
+        "manifest for clients to download. Later runs write only the rows "
+        "changed since the previous snapshot."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            default=settings.SNAPSHOT_ROOT,
+            help="Directory of the manifest and snapshots, served by nginx.",
+        )
+        parser.add_argument(
+            "--shard-rows", type=int, default=settings.SNAPSHOT_SHARD_ROWS
+        )
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Write every row and replace the earlier snapshots.",
+        )
+
+    def handle(self, *args, **options):
+        snapshot = create_snapshot(
+            options["output"],
+            options["shard_rows"],
+            settings.EXPORT_CHUNK_SIZE,
+            full=options["full"],
+            grace_seconds=settings.SNAPSHOT_GRACE_SECONDS,
+        )
+
+        if snapshot is None:
+            self.stdout.write("The catalogue has not changed since the last snapshot")
+            return
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Wrote %s snapshot %s: %d rows in %d files"
+                % (
+                    snapshot["type"],
+                    snapshot["id"],
+                    sum(file["rows"] for file in snapshot["files"]),
+                    len(snapshot["files"]),
+                )
+            )
+        )
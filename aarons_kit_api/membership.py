@@ -0,0 +1,169 @@
+import hashlib
+import math
+import threading
+
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import Max
+
+from aarons_kit_api.cache import get_catalogue_version
+from aarons_kit_api.models import (
+    Journal,
+    Issue,
+    Article,
+)
+
+# request field -> (model, natural key field)
+NATURAL_KEYS = {
+    "articleJstorIDs": (Article, "articleJstorID"),
+    "issueJstorIDs": (Issue, "issueJstorID"),
+    "issns": (Journal, "issn"),
+}
+
+MISSING_KEYS_SQL = """
+SELECT requested.key
+FROM unnest(%%s::text[]) AS requested(key)
+WHERE NOT EXISTS (
+    SELECT 1 FROM %(table)s AS stored WHERE stored.%(column)s = requested.key
+)
+"""
+
+
+class BloomFilter:
+    """
+    Fixed-size set of keys that answers "definitely absent" or "maybe
+    present", at false_positive_rate for the capacity it was sized for.
+    """
+
+    def __init__(self, capacity, false_positive_rate):
+        self.capacity = max(capacity, 1)
+        self.count = 0
+        self.size = max(
+            8, int(-self.capacity * math.log(false_positive_rate) / math.log(2) ** 2)
+        )
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, key):
+        self.count += 1
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+
+# model -> (catalogue version, change_seq, Bloom filter) of this process
+_filters = {}
+_filters_lock = threading.Lock()
+
+
+def _build_filter(model, field_name):
+    """
+    Returns a Bloom filter of every stored key, with room for as many again,
+    and the change_seq it's up to date with.
+    """
+    # read first: every row numbered up to it has committed (see migration
+    # 0012), so the scan sees it
+    change_seq = (
+        model.objects.exclude(change_seq=None).aggregate(Max("change_seq"))[
+            "change_seq__max"
+        ]
+        or 0
+    )
+    queryset = model.objects.values_list(field_name, flat=True)
+    bloom_filter = BloomFilter(
+        2 * queryset.count(), settings.MEMBERSHIP_FILTER_FALSE_POSITIVE_RATE
+    )
+    for key in queryset.iterator(chunk_size=10000):
+        bloom_filter.add(key)
+    return change_seq, bloom_filter
+
+
+def _get_filter(model, field_name):
+    """
+    Returns this process's Bloom filter of the stored keys, or None while
+    another request is building or updating it, so nobody waits for that.
+
+    After ingest bumps the catalogue version, the keys of rows inserted or
+    updated since are added from the change_seq index, so the work is the
+    size of the new rows. The whole table is only read for the first filter
+    and whenever the filter fills up, which doubles its size. Keys of deleted
+    rows stay in the filter and are left to the anti-join.
+    """
+    version, _ = get_catalogue_version()
+
+    if not _filters_lock.acquire(blocking=False):
+        return None
+    try:
+        cached = _filters.get(model)
+        if cached is not None and cached[0] == version:
+            return cached[2]
+
+        if cached is None:
+            change_seq, bloom_filter = _build_filter(model, field_name)
+        else:
+            _, change_seq, bloom_filter = cached
+            room = bloom_filter.capacity - bloom_filter.count
+            changes = list(
+                model.objects.filter(change_seq__gt=change_seq)
+                .order_by("change_seq")
+                .values_list(field_name, "change_seq")[: room + 1]
+            )
+            if len(changes) > room:
+                change_seq, bloom_filter = _build_filter(model, field_name)
+            else:
+                for key, change_seq in changes:
+                    bloom_filter.add(key)
+
+        _filters[model] = (version, change_seq, bloom_filter)
+        return bloom_filter
+    finally:
+        _filters_lock.release()
+
+
+def find_missing(model, field_name, keys):
+    """
+    Returns the keys, in the order given, that aren't stored for model, with
+    one anti-join of the requested keys against the natural key index.
+    """
+    keys = list(dict.fromkeys(keys))
+    missing = set()
+    candidates = keys
+
+    bloom_filter = None
+    if settings.MEMBERSHIP_FILTER_ENABLED:
+        bloom_filter = _get_filter(model, field_name)
+
+    if bloom_filter is not None:
+        # keys the filter has never seen are missing without asking the database
+        candidates = []
+        for key in keys:
+            if key in bloom_filter:
+                candidates.append(key)
+            else:
+                missing.add(key)
+
+    if candidates:
+        # a replica, when ReplicaMiddleware allows it
+        connection = connections[router.db_for_read(model)]
+        sql = MISSING_KEYS_SQL % {
+            "table": connection.ops.quote_name(model._meta.db_table),
+            "column": connection.ops.quote_name(
+                model._meta.get_field(field_name).column
+            ),
+        }
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [candidates])
+            missing.update(key for (key,) in cursor.fetchall())
+
+    return [key for key in keys if key in missing]
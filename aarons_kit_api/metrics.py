@@ -0,0 +1,293 @@
+import asyncio
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from celery.signals import (
+    task_postrun,
+    task_prerun,
+    worker_init,
+    worker_process_shutdown,
+)
+from django.conf import settings
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    start_http_server,
+)
+
+REQUEST_SECONDS = Histogram(
+    "aarons_kit_request_seconds",
+    "Time spent handling a request, by route",
+    ["route", "method"],
+)
+REQUESTS = Counter(
+    "aarons_kit_requests_total",
+    "Requests handled, by route and status code",
+    ["route", "method", "status"],
+)
+RESPONSE_BYTES = Histogram(
+    "aarons_kit_response_bytes",
+    "Size of response bodies, by route. Streamed responses aren't counted",
+    ["route"],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216),
+)
+REQUEST_SQL_QUERIES = Counter(
+    "aarons_kit_request_sql_queries_total",
+    "SQL queries run while handling requests, by route",
+    ["route"],
+)
+REQUEST_SQL_SECONDS = Counter(
+    "aarons_kit_request_sql_seconds_total",
+    "Time spent in SQL queries while handling requests, by route",
+    ["route"],
+)
+REQUEST_SERIALIZER_SECONDS = Counter(
+    "aarons_kit_request_serializer_seconds_total",
+    "Time spent in serializers while handling requests, by route",
+    ["route"],
+)
+REQUEST_RENDER_SECONDS = Counter(
+    "aarons_kit_request_render_seconds_total",
+    "Time spent rendering response bodies, by route",
+    ["route"],
+)
+TASK_SECONDS = Histogram(
+    "aarons_kit_task_seconds",
+    "Time spent running a Celery task, by task",
+    ["task"],
+)
+TASKS = Counter(
+    "aarons_kit_tasks_total",
+    "Celery tasks run, by task and final state",
+    ["task", "state"],
+)
+TASK_SQL_QUERIES = Counter(
+    "aarons_kit_task_sql_queries_total",
+    "SQL queries run by Celery tasks, by task",
+    ["task"],
+)
+TASK_SQL_SECONDS = Counter(
+    "aarons_kit_task_sql_seconds_total",
+    "Time spent in SQL queries by Celery tasks, by task",
+    ["task"],
+)
+
+
+class Measurement:
+    """
+    What the current request or task has spent its time on so far.
+    """
+
+    __slots__ = ("queries", "sql_seconds", "serializer_seconds", "render_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.render_seconds = 0.0
+
+
+# a context variable rather than a thread local, so async views get their own
+_measurement = ContextVar("aarons_kit_measurement", default=None)
+
+
+@contextmanager
+def measure():
+    measurement = Measurement()
+    token = _measurement.set(measurement)
+    try:
+        yield measurement
+    finally:
+        _measurement.reset(token)
+
+
+@contextmanager
+def record_time(name):
+    """
+    Adds the time spent in the block to the named Measurement attribute, if
+    a request or task is being measured.
+    """
+    measurement = _measurement.get()
+    if measurement is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        setattr(
+            measurement,
+            name,
+            getattr(measurement, name) + time.perf_counter() - start,
+        )
+
+
+def record_query(execute, sql, params, many, context):
+    measurement = _measurement.get()
+    if measurement is None:
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        measurement.queries += 1
+        measurement.sql_seconds += time.perf_counter() - start
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """
+    Registered for connection_created. The signal fires again when a
+    connection reconnects, so the wrapper is only added once.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class MetricsMiddleware:
+    """
+    Records the latency, status, response size, SQL, serializer and render
+    time of every request under the name of the route it resolved to. Works
+    under both WSGI and ASGI.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # labelled metrics by route, method and status, as looking them up
+        # costs more than recording to them
+        self.metrics = {}
+
+        if asyncio.iscoroutinefunction(get_response):
+            # tells Django to call us from the event loop, as MiddlewareMixin
+            # does
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def get_metrics(self, route, method, status_code):
+        key = (route, method, status_code)
+        if key not in self.metrics:
+            self.metrics[key] = (
+                REQUEST_SECONDS.labels(route, method),
+                REQUESTS.labels(route, method, status_code),
+                RESPONSE_BYTES.labels(route),
+                REQUEST_SQL_QUERIES.labels(route),
+                REQUEST_SQL_SECONDS.labels(route),
+                REQUEST_SERIALIZER_SECONDS.labels(route),
+                REQUEST_RENDER_SECONDS.labels(route),
+            )
+        return self.metrics[key]
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+
+        with measure() as measurement:
+            start = time.perf_counter()
+            response = self.get_response(request)
+            seconds = time.perf_counter() - start
+
+        self.record(request, response, measurement, seconds)
+        return response
+
+    async def __acall__(self, request):
+        with measure() as measurement:
+            start = time.perf_counter()
+            response = await self.get_response(request)
+            seconds = time.perf_counter() - start
+
+        self.record(request, response, measurement, seconds)
+        return response
+
+    def record(self, request, response, measurement, seconds):
+        match = request.resolver_match
+        route = match.view_name if match else "unmatched"
+        (
+            request_seconds,
+            requests,
+            response_bytes,
+            sql_queries,
+            sql_seconds,
+            serializer_seconds,
+            render_seconds,
+        ) = self.get_metrics(route, request.method, response.status_code)
+
+        request_seconds.observe(seconds)
+        requests.inc()
+        if not response.streaming:
+            response_bytes.observe(len(response.content))
+        sql_queries.inc(measurement.queries)
+        sql_seconds.inc(measurement.sql_seconds)
+        serializer_seconds.inc(measurement.serializer_seconds)
+        render_seconds.inc(measurement.render_seconds)
+
+
+# task id -> (context token, start time) of the tasks running in this worker
+_tasks = {}
+
+
+@task_prerun.connect
+def start_task_measurement(task_id, task, **kwargs):
+    _tasks[task_id] = (_measurement.set(Measurement()), time.perf_counter())
+
+
+@task_postrun.connect
+def finish_task_measurement(task_id, task, state=None, **kwargs):
+    if task_id not in _tasks:
+        return
+
+    token, start = _tasks.pop(task_id)
+    measurement = _measurement.get()
+    _measurement.reset(token)
+
+    TASK_SECONDS.labels(task.name).observe(time.perf_counter() - start)
+    TASKS.labels(task.name, state or "UNKNOWN").inc()
+    TASK_SQL_QUERIES.labels(task.name).inc(measurement.queries)
+    TASK_SQL_SECONDS.labels(task.name).inc(measurement.sql_seconds)
+
+
+def collector_registry():
+    """
+    Returns the registry to export. With several worker processes
+    PROMETHEUS_MULTIPROC_DIR has to be set, so the metrics of every process
+    are collected instead of one.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def render_metrics():
+    """
+    Returns the metrics in the Prometheus text format and its content type.
+    """
+    return generate_latest(collector_registry()), CONTENT_TYPE_LATEST
+
+
+@worker_init.connect
+def start_task_metrics_server(**kwargs):
+    """
+    Tasks run in the Celery worker, not the web server, so the worker's main
+    process serves their metrics on TASK_METRICS_PORT. Its pool processes
+    only show up there with PROMETHEUS_MULTIPROC_DIR set.
+    """
+    if settings.TASK_METRICS_PORT:
+        start_http_server(settings.TASK_METRICS_PORT, registry=collector_registry())
+
+
+@worker_process_shutdown.connect
+def remove_task_process_metrics(pid, **kwargs):
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,40 @@
+# Generated by Django 4.0.3 on 2026-10-18 06:24
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aarons_kit_api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='aarons_kit__search__0745ce_gin'),
+        ),
+        migrations.RunSQL(
+            sql="""
+            UPDATE aarons_kit_api_article AS article
+            SET search_vector =
+                setweight(to_tsvector('english', article.title), 'A')
+                || setweight(to_tsvector('english', article.abstract), 'B')
+                || setweight(to_tsvector('english', coalesce((
+                    SELECT string_agg(author."authorName", ' ')
+                    FROM aarons_kit_api_article_authors AS article_author
+                    JOIN aarons_kit_api_author AS author
+                        ON author."authorID" = article_author.author_id
+                    WHERE article_author.article_id = article."articleID"
+                ), '')), 'C')
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
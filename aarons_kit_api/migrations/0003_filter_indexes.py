@@ -0,0 +1,25 @@
+# Generated by Django 4.0.3 on 2026-10-18 06:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aarons_kit_api', '0002_article_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['issue', 'articleID'], name='article_issue_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['year', 'journal'], name='issue_year_journal_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='journal',
+            index=models.Index(fields=['issn'], name='journal_issn_idx'),
+        ),
+    ]
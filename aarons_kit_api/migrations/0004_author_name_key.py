@@ -0,0 +1,66 @@
+# Generated by Django 4.0.3 on 2026-10-18 06:28
+
+from django.db import migrations, models
+
+from aarons_kit_api.authors import author_name_key
+
+
+def populate_name_keys(apps, schema_editor):
+    """
+    Fills in name_key and merges authors that share one into the author with
+    the lowest ID, moving their article links across.
+    """
+    Author = apps.get_model("aarons_kit_api", "Author")
+    Article = apps.get_model("aarons_kit_api", "Article")
+    ArticleAuthor = Article.authors.through
+
+    survivors = {}
+    duplicates = {}
+    batch = []
+    for author in Author.objects.order_by("authorID").iterator(chunk_size=2000):
+        key = author_name_key(author.authorName)
+        if key in survivors:
+            duplicates[author.pk] = survivors[key]
+            continue
+
+        survivors[key] = author.pk
+        author.name_key = key
+        batch.append(author)
+        if len(batch) >= 2000:
+            Author.objects.bulk_update(batch, ["name_key"])
+            batch = []
+
+    if batch:
+        Author.objects.bulk_update(batch, ["name_key"])
+
+    duplicate_ids = list(duplicates)
+    for start in range(0, len(duplicate_ids), 2000):
+        chunk = duplicate_ids[start : start + 2000]
+        links = ArticleAuthor.objects.filter(author_id__in=chunk)
+        ArticleAuthor.objects.bulk_create(
+            [
+                ArticleAuthor(article_id=article_id, author_id=duplicates[author_id])
+                for article_id, author_id in links.values_list(
+                    "article_id", "author_id"
+                )
+            ],
+            ignore_conflicts=True,
+        )
+        links.delete()
+        Author.objects.filter(pk__in=chunk).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aarons_kit_api', '0003_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='author',
+            name='name_key',
+            field=models.CharField(max_length=200, null=True),
+        ),
+        migrations.RunPython(populate_name_keys, migrations.RunPython.noop),
+    ]
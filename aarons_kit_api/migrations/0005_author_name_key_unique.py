@@ -0,0 +1,18 @@
+# Generated by Django 4.0.3 on 2026-10-18 06:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aarons_kit_api', '0004_author_name_key'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='author',
+            name='name_key',
+            field=models.CharField(max_length=200, unique=True),
+        ),
+    ]
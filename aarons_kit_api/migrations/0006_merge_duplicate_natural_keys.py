@@ -0,0 +1,60 @@
+# Generated by Django 4.0.3 on 2026-10-18 06:31
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def _duplicates(model, field_name):
+    """
+    Yields (surviving pk, duplicate pks) for every natural key stored more
+    than once. The row with the lowest pk survives.
+    """
+    groups = (
+        model.objects.values(field_name)
+        .annotate(survivor=Min("pk"), rows=Count("pk"))
+        .filter(rows__gt=1)
+    )
+    for group in groups.iterator():
+        duplicates = (
+            model.objects.filter(**{field_name: group[field_name]})
+            .exclude(pk=group["survivor"])
+            .values_list("pk", flat=True)
+        )
+        yield group["survivor"], list(duplicates)
+
+
+def merge_duplicates(apps, schema_editor):
+    Journal = apps.get_model("aarons_kit_api", "Journal")
+    Issue = apps.get_model("aarons_kit_api", "Issue")
+    Article = apps.get_model("aarons_kit_api", "Article")
+    ArticleAuthor = Article.authors.through
+
+    for survivor, duplicates in _duplicates(Journal, "issn"):
+        Issue.objects.filter(journal_id__in=duplicates).update(journal_id=survivor)
+        Journal.objects.filter(pk__in=duplicates).delete()
+
+    for survivor, duplicates in _duplicates(Issue, "issueJstorID"):
+        Article.objects.filter(issue_id__in=duplicates).update(issue_id=survivor)
+        Issue.objects.filter(pk__in=duplicates).delete()
+
+    for survivor, duplicates in _duplicates(Article, "articleJstorID"):
+        links = ArticleAuthor.objects.filter(article_id__in=duplicates)
+        ArticleAuthor.objects.bulk_create(
+            [
+                ArticleAuthor(article_id=survivor, author_id=author_id)
+                for author_id in links.values_list("author_id", flat=True)
+            ],
+            ignore_conflicts=True,
+        )
+        Article.objects.filter(pk__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aarons_kit_api', '0005_author_name_key_unique'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+    ]
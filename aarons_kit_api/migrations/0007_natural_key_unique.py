@@ -0,0 +1,32 @@
+# Generated by Django 4.0.3 on 2026-10-18 06:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aarons_kit_api', '0006_merge_duplicate_natural_keys'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='journal',
+            name='journal_issn_idx',
+        ),
+        migrations.AlterField(
+            model_name='article',
+            name='articleJstorID',
+            field=models.CharField(max_length=50, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='issue',
+            name='issueJstorID',
+            field=models.CharField(max_length=50, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='journal',
+            name='issn',
+            field=models.CharField(max_length=50, unique=True),
+        ),
+    ]
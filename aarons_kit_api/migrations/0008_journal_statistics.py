@@ -0,0 +1,65 @@
+# Generated by Django 4.0.3 on 2026-10-18 06:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aarons_kit_api', '0007_natural_key_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JournalStatistics',
+            fields=[
+                ('journal', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='statistics', serialize=False, to='aarons_kit_api.journal')),
+                ('articleCount', models.IntegerField(default=0)),
+                ('issueCount', models.IntegerField(default=0)),
+                ('authorCount', models.IntegerField(default=0)),
+                ('firstYear', models.IntegerField(null=True)),
+                ('lastYear', models.IntegerField(null=True)),
+            ],
+        ),
+        migrations.RunSQL(
+            sql="""
+            INSERT INTO aarons_kit_api_journalstatistics
+                (journal_id, "articleCount", "issueCount", "authorCount", "firstYear", "lastYear")
+            SELECT
+                journal."journalID",
+                articles.count,
+                issues.count,
+                authors.count,
+                issues.first_year,
+                issues.last_year
+            FROM aarons_kit_api_journal AS journal
+            CROSS JOIN LATERAL (
+                SELECT count(*) AS count, min(issue.year) AS first_year, max(issue.year) AS last_year
+                FROM aarons_kit_api_issue AS issue
+                WHERE issue.journal_id = journal."journalID"
+            ) AS issues
+            CROSS JOIN LATERAL (
+                SELECT count(*) AS count
+                FROM aarons_kit_api_article AS article
+                JOIN aarons_kit_api_issue AS issue ON issue."issueID" = article.issue_id
+                WHERE issue.journal_id = journal."journalID"
+            ) AS articles
+            CROSS JOIN LATERAL (
+                SELECT count(DISTINCT article_author.author_id) AS count
+                FROM aarons_kit_api_article_authors AS article_author
+                JOIN aarons_kit_api_article AS article
+                    ON article."articleID" = article_author.article_id
+                JOIN aarons_kit_api_issue AS issue ON issue."issueID" = article.issue_id
+                WHERE issue.journal_id = journal."journalID"
+            ) AS authors
+            ON CONFLICT (journal_id) DO UPDATE SET
+                "articleCount" = EXCLUDED."articleCount",
+                "issueCount" = EXCLUDED."issueCount",
+                "authorCount" = EXCLUDED."authorCount",
+                "firstYear" = EXCLUDED."firstYear",
+                "lastYear" = EXCLUDED."lastYear"
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.0.3 on 2026-10-18 06:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aarons_kit_api', '0008_journal_statistics'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='article',
+            name='title',
+            field=models.CharField(db_index=True, max_length=500),
+        ),
+        migrations.AlterField(
+            model_name='journal',
+            name='journalName',
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.0.3 on 2026-10-18 07:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aarons_kit_api', '0009_title_and_journal_name_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReferenceExtraction',
+            fields=[
+                ('sha256', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('references', models.JSONField()),
+                ('extracted', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Citation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cited', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='cited_by', to='aarons_kit_api.article')),
+                ('citing', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='references', to='aarons_kit_api.article')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='citation',
+            index=models.Index(fields=['cited', 'citing'], name='citation_cited_citing_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='citation',
+            constraint=models.UniqueConstraint(fields=('citing', 'cited'), name='citation_citing_cited_unique'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.0.3 on 2026-10-18 07:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aarons_kit_api', '0010_citations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PDF',
+            fields=[
+                ('sha256', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('size', models.BigIntegerField()),
+                ('uploaded', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='pdf',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='articles', to='aarons_kit_api.pdf'),
+        ),
+    ]
@@ -0,0 +1,146 @@
+# Generated by Django 4.0.3 on 2026-10-18 07:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aarons_kit_api', '0011_article_pdf'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='change_seq',
+            field=models.BigIntegerField(db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='author',
+            name='change_seq',
+            field=models.BigIntegerField(db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='issue',
+            name='change_seq',
+            field=models.BigIntegerField(db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='journal',
+            name='change_seq',
+            field=models.BigIntegerField(db_index=True, editable=False, null=True),
+        ),
+        migrations.RunSQL(
+            sql="""
+            CREATE SEQUENCE aarons_kit_api_change_seq;
+
+            UPDATE aarons_kit_api_journal AS row
+            SET change_seq = numbered.change_seq
+            FROM (
+                SELECT "journalID", nextval('aarons_kit_api_change_seq') AS change_seq
+                FROM aarons_kit_api_journal
+                ORDER BY "journalID"
+            ) AS numbered
+            WHERE row."journalID" = numbered."journalID";
+
+            UPDATE aarons_kit_api_issue AS row
+            SET change_seq = numbered.change_seq
+            FROM (
+                SELECT "issueID", nextval('aarons_kit_api_change_seq') AS change_seq
+                FROM aarons_kit_api_issue
+                ORDER BY "issueID"
+            ) AS numbered
+            WHERE row."issueID" = numbered."issueID";
+
+            UPDATE aarons_kit_api_author AS row
+            SET change_seq = numbered.change_seq
+            FROM (
+                SELECT "authorID", nextval('aarons_kit_api_change_seq') AS change_seq
+                FROM aarons_kit_api_author
+                ORDER BY "authorID"
+            ) AS numbered
+            WHERE row."authorID" = numbered."authorID";
+
+            UPDATE aarons_kit_api_article AS row
+            SET change_seq = numbered.change_seq
+            FROM (
+                SELECT "articleID", nextval('aarons_kit_api_change_seq') AS change_seq
+                FROM aarons_kit_api_article
+                ORDER BY "articleID"
+            ) AS numbered
+            WHERE row."articleID" = numbered."articleID";
+
+            -- writers take change sequence numbers one transaction at a time, so
+            -- no transaction commits numbers lower than one committed before it
+            -- and a reader that has seen a number never misses a lower one
+            CREATE FUNCTION aarons_kit_api_set_change_seq() RETURNS trigger AS $$
+            BEGIN
+                PERFORM pg_advisory_xact_lock(hashtext('aarons_kit_api_change_seq'));
+                NEW.change_seq := nextval('aarons_kit_api_change_seq');
+                RETURN NEW;
+            END;
+            $$ LANGUAGE plpgsql;
+
+            CREATE TRIGGER change_seq_insert BEFORE INSERT ON aarons_kit_api_journal
+            FOR EACH ROW EXECUTE FUNCTION aarons_kit_api_set_change_seq();
+            CREATE TRIGGER change_seq_update BEFORE UPDATE ON aarons_kit_api_journal
+            FOR EACH ROW WHEN (OLD.* IS DISTINCT FROM NEW.*)
+            EXECUTE FUNCTION aarons_kit_api_set_change_seq();
+
+            CREATE TRIGGER change_seq_insert BEFORE INSERT ON aarons_kit_api_issue
+            FOR EACH ROW EXECUTE FUNCTION aarons_kit_api_set_change_seq();
+            CREATE TRIGGER change_seq_update BEFORE UPDATE ON aarons_kit_api_issue
+            FOR EACH ROW WHEN (OLD.* IS DISTINCT FROM NEW.*)
+            EXECUTE FUNCTION aarons_kit_api_set_change_seq();
+
+            CREATE TRIGGER change_seq_insert BEFORE INSERT ON aarons_kit_api_author
+            FOR EACH ROW EXECUTE FUNCTION aarons_kit_api_set_change_seq();
+            CREATE TRIGGER change_seq_update BEFORE UPDATE ON aarons_kit_api_author
+            FOR EACH ROW WHEN (OLD.* IS DISTINCT FROM NEW.*)
+            EXECUTE FUNCTION aarons_kit_api_set_change_seq();
+
+            CREATE TRIGGER change_seq_insert BEFORE INSERT ON aarons_kit_api_article
+            FOR EACH ROW EXECUTE FUNCTION aarons_kit_api_set_change_seq();
+            CREATE TRIGGER change_seq_update BEFORE UPDATE ON aarons_kit_api_article
+            FOR EACH ROW WHEN (OLD.* IS DISTINCT FROM NEW.*)
+            EXECUTE FUNCTION aarons_kit_api_set_change_seq();
+
+            -- articles whose authors change are renumbered too, through their
+            -- update trigger, unless this transaction wrote them already, as
+            -- ingest does for the articles it inserts
+            CREATE FUNCTION aarons_kit_api_move_linked_articles() RETURNS trigger AS $$
+            BEGIN
+                UPDATE aarons_kit_api_article AS article
+                SET change_seq = NULL
+                WHERE article."articleID" IN (SELECT article_id FROM links)
+                    AND article.xmin::text::bigint <> txid_current() % 4294967296;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+
+            CREATE TRIGGER move_linked_articles_insert
+            AFTER INSERT ON aarons_kit_api_article_authors
+            REFERENCING NEW TABLE AS links
+            FOR EACH STATEMENT EXECUTE FUNCTION aarons_kit_api_move_linked_articles();
+            CREATE TRIGGER move_linked_articles_delete
+            AFTER DELETE ON aarons_kit_api_article_authors
+            REFERENCING OLD TABLE AS links
+            FOR EACH STATEMENT EXECUTE FUNCTION aarons_kit_api_move_linked_articles();
+            """,
+            reverse_sql="""
+            DROP TRIGGER move_linked_articles_insert ON aarons_kit_api_article_authors;
+            DROP TRIGGER move_linked_articles_delete ON aarons_kit_api_article_authors;
+            DROP FUNCTION aarons_kit_api_move_linked_articles();
+            DROP TRIGGER change_seq_insert ON aarons_kit_api_journal;
+            DROP TRIGGER change_seq_update ON aarons_kit_api_journal;
+            DROP TRIGGER change_seq_insert ON aarons_kit_api_issue;
+            DROP TRIGGER change_seq_update ON aarons_kit_api_issue;
+            DROP TRIGGER change_seq_insert ON aarons_kit_api_author;
+            DROP TRIGGER change_seq_update ON aarons_kit_api_author;
+            DROP TRIGGER change_seq_insert ON aarons_kit_api_article;
+            DROP TRIGGER change_seq_update ON aarons_kit_api_article;
+            DROP FUNCTION aarons_kit_api_set_change_seq();
+            DROP SEQUENCE aarons_kit_api_change_seq;
+            """,
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.0.3 on 2026-10-18 08:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aarons_kit_api', '0012_change_seq'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IssueScrape',
+            fields=[
+                ('issue', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='scrape', serialize=False, to='aarons_kit_api.issue')),
+                ('due', models.DateTimeField(db_index=True)),
+                ('lease', models.UUIDField(db_index=True, null=True)),
+                ('owner', models.CharField(blank=True, max_length=200)),
+                ('scraped', models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.RunSQL(
+            sql="""
+            INSERT INTO aarons_kit_api_issuescrape (issue_id, due, owner)
+            SELECT "issueID", now(), '' FROM aarons_kit_api_issue;
+
+            -- every issue, however it was inserted, is due to be scraped
+            CREATE FUNCTION aarons_kit_api_add_issue_scrapes() RETURNS trigger AS $$
+            BEGIN
+                INSERT INTO aarons_kit_api_issuescrape (issue_id, due, owner)
+                SELECT "issueID", now(), '' FROM issues
+                ON CONFLICT (issue_id) DO NOTHING;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+
+            CREATE TRIGGER add_issue_scrapes
+            AFTER INSERT ON aarons_kit_api_issue
+            REFERENCING NEW TABLE AS issues
+            FOR EACH STATEMENT EXECUTE FUNCTION aarons_kit_api_add_issue_scrapes();
+            """,
+            reverse_sql="""
+            DROP TRIGGER add_issue_scrapes ON aarons_kit_api_issue;
+            DROP FUNCTION aarons_kit_api_add_issue_scrapes();
+            """,
+        ),
+    ]
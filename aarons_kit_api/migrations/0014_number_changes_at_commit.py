@@ -0,0 +1,106 @@
+# Generated by Django 4.0.3 on 2026-10-18 11:02
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aarons_kit_api', '0013_issue_scrape'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql="""
+            -- rows a transaction writes are left unnumbered (NULL) until it
+            -- commits, so writers no longer wait for each other to finish
+            CREATE OR REPLACE FUNCTION aarons_kit_api_set_change_seq() RETURNS trigger AS $$
+            BEGIN
+                IF current_setting('aarons_kit_api.changes', true) = 'numbering' THEN
+                    RETURN NEW;
+                END IF;
+                NEW.change_seq := NULL;
+                IF current_setting('aarons_kit_api.changes', true) IS DISTINCT FROM 'pending' THEN
+                    PERFORM set_config('aarons_kit_api.changes', 'pending', true);
+                END IF;
+                RETURN NEW;
+            END;
+            $$ LANGUAGE plpgsql;
+
+            -- then a deferred trigger numbers them as the last thing before
+            -- commit, one committing transaction at a time, so numbers follow
+            -- commit order and a reader that has seen a number never misses a
+            -- lower one. The first of its events numbers every row, the rest
+            -- find nothing pending
+            CREATE FUNCTION aarons_kit_api_number_changes() RETURNS trigger AS $$
+            BEGIN
+                IF current_setting('aarons_kit_api.changes', true) IS DISTINCT FROM 'pending' THEN
+                    RETURN NULL;
+                END IF;
+                PERFORM set_config('aarons_kit_api.changes', 'numbering', true);
+                PERFORM pg_advisory_xact_lock(hashtext('aarons_kit_api_change_seq'));
+                UPDATE aarons_kit_api_journal SET change_seq = nextval('aarons_kit_api_change_seq')
+                WHERE change_seq IS NULL;
+                UPDATE aarons_kit_api_issue SET change_seq = nextval('aarons_kit_api_change_seq')
+                WHERE change_seq IS NULL;
+                UPDATE aarons_kit_api_author SET change_seq = nextval('aarons_kit_api_change_seq')
+                WHERE change_seq IS NULL;
+                UPDATE aarons_kit_api_article SET change_seq = nextval('aarons_kit_api_change_seq')
+                WHERE change_seq IS NULL;
+                PERFORM set_config('aarons_kit_api.changes', '', true);
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+
+            CREATE CONSTRAINT TRIGGER change_seq_number AFTER INSERT OR UPDATE ON aarons_kit_api_journal
+            DEFERRABLE INITIALLY DEFERRED FOR EACH ROW WHEN (NEW.change_seq IS NULL)
+            EXECUTE FUNCTION aarons_kit_api_number_changes();
+            CREATE CONSTRAINT TRIGGER change_seq_number AFTER INSERT OR UPDATE ON aarons_kit_api_issue
+            DEFERRABLE INITIALLY DEFERRED FOR EACH ROW WHEN (NEW.change_seq IS NULL)
+            EXECUTE FUNCTION aarons_kit_api_number_changes();
+            CREATE CONSTRAINT TRIGGER change_seq_number AFTER INSERT OR UPDATE ON aarons_kit_api_author
+            DEFERRABLE INITIALLY DEFERRED FOR EACH ROW WHEN (NEW.change_seq IS NULL)
+            EXECUTE FUNCTION aarons_kit_api_number_changes();
+            CREATE CONSTRAINT TRIGGER change_seq_number AFTER INSERT OR UPDATE ON aarons_kit_api_article
+            DEFERRABLE INITIALLY DEFERRED FOR EACH ROW WHEN (NEW.change_seq IS NULL)
+            EXECUTE FUNCTION aarons_kit_api_number_changes();
+
+            -- articles whose authors change are renumbered too, unless they're
+            -- already waiting for a number, like the articles ingest inserts
+            CREATE OR REPLACE FUNCTION aarons_kit_api_move_linked_articles() RETURNS trigger AS $$
+            BEGIN
+                UPDATE aarons_kit_api_article AS article
+                SET change_seq = NULL
+                WHERE article."articleID" IN (SELECT article_id FROM links)
+                    AND article.change_seq IS NOT NULL;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+            """,
+            reverse_sql="""
+            DROP TRIGGER change_seq_number ON aarons_kit_api_journal;
+            DROP TRIGGER change_seq_number ON aarons_kit_api_issue;
+            DROP TRIGGER change_seq_number ON aarons_kit_api_author;
+            DROP TRIGGER change_seq_number ON aarons_kit_api_article;
+            DROP FUNCTION aarons_kit_api_number_changes();
+
+            CREATE OR REPLACE FUNCTION aarons_kit_api_set_change_seq() RETURNS trigger AS $$
+            BEGIN
+                PERFORM pg_advisory_xact_lock(hashtext('aarons_kit_api_change_seq'));
+                NEW.change_seq := nextval('aarons_kit_api_change_seq');
+                RETURN NEW;
+            END;
+            $$ LANGUAGE plpgsql;
+
+            CREATE OR REPLACE FUNCTION aarons_kit_api_move_linked_articles() RETURNS trigger AS $$
+            BEGIN
+                UPDATE aarons_kit_api_article AS article
+                SET change_seq = NULL
+                WHERE article."articleID" IN (SELECT article_id FROM links)
+                    AND article.xmin::text::bigint <> txid_current() % 4294967296;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+            """,
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.0.3 on 2026-10-18 11:40
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aarons_kit_api', '0014_number_changes_at_commit'),
+    ]
+
+    operations = [
+        # issues stored from scraped metadata are recorded as scraped by ingest
+        # and load_metadata, only those that existed before 0013 were due at once
+        migrations.RunSQL(
+            sql="""
+            DROP TRIGGER add_issue_scrapes ON aarons_kit_api_issue;
+            DROP FUNCTION aarons_kit_api_add_issue_scrapes();
+            """,
+            reverse_sql="""
+            CREATE FUNCTION aarons_kit_api_add_issue_scrapes() RETURNS trigger AS $$
+            BEGIN
+                INSERT INTO aarons_kit_api_issuescrape (issue_id, due, owner)
+                SELECT "issueID", now(), '' FROM issues
+                ON CONFLICT (issue_id) DO NOTHING;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+
+            CREATE TRIGGER add_issue_scrapes
+            AFTER INSERT ON aarons_kit_api_issue
+            REFERENCING NEW TABLE AS issues
+            FOR EACH STATEMENT EXECUTE FUNCTION aarons_kit_api_add_issue_scrapes();
+            """,
+        ),
+    ]
@@ -1,34 +1,145 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 
 
 class Journal(models.Model):
     journalID = models.AutoField(primary_key=True)
-    issn = models.CharField(max_length=50)
+    issn = models.CharField(max_length=50, unique=True)
     altISSN = models.CharField(max_length=50)
-    journalName = models.CharField(max_length=100)
+    journalName = models.CharField(max_length=100, db_index=True)
+    # numbered by the database on every insert and update, see changes.py
+    change_seq = models.BigIntegerField(null=True, editable=False, db_index=True)
 
 
 class Issue(models.Model):
     issueID = models.AutoField(primary_key=True)
-    issueJstorID = models.CharField(max_length=50)
+    issueJstorID = models.CharField(max_length=50, unique=True)
     year = models.IntegerField()
     volume = models.IntegerField()
     number = models.IntegerField()
     journal = models.ForeignKey(
         Journal, on_delete=models.CASCADE, related_name="issues"
     )
+    change_seq = models.BigIntegerField(null=True, editable=False, db_index=True)
+
+    class Meta:
+        indexes = [
+            # year range and journal filters on articles join through issues
+            models.Index(fields=["year", "journal"], name="issue_year_journal_idx"),
+        ]
 
 
 class Author(models.Model):
     authorID = models.AutoField(primary_key=True)
     authorName = models.CharField(max_length=200)
+    # see authors.author_name_key
+    name_key = models.CharField(max_length=200, unique=True)
+    change_seq = models.BigIntegerField(null=True, editable=False, db_index=True)
+
+
+class PDF(models.Model):
+    """
+    A PDF stored under MEDIA_ROOT by the sha256 of its content, see
+    pdfs.store_pdf, so articles with the same file share one copy.
+    """
+
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    size = models.BigIntegerField()
+    uploaded = models.DateTimeField(auto_now_add=True)
 
 
 class Article(models.Model):
     articleID = models.AutoField(primary_key=True)
-    title = models.CharField(max_length=500)
+    title = models.CharField(max_length=500, db_index=True)
     abstract = models.TextField()  # nullable
     url = models.CharField(max_length=1000)
-    articleJstorID = models.CharField(max_length=50)
+    articleJstorID = models.CharField(max_length=50, unique=True)
     issue = models.ForeignKey(Issue, on_delete=models.CASCADE, related_name="articles")
     authors = models.ManyToManyField(Author)
+    pdf = models.ForeignKey(
+        PDF, null=True, on_delete=models.PROTECT, related_name="articles"
+    )
+    # title, abstract and author names, maintained by search.update_search_vectors
+    search_vector = SearchVectorField(null=True, editable=False)
+    # also moved when authors are linked or unlinked
+    change_seq = models.BigIntegerField(null=True, editable=False, db_index=True)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=["search_vector"]),
+            # filtered article pages are read in articleID order per issue
+            models.Index(fields=["issue", "articleID"], name="article_issue_id_idx"),
+        ]
+
+
+class JournalStatistics(models.Model):
+    """
+    Per-journal coverage, kept up to date by ingest through
+    statistics.update_journal_statistics so the catalogue never aggregates
+    articles on request.
+    """
+
+    journal = models.OneToOneField(
+        Journal, on_delete=models.CASCADE, primary_key=True, related_name="statistics"
+    )
+    articleCount = models.IntegerField(default=0)
+    issueCount = models.IntegerField(default=0)
+    authorCount = models.IntegerField(default=0)
+    firstYear = models.IntegerField(null=True)
+    lastYear = models.IntegerField(null=True)
+
+
+class ReferenceExtraction(models.Model):
+    """
+    The references refextract found in a PDF, by the sha256 of the file, so
+    the same file is never extracted twice.
+    """
+
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    references = models.JSONField()
+    extracted = models.DateTimeField(auto_now_add=True)
+
+
+class Citation(models.Model):
+    """
+    An article citing another, resolved from the references of the citing
+    article's PDF by citations.resolve_references.
+    """
+
+    # the unique constraint indexes the references of an article and the
+    # second index its citations, so neither needs its own foreign key index
+    citing = models.ForeignKey(
+        Article, on_delete=models.CASCADE, related_name="references", db_index=False
+    )
+    cited = models.ForeignKey(
+        Article, on_delete=models.CASCADE, related_name="cited_by", db_index=False
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["citing", "cited"], name="citation_citing_cited_unique"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["cited", "citing"], name="citation_cited_citing_idx"),
+        ]
+
+
+class IssueScrape(models.Model):
+    """
+    When an issue is next due to be scraped and the lease of the scraper
+    working on it, see scraping.py. Ingest and load_metadata add one for
+    every issue they store.
+    """
+
+    issue = models.OneToOneField(
+        Issue, on_delete=models.CASCADE, primary_key=True, related_name="scrape"
+    )
+    # claimable from then on: when its lease runs out or when its last scrape
+    # goes stale
+    due = models.DateTimeField(db_index=True)
+    lease = models.UUIDField(null=True, db_index=True)
+    owner = models.CharField(max_length=200, blank=True)
+    scraped = models.DateTimeField(null=True)
@@ -0,0 +1,37 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class ArticleCursorPagination(CursorPagination):
+    """
+    Keyset pagination on the primary key, so every page is an index range scan
+    no matter how deep into the table it is.
+    """
+
+    ordering = "articleID"
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+
+
+class JournalCursorPagination(ArticleCursorPagination):
+    ordering = "journalID"
+
+
+class SearchPagination(PageNumberPagination):
+    """
+    Search results are ordered by rank, which has no stable keyset to page on,
+    and are read from the top, so they are paged by number.
+    """
+
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+
+
+def paginate(request, queryset, serializer_class, pagination_class):
+    paginator = pagination_class()
+    fields = serializer_class.get_requested_fields(request)
+    queryset = serializer_class.setup_eager_loading(queryset, fields)
+    page = paginator.paginate_queryset(queryset, request)
+    serializer = serializer_class(page, many=True, fields=fields)
+    return paginator.get_paginated_response(serializer.data)
@@ -0,0 +1,140 @@
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from aarons_kit_api.models import PDF
+
+PDF_DIRECTORY = "pdfs"
+PDF_MAGIC = b"%PDF-"
+
+# stamps a PDF as just uploaded, waiting for delete_unused_pdfs to let go of
+# it and adding it again if that deleted it
+UPSERT_PDF_SQL = """
+INSERT INTO aarons_kit_api_pdf (sha256, size, uploaded) VALUES (%s, %s, now())
+ON CONFLICT (sha256) DO UPDATE SET uploaded = EXCLUDED.uploaded
+RETURNING sha256, size, uploaded
+"""
+
+
+class PDFUploadError(ValueError):
+    """
+    An upload store_pdf rejected, with the HTTP status to answer it with.
+    """
+
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+def pdf_name(sha256):
+    """
+    Returns the path of a stored PDF relative to MEDIA_ROOT, spread over two
+    levels of directories so none of them grows too large.
+    """
+    return "%s/%s/%s/%s.pdf" % (PDF_DIRECTORY, sha256[:2], sha256[2:4], sha256)
+
+
+def pdf_path(sha256):
+    return os.path.join(settings.MEDIA_ROOT, pdf_name(sha256))
+
+
+def store_pdf(stream, chunk_size=64 * 1024):
+    """
+    Copies a PDF from a file-like stream into the store, hashing it on the way
+    so it's never held in memory, and returns its PDF row. A file that is
+    already stored is only hashed.
+    """
+    directory = os.path.join(settings.MEDIA_ROOT, PDF_DIRECTORY)
+    os.makedirs(directory, exist_ok=True)
+
+    digest = hashlib.sha256()
+    size = 0
+    # in the store's directory, so it can be renamed into place
+    with tempfile.NamedTemporaryFile(dir=directory, suffix=".tmp", delete=False) as f:
+        try:
+            head = b""
+            while len(head) < len(PDF_MAGIC) and (
+                chunk := stream.read(len(PDF_MAGIC) - len(head))
+            ):
+                head += chunk
+            if not head:
+                raise PDFUploadError("The file is empty", 400)
+            if head != PDF_MAGIC:
+                raise PDFUploadError("The file is not a PDF", 415)
+
+            chunk = head
+            while chunk:
+                size += len(chunk)
+                if size > settings.PDF_MAX_UPLOAD_SIZE:
+                    raise PDFUploadError(
+                        "PDFs can be at most %d bytes" % settings.PDF_MAX_UPLOAD_SIZE,
+                        413,
+                    )
+                digest.update(chunk)
+                f.write(chunk)
+                chunk = stream.read(chunk_size)
+
+            f.flush()
+            os.fsync(f.fileno())
+        except BaseException:
+            os.unlink(f.name)
+            raise
+
+    # the row is stamped before the file is checked, so delete_unused_pdfs
+    # can't remove the file of a PDF that is being uploaded again
+    with connection.cursor() as cursor:
+        cursor.execute(UPSERT_PDF_SQL, [digest.hexdigest(), size])
+        pdf = PDF.from_db(None, ["sha256", "size", "uploaded"], cursor.fetchone())
+
+    path = pdf_path(pdf.sha256)
+    if os.path.exists(path):
+        os.unlink(f.name)
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # readable by nginx, which serves it
+        os.chmod(f.name, 0o644)
+        os.replace(f.name, path)
+
+    return pdf
+
+
+def delete_unused_pdfs(uploaded_before, batch_size=1000):
+    """
+    Deletes the PDFs, rows and files, that no article refers to any more and
+    that were last uploaded before uploaded_before, and returns how many.
+    The grace period leaves alone PDFs whose upload hasn't linked them to
+    their article yet.
+    """
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            locked = list(
+                PDF.objects.filter(articles=None, uploaded__lt=uploaded_before)
+                .select_for_update(skip_locked=True, of=("self",))
+                .values_list("sha256", flat=True)[:batch_size]
+            )
+            if not locked:
+                return deleted
+
+            # checked again now that they're locked, in case an article was
+            # linked to one since
+            unused = list(
+                PDF.objects.filter(pk__in=locked, articles=None).values_list(
+                    "sha256", flat=True
+                )
+            )
+            PDF.objects.filter(pk__in=unused).delete()
+            # before committing, while the rows are still locked against
+            # store_pdf
+            for sha256 in unused:
+                try:
+                    os.unlink(pdf_path(sha256))
+                except FileNotFoundError:
+                    pass
+            deleted += len(unused)
+
+        if len(locked) < batch_size:
+            return deleted
@@ -0,0 +1,49 @@
+import orjson
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from aarons_kit_api.metrics import record_time
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# dates, decimals, lazy strings etc. are converted the way DRF's encoder does
+_encoder = JSONEncoder()
+
+
+class ORJSONRenderer(BaseRenderer):
+    """
+    Drop-in replacement for DRF's JSONRenderer that encodes with orjson.
+    """
+
+    media_type = "application/json"
+    format = "json"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+
+        with record_time("render_seconds"):
+            return orjson.dumps(data, default=_encoder.default)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    Binary responses for clients that send Accept: application/msgpack. Only
+    registered when the optional msgpack package is installed.
+    """
+
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+
+        with record_time("render_seconds"):
+            return msgpack.packb(data, default=_encoder.default)
@@ -0,0 +1,179 @@
+import asyncio
+import random
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+from django.urls import Resolver404, resolve
+
+from aarons_kit_api.cache import last_modified
+
+# set by clients that just wrote, so they read their writes from the primary
+STICKY_COOKIE = "primary_until"
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# replica alias -> when it may be tried again after failing to connect
+_unavailable = {}
+
+
+def replica_safe(view):
+    """
+    Marks a view that only reads although it isn't called with GET, like a
+    POST with a body too large for a query string, so ReplicaMiddleware lets
+    it read from a replica and doesn't stick its client to the primary.
+    """
+    view.replica_safe = True
+    return view
+
+
+def reads_only(request):
+    if request.method in SAFE_METHODS:
+        return True
+    try:
+        match = resolve(request.path_info, getattr(request, "urlconf", None))
+    except Resolver404:
+        return False
+    return getattr(match.func, "replica_safe", False)
+
+
+class ReplicaReads:
+    """
+    Picks the replica the current request reads from the first time it
+    queries, skipping replicas that can't be connected to and falling back to
+    the primary when none can.
+    """
+
+    def __init__(self):
+        self.alias = None
+
+    def get_alias(self):
+        if self.alias is None:
+            self.alias = pick_replica()
+        return self.alias
+
+
+# None (the default, also for Celery tasks and commands) reads from the primary
+_replica_reads = ContextVar("aarons_kit_replica_reads", default=None)
+
+
+def pick_replica():
+    now = time.monotonic()
+    replicas = [
+        alias
+        for alias in settings.DATABASE_REPLICAS
+        if _unavailable.get(alias, 0) <= now
+    ]
+    random.shuffle(replicas)
+
+    for alias in replicas:
+        try:
+            connections[alias].ensure_connection()
+        except OperationalError:
+            _unavailable[alias] = now + settings.DATABASE_REPLICA_RETRY_SECONDS
+            continue
+        return alias
+
+    return DEFAULT_DB_ALIAS
+
+
+class ReplicaRouter:
+    """
+    Sends the reads of requests ReplicaMiddleware allows to a replica and
+    everything else, including every write, to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        replica_reads = _replica_reads.get()
+        if replica_reads is None:
+            return DEFAULT_DB_ALIAS
+        return replica_reads.get_alias()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaMiddleware:
+    """
+    Lets GET requests, and views marked replica_safe, read from a replica,
+    unless:
+
+    - the client wrote recently, which a cookie set on its write records, so
+      it reads its own writes;
+    - the catalogue or citations changed within DATABASE_REPLICA_LAG_SECONDS,
+      so a lagging replica can't fill the response cache under the new
+      version.
+
+    Writes, and reads made outside requests like in Celery tasks, always go
+    to the primary.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+
+        token = _replica_reads.set(self.replica_reads(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _replica_reads.reset(token)
+
+        return self.stick(request, response)
+
+    async def __acall__(self, request):
+        replica_reads = await sync_to_async(self.replica_reads, thread_sensitive=False)(
+            request
+        )
+
+        token = _replica_reads.set(replica_reads)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _replica_reads.reset(token)
+
+        return self.stick(request, response)
+
+    def replica_reads(self, request):
+        if not settings.DATABASE_REPLICAS or not reads_only(request):
+            return None
+
+        modified = last_modified()
+        now = time.time()
+        if now - modified < settings.DATABASE_REPLICA_LAG_SECONDS:
+            return None
+
+        try:
+            if float(request.COOKIES.get(STICKY_COOKIE, 0)) > now:
+                return None
+        except ValueError:
+            pass
+
+        return ReplicaReads()
+
+    def stick(self, request, response):
+        if (
+            settings.DATABASE_REPLICAS
+            and response.status_code < 400
+            and not reads_only(request)
+        ):
+            lag = settings.DATABASE_REPLICA_LAG_SECONDS
+            response.set_cookie(
+                STICKY_COOKIE, str(time.time() + lag), max_age=lag, samesite="Lax"
+            )
+        return response
@@ -0,0 +1,88 @@
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from aarons_kit_api.models import IssueScrape
+
+
+def claim_issues(owner, count, lease_seconds, journal=None):
+    """
+    Leases up to count issues that are due to be scraped, optionally of one
+    journal, to owner for lease_seconds. Returns the lease, when it expires
+    and the ids of the issues.
+
+    Due issues are locked with SKIP LOCKED, so scrapers claiming at the same
+    time take different issues instead of waiting for each other. A lease
+    that runs out makes its issues due again, so they are reclaimed without
+    anything having to sweep them.
+    """
+    now = timezone.now()
+    lease = uuid.uuid4()
+    expires = now + timedelta(seconds=lease_seconds)
+
+    scrapes = IssueScrape.objects.filter(due__lte=now)
+    if journal is not None:
+        scrapes = scrapes.filter(issue__journal=journal)
+
+    with transaction.atomic():
+        issue_ids = list(
+            scrapes.order_by("due")
+            .select_for_update(skip_locked=True, of=("self",))
+            .values_list("issue_id", flat=True)[:count]
+        )
+        IssueScrape.objects.filter(issue_id__in=issue_ids).update(
+            due=expires, lease=lease, owner=owner
+        )
+
+    return lease, expires, issue_ids
+
+
+def record_scraped(issue_ids):
+    """
+    Records issues stored from freshly scraped metadata as scraped now, due
+    once SCRAPE_STALE_SECONDS have passed, unless they already have a record.
+    """
+    now = timezone.now()
+    IssueScrape.objects.bulk_create(
+        [
+            IssueScrape(
+                issue_id=issue_id,
+                due=now + timedelta(seconds=settings.SCRAPE_STALE_SECONDS),
+                scraped=now,
+            )
+            for issue_id in sorted(issue_ids)
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def renew_lease(lease, lease_seconds):
+    """
+    Extends a lease on the issues it still holds, which is all of them unless
+    it ran out and they were claimed again. Returns the new expiry and how
+    many issues it holds.
+    """
+    expires = timezone.now() + timedelta(seconds=lease_seconds)
+    renewed = IssueScrape.objects.filter(lease=lease).update(due=expires)
+    return expires, renewed
+
+
+def complete_lease(lease, issue_ids=None):
+    """
+    Marks the issues of a lease, or the given ones of them, as scraped, due
+    again once SCRAPE_STALE_SECONDS have passed. Returns how many there were.
+    """
+    now = timezone.now()
+    scrapes = IssueScrape.objects.filter(lease=lease)
+    if issue_ids is not None:
+        scrapes = scrapes.filter(issue_id__in=issue_ids)
+
+    return scrapes.update(
+        due=now + timedelta(seconds=settings.SCRAPE_STALE_SECONDS),
+        lease=None,
+        owner="",
+        scraped=now,
+    )
@@ -0,0 +1,46 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import F
+
+from aarons_kit_api.models import Article
+
+SEARCH_CONFIG = "english"
+
+# weights: title A, abstract B, author names C
+UPDATE_SEARCH_VECTORS_SQL = """
+UPDATE aarons_kit_api_article AS article
+SET search_vector =
+    setweight(to_tsvector('english', article.title), 'A')
+    || setweight(to_tsvector('english', article.abstract), 'B')
+    || setweight(to_tsvector('english', coalesce((
+        SELECT string_agg(author."authorName", ' ')
+        FROM aarons_kit_api_article_authors AS article_author
+        JOIN aarons_kit_api_author AS author
+            ON author."authorID" = article_author.author_id
+        WHERE article_author.article_id = article."articleID"
+    ), '')), 'C')
+WHERE article."articleID" = ANY(%s)
+"""
+
+
+def update_search_vectors(article_ids):
+    """
+    Rebuilds the stored search vector of the given articles in one statement.
+    Ingest calls this for every article in a batch once its authors are linked.
+    """
+    article_ids = list(article_ids)
+    if not article_ids:
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(UPDATE_SEARCH_VECTORS_SQL, [article_ids])
+
+
+def ranked_articles(text):
+    query = SearchQuery(text, config=SEARCH_CONFIG, search_type="websearch")
+
+    return (
+        Article.objects.filter(search_vector=query)
+        .annotate(rank=SearchRank(F("search_vector"), query))
+        .order_by("-rank", "articleID")
+    )
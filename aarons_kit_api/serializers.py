@@ -1,25 +1,139 @@
 from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
 from aarons_kit_api.models import (
     Journal,
     Issue,
     Article,
     Author,
 )
+from aarons_kit_api.metrics import record_time
 
 
-class JournalSerializer(serializers.ModelSerializer):
+class TimedListSerializer(serializers.ListSerializer):
+    """
+    Records the time spent serializing a whole list, rather than each row.
+    """
+
+    @property
+    def data(self):
+        with record_time("serializer_seconds"):
+            return super().data
+
+
+class EagerLoadingMixin:
+    """
+    Declares the relations a serializer's fields read, so views can load them
+    with the queryset instead of one query per serialized row. A fields
+    argument (from ?fields=) drops the other fields from the output and from
+    the columns and relations the queryset loads.
+    """
+
+    select_related_fields = ()
+    prefetch_related_fields = ()
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop("fields", None)
+        super().__init__(*args, **kwargs)
+
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    @property
+    def data(self):
+        with record_time("serializer_seconds"):
+            return super().data
+
+    @classmethod
+    def get_requested_fields(cls, request):
+        value = request.query_params.get("fields")
+        if not value:
+            return None
+
+        fields = [name.strip() for name in value.split(",") if name.strip()]
+        unknown = set(fields) - set(cls.Meta.fields)
+        if unknown:
+            raise ValidationError(
+                {"fields": "unknown fields: %s" % ", ".join(sorted(unknown))}
+            )
+        return fields
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, fields=None):
+        select_related = cls.select_related_fields
+        prefetch_related = cls.prefetch_related_fields
+
+        if fields is not None:
+            serializer_fields = cls().fields
+            columns = [queryset.model._meta.pk.name]
+            select_related = []
+            prefetch_related = []
+
+            for name in fields:
+                path = serializer_fields[name].source.split(".")
+                if path[0] in cls.prefetch_related_fields:
+                    prefetch_related.append(path[0])
+                elif path[0] in cls.select_related_fields:
+                    select_related.append(path[0])
+                    columns.append("__".join(path))
+                else:
+                    columns.append(path[0])
+
+            queryset = queryset.only(*columns)
+
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        return queryset
+
+
+class JournalSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    class Meta:
+        list_serializer_class = TimedListSerializer
+        model = Journal
+        fields = (
+            "journalID",
+            "issn",
+            "altISSN",
+            "journalName",
+        )
+
+
+class JournalCatalogueSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    articleCount = serializers.IntegerField(
+        source="statistics.articleCount", read_only=True
+    )
+    issueCount = serializers.IntegerField(
+        source="statistics.issueCount", read_only=True
+    )
+    authorCount = serializers.IntegerField(
+        source="statistics.authorCount", read_only=True
+    )
+    firstYear = serializers.IntegerField(source="statistics.firstYear", read_only=True)
+    lastYear = serializers.IntegerField(source="statistics.lastYear", read_only=True)
+
+    select_related_fields = ("statistics",)
+
     class Meta:
+        list_serializer_class = TimedListSerializer
         model = Journal
         fields = (
             "journalID",
             "issn",
             "altISSN",
             "journalName",
+            "articleCount",
+            "issueCount",
+            "authorCount",
+            "firstYear",
+            "lastYear",
         )
 
 
-class IssueSerializer(serializers.ModelSerializer):
+class IssueSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     class Meta:
+        list_serializer_class = TimedListSerializer
         model = Issue
         fields = (
             "issueID",
@@ -31,8 +145,9 @@ class IssueSerializer(serializers.ModelSerializer):
         )
 
 
-class AuthorSerializer(serializers.ModelSerializer):
+class AuthorSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     class Meta:
+        list_serializer_class = TimedListSerializer
         model = Author
         fields = (
             "authorID",
@@ -40,10 +155,13 @@ class AuthorSerializer(serializers.ModelSerializer):
         )
 
 
-class ArticleSerializer(serializers.ModelSerializer):
+class ArticleSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     authors = AuthorSerializer(read_only=True, many=True)
 
+    prefetch_related_fields = ("authors",)
+
     class Meta:
+        list_serializer_class = TimedListSerializer
         model = Article
         fields = (
             "articleID",
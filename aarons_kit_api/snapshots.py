@@ -0,0 +1,220 @@
+import gzip
+import hashlib
+import io
+import itertools
+import json
+import os
+import shutil
+import time
+from datetime import datetime, timezone
+
+from django.db import connection, transaction
+
+from aarons_kit_api.cache import get_catalogue_version
+from aarons_kit_api.changes import latest_change_seq
+from aarons_kit_api.export import iter_articles
+from aarons_kit_api.models import Article, Author, Issue, Journal
+from aarons_kit_api.serializers import (
+    AuthorSerializer,
+    IssueSerializer,
+    JournalSerializer,
+)
+
+MANIFEST_NAME = "manifest.json"
+# created in a snapshot directory once no manifest lists it, to delete it
+# after a grace period
+RETIRED_NAME = ".retired"
+
+# one run at a time writes snapshots and deletes old ones, across every host
+# sharing the snapshot root
+LOCK_SNAPSHOTS_SQL = "SELECT pg_advisory_lock(hashtext('aarons_kit_api_snapshots'))"
+UNLOCK_SNAPSHOTS_SQL = "SELECT pg_advisory_unlock(hashtext('aarons_kit_api_snapshots'))"
+
+# tables written as rows shaped like their serializer output, in the order
+# clients should load them
+TABLES = (
+    ("journals", Journal, JournalSerializer.Meta.fields),
+    ("issues", Issue, IssueSerializer.Meta.fields),
+    ("authors", Author, AuthorSerializer.Meta.fields),
+)
+
+
+def iter_tables(since, chunk_size):
+    """
+    Yields the name and rows of every table, all of them, or only those
+    inserted or updated after the change sequence number since.
+    """
+    for name, model, fields in TABLES:
+        rows = model.objects.filter(change_seq__gt=since)
+        yield name, rows.order_by("pk").values(*fields).iterator(chunk_size=chunk_size)
+
+    yield "articles", iter_articles(
+        chunk_size, Article.objects.filter(change_seq__gt=since)
+    )
+
+
+def write_shards(directory, name, rows, shard_rows):
+    """
+    Writes rows as gzip-compressed NDJSON files of up to shard_rows rows each
+    and returns their manifest entries.
+    """
+    files = []
+    rows = iter(rows)
+    # each pass takes the first row of the next shard
+    for first in rows:
+        shard = itertools.chain([first], itertools.islice(rows, shard_rows - 1))
+        filename = "%s-%05d.ndjson.gz" % (name, len(files))
+        files.append(write_shard(directory, filename, shard))
+        files[-1]["table"] = name
+    return files
+
+
+def write_shard(directory, filename, rows):
+    path = os.path.join(directory, filename)
+    count = 0
+    # mtime=0 so the same rows always compress to the same bytes
+    with gzip.GzipFile(path, "wb", mtime=0) as compressed:
+        with io.TextIOWrapper(compressed, encoding="utf-8") as shard:
+            for row in rows:
+                shard.write(json.dumps(row, separators=(",", ":")) + "\n")
+                count += 1
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+
+    return {
+        "path": filename,
+        "rows": count,
+        "bytes": os.path.getsize(path),
+        "sha256": digest.hexdigest(),
+    }
+
+
+def read_manifest(root):
+    try:
+        with open(os.path.join(root, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_manifest(root, manifest):
+    path = os.path.join(root, MANIFEST_NAME)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def delete_retired(root, listed, grace_seconds):
+    """
+    Deletes the snapshot directories under root that no manifest has listed
+    for grace_seconds, so clients that read an earlier manifest can finish
+    downloading them, and those of runs that failed before listing theirs.
+    """
+    now = time.time()
+    for entry in os.scandir(root):
+        if not entry.is_dir() or entry.name in listed:
+            continue
+
+        # never listed, and no run is writing it while we hold the lock
+        if entry.name.startswith("."):
+            shutil.rmtree(entry.path)
+            continue
+
+        marker = os.path.join(entry.path, RETIRED_NAME)
+        try:
+            retired = os.path.getmtime(marker)
+        except FileNotFoundError:
+            open(marker, "w").close()
+            retired = now
+        if retired <= now - grace_seconds:
+            shutil.rmtree(entry.path)
+
+
+def create_snapshot(root, shard_rows, chunk_size, full=False, grace_seconds=0):
+    """
+    Writes the catalogue under root as a new snapshot directory and lists it
+    in root/manifest.json, after the snapshots it is a delta of. Clients load
+    the snapshots of the manifest in order, replacing rows by id.
+
+    The first snapshot, and any with full, holds every row and starts a new
+    chain; the rest hold the rows changed since the previous one. Snapshots a
+    full one replaced are deleted grace_seconds later. Returns the manifest
+    entry of the snapshot, or None if nothing changed.
+
+    Runs wait for each other, so they never write deltas of the same
+    snapshot or delete one another's directories.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(LOCK_SNAPSHOTS_SQL)
+    try:
+        snapshot = _create_snapshot(root, shard_rows, chunk_size, full)
+        # also when nothing changed, so retired snapshots go on time
+        manifest = read_manifest(root) or {"snapshots": []}
+        listed = {entry["id"] for entry in manifest["snapshots"]}
+        delete_retired(root, listed, grace_seconds)
+        return snapshot
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute(UNLOCK_SNAPSHOTS_SQL)
+
+
+def _create_snapshot(root, shard_rows, chunk_size, full):
+    os.makedirs(root, exist_ok=True)
+    manifest = read_manifest(root)
+    snapshots = [] if full or manifest is None else manifest["snapshots"]
+    # deltas follow the change sequence, see changes.py. Manifests from before
+    # it start a new chain
+    if snapshots and "changeSeq" not in snapshots[-1]:
+        snapshots = []
+    since = snapshots[-1]["changeSeq"] if snapshots else 0
+
+    # read before the rows, so a catalogue change the snapshot misses gets a
+    # newer version
+    version, _ = get_catalogue_version()
+    created = datetime.now(timezone.utc)
+    snapshot_id = created.strftime("%Y%m%dT%H%M%S%fZ")
+    directory = os.path.join(root, "." + snapshot_id)
+
+    # every table is read from one consistent view of the database
+    isolate = not connection.in_atomic_block
+    with transaction.atomic():
+        if isolate:
+            with connection.cursor() as cursor:
+                cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+
+        change_seq = latest_change_seq()
+        if snapshots and change_seq <= since:
+            return None
+
+        os.makedirs(directory)
+        files = []
+        for name, rows in iter_tables(since, chunk_size):
+            files.extend(write_shards(directory, name, rows, shard_rows))
+
+    os.rename(directory, os.path.join(root, snapshot_id))
+    for file in files:
+        file["path"] = "%s/%s" % (snapshot_id, file["path"])
+
+    snapshot = {
+        "id": snapshot_id,
+        "type": "delta" if snapshots else "full",
+        "created": created.isoformat(),
+        "catalogueVersion": version,
+        "since": since,
+        "changeSeq": change_seq,
+        "files": files,
+    }
+    snapshots.append(snapshot)
+    write_manifest(
+        root,
+        {
+            "catalogueVersion": version,
+            "created": snapshot["created"],
+            "snapshots": snapshots,
+        },
+    )
+
+    return snapshot
@@ -0,0 +1,84 @@
+from django.db import connection, transaction
+
+from aarons_kit_api.models import Journal
+
+# recomputes the statistics of the given journals from their issues, articles
+# and author links, which the journal foreign key indexes keep to that journal
+UPDATE_JOURNAL_STATISTICS_SQL = """
+INSERT INTO aarons_kit_api_journalstatistics
+    (journal_id, "articleCount", "issueCount", "authorCount", "firstYear", "lastYear")
+SELECT
+    journal."journalID",
+    articles.count,
+    issues.count,
+    authors.count,
+    issues.first_year,
+    issues.last_year
+FROM aarons_kit_api_journal AS journal
+CROSS JOIN LATERAL (
+    SELECT count(*) AS count, min(issue.year) AS first_year, max(issue.year) AS last_year
+    FROM aarons_kit_api_issue AS issue
+    WHERE issue.journal_id = journal."journalID"
+) AS issues
+CROSS JOIN LATERAL (
+    SELECT count(*) AS count
+    FROM aarons_kit_api_article AS article
+    JOIN aarons_kit_api_issue AS issue ON issue."issueID" = article.issue_id
+    WHERE issue.journal_id = journal."journalID"
+) AS articles
+CROSS JOIN LATERAL (
+    SELECT count(DISTINCT article_author.author_id) AS count
+    FROM aarons_kit_api_article_authors AS article_author
+    JOIN aarons_kit_api_article AS article
+        ON article."articleID" = article_author.article_id
+    JOIN aarons_kit_api_issue AS issue ON issue."issueID" = article.issue_id
+    WHERE issue.journal_id = journal."journalID"
+) AS authors
+WHERE journal."journalID" = ANY(%s)
+ON CONFLICT (journal_id) DO UPDATE SET
+    "articleCount" = EXCLUDED."articleCount",
+    "issueCount" = EXCLUDED."issueCount",
+    "authorCount" = EXCLUDED."authorCount",
+    "firstYear" = EXCLUDED."firstYear",
+    "lastYear" = EXCLUDED."lastYear"
+"""
+
+
+# one transaction at a time recounts a journal, taken in journal order so
+# ingests of overlapping journals can't deadlock
+LOCK_JOURNAL_STATISTICS_SQL = """
+SELECT pg_advisory_xact_lock(hashtext('aarons_kit_api_journalstatistics'), journal_id)
+FROM unnest(%s::integer[]) AS journal_id
+"""
+
+
+def update_journal_statistics(journal_ids):
+    """
+    Refreshes the summary row of every journal an ingest batch touched, in one
+    statement. The work is bounded by the size of those journals rather than
+    the corpus, and the catalogue reads the stored rows.
+
+    Must be called in a transaction. The journals are locked until it commits
+    and only then counted, in a statement of its own, so under READ COMMITTED
+    the counts include every concurrent ingest that committed before instead
+    of overwriting them with an older snapshot.
+    """
+    journal_ids = sorted(set(journal_ids))
+    if not journal_ids:
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(LOCK_JOURNAL_STATISTICS_SQL, [journal_ids])
+        cursor.execute(UPDATE_JOURNAL_STATISTICS_SQL, [journal_ids])
+
+
+def update_all_journal_statistics(chunk_size=1000):
+    """
+    Refreshes the summary rows of every journal, chunk_size journals per
+    transaction, as every journal takes an advisory lock until commit and a
+    large catalogue would run out of room in the lock table.
+    """
+    journal_ids = list(Journal.objects.order_by("pk").values_list("pk", flat=True))
+    for start in range(0, len(journal_ids), chunk_size):
+        with transaction.atomic():
+            update_journal_statistics(journal_ids[start : start + chunk_size])
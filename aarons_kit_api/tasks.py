@@ -0,0 +1,69 @@
+from celery import shared_task
+from django.conf import settings
+
+from aarons_kit_api.citations import (
+    cached_references,
+    resolve_references,
+    store_citations,
+)
+from aarons_kit_api.ingest import ingest_records
+
+
+def ingest_progress(processed, batches, rejected):
+    """
+    Counts the records processed so far that created an article, those whose
+    article was already stored and those rejected as invalid.
+    """
+    stored = sum(counts["records"] for counts in batches)
+    created = sum(counts["articles"] for counts in batches)
+
+    return {
+        "processed": processed,
+        "created": created,
+        "skipped": stored - created,
+        "rejected": len(rejected),
+    }
+
+
+@shared_task(bind=True)
+def ingest_metadata_task(self, articles_metadata, batch_size=None):
+    """
+    Stores an uploaded metadata payload in the background, reporting progress
+    after every committed batch so the job status endpoint can show it.
+    """
+    batch_size = batch_size or settings.INGEST_BATCH_SIZE
+
+    def on_batch(processed, batches, rejected):
+        self.update_state(
+            state="PROGRESS", meta=ingest_progress(processed, batches, rejected)
+        )
+
+    batches, rejected = ingest_records(
+        enumerate(articles_metadata, start=1), batch_size, on_batch=on_batch
+    )
+
+    return {
+        **ingest_progress(len(articles_metadata), batches, rejected),
+        "batches": batches,
+        "rejected": rejected,
+    }
+
+
+# acknowledged once done, so a PDF whose worker dies is handed to another
+@shared_task(acks_late=True)
+def extract_references_task(article_id, path):
+    """
+    Extracts the references of an article's PDF, unless a file with the same
+    content was extracted before, and stores the articles they cite. Every
+    worker process runs one at a time, so they spread over the cores of
+    every node running a worker.
+    """
+    references, cached = cached_references(path)
+    cited = store_citations(article_id, resolve_references(references))
+
+    return {
+        "article": article_id,
+        "references": len(references),
+        "cited": cited,
+        "cached": cached,
+    }
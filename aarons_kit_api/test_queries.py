@@ -0,0 +1,192 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from aarons_kit_api.models import (
+    Journal,
+    Issue,
+    Article,
+    Author,
+    Citation,
+)
+from aarons_kit_api.cache import bump_catalogue_version
+from aarons_kit_api.search import update_search_vectors
+
+client = Client()
+
+
+class TestQueryCounts(TestCase):
+    """
+    Every endpoint has to run a fixed number of queries however many articles
+    are stored, so an N+1 in a view or serializer fails here.
+    """
+
+    sizes = (10, 100, 1000)
+
+    def setUp(self):
+        cache.clear()
+        self.journal = Journal.objects.create(
+            issn="123", altISSN="", journalName="Journal of Animal Ecology"
+        )
+        self.issue = Issue.objects.create(
+            issueJstorID="1", year=1954, volume=23, number=2, journal=self.journal
+        )
+
+    def add_articles(self, count):
+        start = Article.objects.count()
+
+        authors = Author.objects.bulk_create(
+            Author(authorName="Author %d" % i, name_key="author %d" % i)
+            for i in range(start, start + count)
+        )
+        articles = Article.objects.bulk_create(
+            Article(
+                title="Article %d" % i,
+                abstract="",
+                url="",
+                articleJstorID=str(i),
+                issue=self.issue,
+            )
+            for i in range(start, start + count)
+        )
+
+        ArticleAuthor = Article.authors.through
+        ArticleAuthor.objects.bulk_create(
+            ArticleAuthor(article_id=article.pk, author_id=author.pk)
+            for article, author in zip(articles, authors)
+        )
+        update_search_vectors(article.pk for article in articles)
+        # numbers the changes, as committing would
+        connection.check_constraints()
+        bump_catalogue_version()
+
+    def assertNumQueriesAtEverySize(self, num, url):
+        stored = 0
+        for size in self.sizes:
+            self.add_articles(size - stored)
+            stored = size
+
+            with self.subTest(articles=size):
+                with CaptureQueriesContext(connection) as queries:
+                    response = client.get(url)
+                    if response.streaming:
+                        b"".join(response.streaming_content)
+
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(queries), num)
+
+    def test_get_available_articles(self):
+        self.assertNumQueriesAtEverySize(
+            2, "%s?page_size=1000" % reverse("get_available_articles")
+        )
+
+    def test_get_article_by_title(self):
+        self.assertNumQueriesAtEverySize(
+            2, "%s?title=Article 5" % reverse("get_article_by_title")
+        )
+
+    def test_search_articles(self):
+        self.assertNumQueriesAtEverySize(
+            3, "%s?q=article&page_size=1000" % reverse("search_articles")
+        )
+
+    def test_get_articles_by_year_range(self):
+        self.assertNumQueriesAtEverySize(
+            2, "%s?page_size=1000" % reverse("get_articles_by_year_range")
+        )
+
+    def test_check_article_by_title(self):
+        self.assertNumQueriesAtEverySize(
+            1, "%s?title=Article 5" % reverse("check_article_by_title")
+        )
+
+    def test_get_articles_by_author(self):
+        self.assertNumQueriesAtEverySize(
+            2, "%s?author=Author 5&page_size=1000" % reverse("get_articles_by_author")
+        )
+
+    def test_get_articles_from_journal(self):
+        self.assertNumQueriesAtEverySize(
+            2, "%s?page_size=1000" % reverse("get_articles_from_journal")
+        )
+
+    def test_check_article_by_author(self):
+        self.assertNumQueriesAtEverySize(
+            1, "%s?author=Author 5" % reverse("check_article_by_author")
+        )
+
+    def test_get_article_citations(self):
+        stored = 0
+        for size in self.sizes:
+            self.add_articles(size - stored)
+            stored = size
+
+            # the first article cites, and is cited by, every other one
+            first, *others = Article.objects.order_by("articleID").values_list(
+                "articleID", flat=True
+            )
+            Citation.objects.bulk_create(
+                [Citation(citing_id=first, cited_id=other) for other in others]
+                + [Citation(citing_id=other, cited_id=first) for other in others],
+                ignore_conflicts=True,
+            )
+            bump_catalogue_version()
+
+            for name in ("get_article_references", "get_article_cited_by"):
+                with self.subTest(name, articles=size):
+                    with CaptureQueriesContext(connection) as queries:
+                        response = client.get(
+                            "%s?page_size=500"
+                            % reverse(name, kwargs={"article_id": first})
+                        )
+
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(len(response.data["results"]), min(size - 1, 500))
+                    self.assertEqual(len(queries), 3)
+
+    def test_get_available_journals(self):
+        self.assertNumQueriesAtEverySize(1, reverse("get_available_journals"))
+
+    def test_get_journal_catalogue(self):
+        self.assertNumQueriesAtEverySize(1, reverse("get_journal_catalogue"))
+
+    def test_check_article_by_journal_name(self):
+        self.assertNumQueriesAtEverySize(
+            1,
+            "%s?journal=Journal of Animal Ecology"
+            % reverse("check_article_by_journal_name"),
+        )
+
+    def test_get_changes(self):
+        # the latest number for the cache key, the numbers of every table,
+        # then the rows of each and article authors
+        self.assertNumQueriesAtEverySize(
+            7, "%s?since=0&page_size=10000" % reverse("get_changes")
+        )
+
+    def test_find_missing_metadata(self):
+        for size in self.sizes:
+            with self.subTest(keys=size):
+                with CaptureQueriesContext(connection) as queries:
+                    response = client.post(
+                        reverse("find_missing_metadata"),
+                        data={
+                            "articleJstorIDs": [str(i) for i in range(size)],
+                            "issns": ["123"] * size,
+                        },
+                        content_type="application/json",
+                    )
+
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(queries), 2)
+
+    def test_export_articles(self):
+        for export_format in ("json", "ndjson"):
+            with self.subTest(export_format=export_format):
+                Article.objects.all().delete()
+                Author.objects.all().delete()
+                self.assertNumQueriesAtEverySize(
+                    2,
+                    reverse("export_articles", kwargs={"export_format": export_format}),
+                )
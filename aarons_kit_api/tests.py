@@ -1,47 +1,2029 @@
+import asyncio
+import base64
+import gzip
+import hashlib
+import io
 import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+from unittest import mock, skipUnless
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import Permission, User
+from django.core.cache import cache
 from django.core.management import call_command
-from django.test import TestCase, Client
-from django.urls import reverse
+from django.db import IntegrityError, connection, connections, transaction
+from django.test import (
+    TestCase,
+    TransactionTestCase,
+    Client,
+    RequestFactory,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
 from rest_framework import status
+from aarons_kit.asgi import application
 from aarons_kit_api.models import (
     Journal,
     Issue,
     Article,
     Author,
+    Citation,
+    IssueScrape,
+    JournalStatistics,
+    PDF,
+)
+from aarons_kit_api.authors import author_name_key, parse_author_names
+from aarons_kit_api.bulk_load import json_boundary, json_elements
+from aarons_kit_api.changes import changes_since
+from aarons_kit_api.citations import (
+    extract_references,
+    extract_references_from_file,
+    resolve_references,
+)
+from aarons_kit_api.cache import (
+    CATALOGUE_MODIFIED_KEY,
+    bump_catalogue_version,
+    get_catalogue_version,
+)
+from aarons_kit_api.compression import brotli, compress_cached, preferred_encoding
+from aarons_kit_api.corpus import generate_corpus
+from aarons_kit_api.filters import filter_articles
+from aarons_kit_api.ingest import ingest_metadata, validate_record
+from aarons_kit_api import membership
+from aarons_kit_api.membership import BloomFilter
+from aarons_kit_api.metrics import REGISTRY, start_task_metrics_server
+from aarons_kit_api.pdfs import PDFUploadError, pdf_path, store_pdf
+from aarons_kit_api.renderers import msgpack
+from aarons_kit_api.replicas import STICKY_COOKIE, _unavailable
+from aarons_kit_api.scraping import claim_issues
+from aarons_kit_api.serializers import ArticleSerializer
+from aarons_kit_api.snapshots import (
+    LOCK_SNAPSHOTS_SQL,
+    MANIFEST_NAME,
+    RETIRED_NAME,
+    UNLOCK_SNAPSHOTS_SQL,
+    create_snapshot,
+)
+from aarons_kit_api.statistics import (
+    update_all_journal_statistics,
+    update_journal_statistics,
+)
+
+client = Client()
+
+
+def number_changes():
+    """
+    Numbers the rows written so far in the test's transaction, as committing
+    it would.
+    """
+    connection.check_constraints()
+
+
+class TestArticle(TestCase):
+    def setUp(self):
+        cache.clear()
+        call_command("loaddata", "fixtures/test_fixtures", verbosity=0)
+
+    def test_get_available_articles(self):
+        response = client.get(reverse("get_available_articles"))
+
+        articles = Article.objects.all()
+
+        self.assertEqual(len(response.data["results"]), len(articles))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_get_available_articles_pages(self):
+        response = client.get("%s?page_size=2" % reverse("get_available_articles"))
+
+        self.assertEqual(
+            [article["articleID"] for article in response.data["results"]], [1, 2]
+        )
+        self.assertIsNone(response.data["previous"])
+
+        response = client.get(response.data["next"])
+
+        self.assertEqual(
+            [article["articleID"] for article in response.data["results"]], [3]
+        )
+        self.assertIsNone(response.data["next"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_get_article_by_title(self):
+        title = "The Larval Inhabitants of Cow Pats"
+
+        response = client.get("%s?title=%s" % (reverse("get_article_by_title"), title))
+
+        article = Article.objects.select_related("issue").get(title=title)
+
+        self.assertEqual(response.data["articleID"], article.articleID)
+        self.assertEqual(response.data["issue"], article.issue.issueID)
+        self.assertEqual(response.data["articleJstorID"], article.articleJstorID)
+        self.assertEqual(response.data["title"], article.title)
+        self.assertEqual(response.data["abstract"], article.abstract)
+        self.assertEqual(response.data["url"], article.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_sparse_fields(self):
+        Article.objects.get(pk=3).authors.add(3, 4)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(
+                "%s?fields=articleID,title" % reverse("get_available_articles")
+            )
+
+        self.assertEqual(
+            response.data["results"][2],
+            {"articleID": 3, "title": "The Larval Inhabitants of Cow Pats"},
+        )
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn("abstract", queries[0]["sql"])
+
+        response = client.get(
+            "%s?title=%s&fields=title,authors"
+            % (reverse("get_article_by_title"), "The Larval Inhabitants of Cow Pats")
+        )
+
+        self.assertEqual(
+            [author["authorName"] for author in response.data["authors"]],
+            ["J. B. S. Haldane", "B. R. Laurence"],
+        )
+        self.assertEqual(set(response.data), {"title", "authors"})
+
+    def test_sparse_fields_unknown(self):
+        response = client.get(
+            "%s?fields=articleID,password" % reverse("get_available_articles")
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @skipUnless(msgpack, "msgpack is not installed")
+    def test_msgpack_response(self):
+        response = client.get(
+            reverse("get_available_articles"), HTTP_ACCEPT="application/msgpack"
+        )
+
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        self.assertEqual(
+            msgpack.unpackb(response.content),
+            client.get(reverse("get_available_articles")).json(),
+        )
+
+    def test_get_article_by_title_missing(self):
+        response = client.get(
+            "%s?title=%s" % (reverse("get_article_by_title"), "No Such Article")
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_export_articles(self):
+        response = client.get(
+            reverse("export_articles", kwargs={"export_format": "json"})
+        )
+        exported = json.loads(b"".join(response.streaming_content))
+
+        articles = Article.objects.prefetch_related("authors").order_by("articleID")
+
+        self.assertEqual(exported, ArticleSerializer(articles, many=True).data)
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(EXPORT_CHUNK_SIZE=2)
+    def test_export_articles_ndjson(self):
+        Article.objects.get(pk=3).authors.add(3, 4)
+
+        response = client.get(
+            reverse("export_articles", kwargs={"export_format": "ndjson"})
+        )
+        exported = [
+            json.loads(line)
+            for line in b"".join(response.streaming_content).splitlines()
+        ]
+
+        self.assertEqual([article["articleID"] for article in exported], [1, 2, 3])
+        self.assertEqual(
+            [author["authorName"] for author in exported[2]["authors"]],
+            ["J. B. S. Haldane", "B. R. Laurence"],
+        )
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+
+
+class TestAuthor(TestCase):
+    def setUp(self):
+        cache.clear()
+        call_command("loaddata", "fixtures/test_fixtures", verbosity=0)
+        Article.objects.get(pk=3).authors.add(3, 4)
+
+    def test_parse_author_names(self):
+        self.assertEqual(parse_author_names("Alexander Fleming"), ["Alexander Fleming"])
+        self.assertEqual(parse_author_names("blah and blah 2"), ["blah", "blah 2"])
+        self.assertEqual(
+            parse_author_names("A. Smith, B. Jones, and C.  Brown"),
+            ["A. Smith", "B. Jones", "C. Brown"],
+        )
+        self.assertEqual(parse_author_names("Smith, John"), ["Smith, John"])
+        self.assertEqual(
+            parse_author_names("Ann Lee & Bo Ma; Cy Ng"), ["Ann Lee", "Bo Ma", "Cy Ng"]
+        )
+        self.assertEqual(parse_author_names(""), [])
+
+    def test_author_name_key(self):
+        self.assertEqual(author_name_key("  José   GARCÍA "), "jose garcia")
+        self.assertEqual(author_name_key("Jose Garcia"), "jose garcia")
+
+    def test_ingest_dedupes_authors_by_name_key(self):
+        ingest_metadata(
+            [
+                {
+                    "issn": "123",
+                    "journal": "Journal of Animal Ecology",
+                    "issueJstorID": "1",
+                    "year": "1954",
+                    "volume": "23",
+                    "number": "2",
+                    "articleJstorID": "4",
+                    "title": "Cow Pats Revisited",
+                    "authors": "b. r.  LAURENCE and Alexander Fleming",
+                },
+            ]
+        )
+
+        self.assertEqual(Author.objects.filter(name_key="b. r. laurence").count(), 1)
+        self.assertEqual(
+            Author.objects.get(name_key="b. r. laurence").article_set.count(), 2
+        )
+        self.assertTrue(Author.objects.filter(authorName="Alexander Fleming").exists())
+
+    def test_get_articles_by_author(self):
+        response = client.get(
+            "%s?author=j. b. s.  haldane" % reverse("get_articles_by_author")
+        )
+
+        self.assertEqual(
+            [article["articleID"] for article in response.data["results"]], [3]
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_check_article_by_author(self):
+        response = client.get(
+            "%s?author=B. R. Laurence" % reverse("check_article_by_author")
+        )
+
+        self.assertEqual(response.data["authorID"], 4)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = client.get("%s?author=Nobody" % reverse("check_article_by_author"))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TestMembership(TestCase):
+    def setUp(self):
+        cache.clear()
+        membership._filters.clear()
+        call_command("loaddata", "fixtures/test_fixtures", verbosity=0)
+
+    def find_missing(self, data):
+        response = client.post(
+            reverse("find_missing_metadata"), data=data, content_type="application/json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_find_missing_metadata(self):
+        missing = self.find_missing(
+            {
+                "articleJstorIDs": ["9", "1", "2", "7", "9"],
+                "issueJstorIDs": ["1"],
+                "issns": ["456", "123"],
+            }
+        )
+
+        self.assertEqual(
+            missing,
+            {"articleJstorIDs": ["9", "7"], "issueJstorIDs": [], "issns": ["456"]},
+        )
+
+    @override_settings(MEMBERSHIP_FILTER_ENABLED=True)
+    def test_find_missing_metadata_with_filter(self):
+        self.assertEqual(
+            self.find_missing({"articleJstorIDs": ["1", "4"]}),
+            {"articleJstorIDs": ["4"]},
+        )
+
+        Article.objects.create(
+            title="New", abstract="", url="", articleJstorID="4", issue_id=1
+        )
+        number_changes()
+        bump_catalogue_version()
+
+        self.assertEqual(
+            self.find_missing({"articleJstorIDs": ["1", "4"]}), {"articleJstorIDs": []}
+        )
+
+    @override_settings(MEMBERSHIP_FILTER_ENABLED=True)
+    def test_filter_adds_new_keys(self):
+        self.find_missing({"articleJstorIDs": ["1"]})
+        Article.objects.create(
+            title="New", abstract="", url="", articleJstorID="4", issue_id=1
+        )
+        number_changes()
+        bump_catalogue_version()
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(
+                self.find_missing({"articleJstorIDs": ["4"]}), {"articleJstorIDs": []}
+            )
+
+        # only the new row is read, not the whole table
+        self.assertFalse(
+            [q for q in queries.captured_queries if "COUNT(*)" in q["sql"]]
+        )
+
+    @override_settings(MEMBERSHIP_FILTER_ENABLED=True)
+    def test_filter_being_built(self):
+        # requests don't wait for the filter, they ask the database
+        with membership._filters_lock:
+            self.assertEqual(
+                self.find_missing({"articleJstorIDs": ["1", "4"]}),
+                {"articleJstorIDs": ["4"]},
+            )
+
+    def test_find_missing_metadata_validation(self):
+        response = client.post(
+            reverse("find_missing_metadata"),
+            data={"issns": "123"},
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        with override_settings(MEMBERSHIP_CHECK_MAX_KEYS=2):
+            response = client.post(
+                reverse("find_missing_metadata"),
+                data={"issns": ["1", "2", "3"]},
+                content_type="application/json",
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bloom_filter(self):
+        bloom_filter = BloomFilter(1000, 0.01)
+        for i in range(1000):
+            bloom_filter.add(str(i))
+
+        self.assertTrue(all(str(i) in bloom_filter for i in range(1000)))
+        self.assertLess(sum(str(i) in bloom_filter for i in range(1000, 11000)), 300)
+
+    def test_check_article_by_title(self):
+        response = client.get(
+            "%s?title=The Larval Inhabitants of Cow Pats"
+            % reverse("check_article_by_title")
+        )
+
+        self.assertTrue(response.data["exists"])
+
+        response = client.get("%s?title=Missing" % reverse("check_article_by_title"))
+
+        self.assertFalse(response.data["exists"])
+
+    def test_check_article_by_journal_name(self):
+        response = client.get(
+            "%s?journal=Journal of Animal Ecology"
+            % reverse("check_article_by_journal_name")
+        )
+
+        self.assertTrue(response.data["exists"])
+
+
+class TestArticleFilters(TestCase):
+    def setUp(self):
+        cache.clear()
+        call_command("loaddata", "fixtures/test_fixtures", verbosity=0)
+
+        journal = Journal.objects.create(
+            issn="789", altISSN="", journalName="Journal of Ecology"
+        )
+        issue = Issue.objects.create(
+            issueJstorID="2", year=1990, volume=78, number=1, journal=journal
+        )
+        Article.objects.create(
+            title="Plant Succession",
+            abstract="",
+            url="",
+            articleJstorID="4",
+            issue=issue,
+        )
+
+    def get_article_ids(self, url_name, query):
+        response = client.get("%s?%s" % (reverse(url_name), query))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [article["articleID"] for article in response.data["results"]]
+
+    def test_get_articles_by_year_range(self):
+        self.assertEqual(
+            self.get_article_ids("get_articles_by_year_range", "year_from=1960"), [4]
+        )
+        self.assertEqual(
+            self.get_article_ids("get_articles_by_year_range", "year_to=1960"),
+            [1, 2, 3],
+        )
+        self.assertEqual(
+            self.get_article_ids(
+                "get_articles_by_year_range", "year_from=1950&year_to=1990"
+            ),
+            [1, 2, 3, 4],
+        )
+
+    def test_get_articles_from_journal(self):
+        self.assertEqual(
+            self.get_article_ids("get_articles_from_journal", "issn=789"), [4]
+        )
+        self.assertEqual(
+            self.get_article_ids("get_articles_from_journal", "journal=1"), [1, 2, 3]
+        )
+        self.assertEqual(
+            self.get_article_ids(
+                "get_articles_from_journal", "journal=1&year_from=1960"
+            ),
+            [],
+        )
+
+    def test_invalid_year(self):
+        response = client.get(
+            "%s?year_from=last" % reverse("get_articles_by_year_range")
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filters_use_indexes(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+
+        for query, index in (
+            ({"year_from": "1960", "year_to": "1990"}, "issue_year_journal_idx"),
+            ({"issn": "789"}, "aarons_kit_api_journal_issn_"),
+            ({"journal": "1"}, "article_issue_id_idx"),
+        ):
+            with self.subTest(query=query):
+                articles = filter_articles(Article.objects.all(), query)
+
+                self.assertIn(index, articles.order_by("articleID").explain())
+
+
+class TestSearch(TestCase):
+    def setUp(self):
+        cache.clear()
+        records = [
+            {
+                "issn": "123",
+                "journal": "Journal of Animal Ecology",
+                "issueJstorID": "1",
+                "year": "1954",
+                "volume": "23",
+                "number": "2",
+                "articleJstorID": str(i),
+                "title": title,
+                "abstract": abstract,
+                "authors": authors,
+            }
+            for i, (title, abstract, authors) in enumerate(
+                [
+                    ("The Larval Inhabitants of Cow Pats", "", "B. R. Laurence"),
+                    (
+                        "The Mathematics of Bird Population Growth",
+                        "Larval and adult populations of birds",
+                        "J. B. S. Haldane",
+                    ),
+                    ("Front Matter", "", ""),
+                ]
+            )
+        ]
+        ingest_metadata(records)
+
+    def test_search_ranks_title_matches_first(self):
+        response = client.get("%s?q=larval" % reverse("search_articles"))
+
+        self.assertEqual(
+            [article["articleJstorID"] for article in response.data["results"]],
+            ["0", "1"],
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_search_author_names(self):
+        response = client.get("%s?q=haldane" % reverse("search_articles"))
+
+        self.assertEqual(response.data["count"], 1)
+        self.assertEqual(response.data["results"][0]["articleJstorID"], "1")
+
+    def test_search_requires_query(self):
+        response = client.get(reverse("search_articles"))
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TestJournal(TestCase):
+    def setUp(self):
+        cache.clear()
+        call_command("loaddata", "fixtures/test_fixtures", verbosity=0)
+
+    def test_get_available_journals(self):
+        response = client.get(reverse("get_available_journals"))
+
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertEqual(response.data["results"][0]["issn"], "123")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class TestResponseCache(TestCase):
+    def setUp(self):
+        cache.clear()
+        call_command("loaddata", "fixtures/test_fixtures", verbosity=0)
+
+    def test_cached_response(self):
+        url = "%s?page_size=2" % reverse("get_available_articles")
+        response = client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("ETag", response)
+        self.assertIn("Last-Modified", response)
+        self.assertIn("Accept", response["Vary"])
+
+        with self.assertNumQueries(0):
+            cached_response = client.get(url)
+
+        self.assertEqual(cached_response.content, response.content)
+        self.assertEqual(cached_response["ETag"], response["ETag"])
+
+    def test_conditional_get(self):
+        url = reverse("get_available_journals")
+        response = client.get(url)
+
+        with self.assertNumQueries(0):
+            not_modified = client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_if_modified_since_is_not_trusted(self):
+        url = reverse("get_available_journals")
+        response = client.get(url)
+        # within the second of the Last-Modified sent
+        bump_catalogue_version()
+
+        fresh_response = client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+        )
+
+        self.assertEqual(fresh_response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(fresh_response["ETag"], response["ETag"])
+
+    def test_ingest_invalidates_cache(self):
+        url = reverse("get_available_articles")
+        response = client.get(url)
+
+        with open("fixtures/test_metadata_small.json") as f:
+            metadata = json.load(f)
+        for record in metadata:
+            record["articleJstorID"] = "new-%s" % record["articleJstorID"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ingest_metadata(metadata)
+
+        fresh_response = client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+
+        self.assertEqual(fresh_response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(fresh_response["ETag"], response["ETag"])
+        self.assertEqual(len(fresh_response.json()["results"]), 5)
+
+    @override_settings(ALLOWED_HOSTS=["api.example.com", "testserver"])
+    def test_cached_per_host(self):
+        url = "%s?page_size=2" % reverse("get_available_articles")
+        client.get(url)
+
+        response = client.get(url, HTTP_HOST="api.example.com", secure=True)
+
+        self.assertTrue(response.json()["next"].startswith("https://api.example.com/"))
+
+    def test_errors_are_not_cached(self):
+        url = "%s?title=Missing" % reverse("get_article_by_title")
+        client.get(url)
+
+        with self.assertNumQueries(1):
+            response = client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TestCompression(TestCase):
+    def setUp(self):
+        cache.clear()
+        call_command("loaddata", "fixtures/test_fixtures", verbosity=0)
+
+    def test_gzip_response(self):
+        url = reverse("get_available_articles")
+        response = client.get(url)
+        compressed = client.get(url, HTTP_ACCEPT_ENCODING="gzip, deflate")
+
+        self.assertNotIn("Content-Encoding", response)
+        self.assertEqual(compressed["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(compressed.content), response.content)
+        self.assertEqual(int(compressed["Content-Length"]), len(compressed.content))
+        for vary in (response["Vary"], compressed["Vary"]):
+            self.assertIn("Accept", vary)
+            self.assertIn("Accept-Encoding", vary)
+
+    @skipUnless(brotli, "brotli is not installed")
+    def test_brotli_response(self):
+        url = reverse("get_available_articles")
+        response = client.get(url)
+        compressed = client.get(url, HTTP_ACCEPT_ENCODING="gzip, br")
+
+        self.assertEqual(compressed["Content-Encoding"], "br")
+        self.assertEqual(brotli.decompress(compressed.content), response.content)
+
+    def test_precompressed_response_is_cached(self):
+        url = reverse("get_available_articles")
+        compressed = client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+
+        with self.assertNumQueries(0):
+            cached = client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+            not_modified = client.get(
+                url, HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=cached["ETag"]
+            )
+
+        self.assertEqual(cached["Content-Encoding"], "gzip")
+        self.assertEqual(cached.content, compressed.content)
+        self.assertTrue(cached["ETag"].startswith("W/"))
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_cached_encodings_are_compressed_on_demand(self):
+        url = reverse("get_available_articles")
+
+        with mock.patch(
+            "aarons_kit_api.cache.compress_cached", wraps=compress_cached
+        ) as compress:
+            client.get(url)
+            self.assertEqual(compress.call_count, 0)
+
+            for _ in range(2):
+                client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+            self.assertEqual(
+                [call.args[1] for call in compress.call_args_list], ["gzip"]
+            )
+
+    def test_refused_encoding(self):
+        response = client.get(
+            reverse("get_available_articles"), HTTP_ACCEPT_ENCODING="gzip;q=0"
+        )
+
+        self.assertNotIn("Content-Encoding", response)
+
+    def test_wildcard_encoding(self):
+        for header, encoding in (
+            ("*", "br"),
+            ("br;q=0, *", "gzip"),
+            ("gzip;q=0, br;q=0, *", None),
+            ("*;q=0", None),
+            ("gzip, *;q=0", "gzip"),
+        ):
+            with self.subTest(header=header):
+                request = RequestFactory().get("/", HTTP_ACCEPT_ENCODING=header)
+
+                self.assertEqual(preferred_encoding(request, ("br", "gzip")), encoding)
+
+        response = client.get(
+            reverse("get_available_articles"), HTTP_ACCEPT_ENCODING="br;q=0, *"
+        )
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+
+    def test_streamed_export_is_compressed(self):
+        url = reverse("export_articles", kwargs={"export_format": "ndjson"})
+        response = client.get(url)
+        compressed = client.get(url, HTTP_ACCEPT_ENCODING="br, gzip")
+
+        self.assertEqual(compressed["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", compressed["Vary"])
+        self.assertEqual(
+            gzip.decompress(b"".join(compressed.streaming_content)),
+            b"".join(response.streaming_content),
+        )
+
+
+class TestCorpus(TestCase):
+    def test_generate_corpus(self):
+        records = list(
+            generate_corpus(1000, journals=5, issues=50, authors=100, seed=1)
+        )
+
+        for record in records:
+            validate_record(record)
+        self.assertEqual(
+            records,
+            list(generate_corpus(1000, journals=5, issues=50, authors=100, seed=1)),
+        )
+        self.assertEqual(len({record["issn"] for record in records}), 5)
+        self.assertEqual(len({record["issueJstorID"] for record in records}), 50)
+
+        names = [
+            author_name_key(name)
+            for record in records
+            for name in parse_author_names(record["authors"])
+        ]
+        self.assertLessEqual(len(set(names)), 100)
+        self.assertGreater(len(names), len(set(names)))
+
+    def test_ingest_corpus(self):
+        counts = ingest_metadata(generate_corpus(200, journals=2, issues=10))
+
+        self.assertEqual(
+            (counts["journals"], counts["issues"], counts["articles"]), (2, 10, 200)
+        )
+        self.assertEqual(Author.objects.count(), counts["authors"])
+
+
+class TestSnapshots(TestCase):
+    def setUp(self):
+        cache.clear()
+        call_command("loaddata", "fixtures/test_fixtures", verbosity=0)
+
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+
+    def snapshot(self, *args):
+        output = io.StringIO()
+        call_command("snapshot", *args, output=self.root, shard_rows=2, stdout=output)
+        with open(os.path.join(self.root, "manifest.json")) as f:
+            return json.load(f), output.getvalue()
+
+    def read(self, snapshot, table):
+        rows = []
+        for file in snapshot["files"]:
+            if file["table"] != table:
+                continue
+
+            with open(os.path.join(self.root, file["path"]), "rb") as f:
+                content = f.read()
+            self.assertEqual(hashlib.sha256(content).hexdigest(), file["sha256"])
+            lines = gzip.decompress(content).splitlines()
+            self.assertEqual(len(lines), file["rows"])
+            self.assertLessEqual(len(lines), 2)
+            rows.extend(json.loads(line) for line in lines)
+        return rows
+
+    def test_full_snapshot(self):
+        manifest, _ = self.snapshot()
+
+        [snapshot] = manifest["snapshots"]
+        self.assertEqual(snapshot["type"], "full")
+        for table, model in (
+            ("journals", Journal),
+            ("issues", Issue),
+            ("authors", Author),
+            ("articles", Article),
+        ):
+            with self.subTest(table=table):
+                self.assertEqual(
+                    [row[model._meta.pk.name] for row in self.read(snapshot, table)],
+                    list(model.objects.order_by("pk").values_list("pk", flat=True)),
+                )
+
+        response = client.get(reverse("get_available_articles"))
+        self.assertEqual(self.read(snapshot, "articles"), response.json()["results"])
+
+    def test_delta_snapshots(self):
+        manifest, _ = self.snapshot()
+
+        ingest_metadata(generate_corpus(5, journals=1, issues=2))
+        article = Article.objects.order_by("articleID").first()
+        article.authors.add(Author.objects.order_by("-authorID").first())
+        journal = Journal.objects.order_by("journalID").first()
+        Journal.objects.filter(pk=journal.pk).update(journalName="Renamed")
+        number_changes()
+
+        manifest, _ = self.snapshot()
+
+        full, delta = manifest["snapshots"]
+        last_article = max(row["articleID"] for row in self.read(full, "articles"))
+        self.assertEqual(delta["type"], "delta")
+        self.assertEqual(delta["since"], full["changeSeq"])
+        self.assertEqual(
+            [row["articleID"] for row in self.read(delta, "articles")],
+            [article.articleID]
+            + list(
+                Article.objects.filter(articleID__gt=last_article)
+                .order_by("articleID")
+                .values_list("articleID", flat=True)
+            ),
+        )
+        self.assertEqual(
+            [row["journalID"] for row in self.read(delta, "journals")],
+            list(Journal.objects.order_by("journalID").values_list("pk", flat=True)),
+        )
+
+        unchanged, output = self.snapshot()
+
+        self.assertEqual(unchanged, manifest)
+        self.assertIn("has not changed", output)
+
+        manifest, _ = self.snapshot("--full")
+
+        [snapshot] = manifest["snapshots"]
+        self.assertEqual(snapshot["type"], "full")
+        # the snapshots it replaced are kept for clients still downloading them
+        retired = [full["id"], delta["id"]]
+        self.assertEqual(
+            sorted(entry.name for entry in os.scandir(self.root)),
+            sorted(["manifest.json", snapshot["id"]] + retired),
+        )
+
+        # until a run after the grace period
+        for snapshot_id in retired:
+            os.utime(os.path.join(self.root, snapshot_id, RETIRED_NAME), (0, 0))
+        self.snapshot()
+
+        self.assertEqual(
+            sorted(entry.name for entry in os.scandir(self.root)),
+            sorted(["manifest.json", snapshot["id"]]),
+        )
+
+
+class TestConcurrentSnapshots(TransactionTestCase):
+    def test_runs_wait_for_each_other(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+
+        def snapshot():
+            try:
+                create_snapshot(root, 2, 100)
+            finally:
+                connection.close()
+
+        # as if another run were writing
+        with connection.cursor() as cursor:
+            cursor.execute(LOCK_SNAPSHOTS_SQL)
+        thread = threading.Thread(target=snapshot)
+        thread.start()
+        try:
+            thread.join(0.5)
+            self.assertTrue(thread.is_alive())
+            self.assertFalse(os.path.exists(os.path.join(root, MANIFEST_NAME)))
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute(UNLOCK_SNAPSHOTS_SQL)
+            thread.join()
+
+        self.assertTrue(os.path.exists(os.path.join(root, MANIFEST_NAME)))
+
+
+class TestBulkLoad(TestCase):
+    def setUp(self):
+        cache.clear()
+
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+
+        with open("fixtures/test_metadata_small.json") as f:
+            self.metadata = json.load(f)
+
+    def load(self, path, *args, **options):
+        output = io.StringIO()
+        errors = io.StringIO()
+        options = {"workers": 0, "batch_size": 2, "chunk_bytes": 256, **options}
+        call_command(
+            "load_metadata", path, *args, stdout=output, stderr=errors, **options
+        )
+        return json.loads(output.getvalue()[output.getvalue().index("{") :]), errors
+
+    def catalogue(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT "articleJstorID", strip(search_vector)::text '
+                "FROM aarons_kit_api_article"
+            )
+            search_vectors = dict(cursor.fetchall())
+
+        return {
+            "journals": list(
+                Journal.objects.order_by("issn").values(
+                    "issn", "journalName", "altISSN", "statistics__articleCount"
+                )
+            ),
+            "issues": list(
+                Issue.objects.order_by("issueJstorID").values(
+                    "issueJstorID", "year", "volume", "number", "journal__issn"
+                )
+            ),
+            "articles": [
+                (
+                    article.articleJstorID,
+                    article.title,
+                    article.abstract,
+                    article.url,
+                    article.issue.issueJstorID,
+                    [author.authorName for author in article.authors.order_by("pk")],
+                    search_vectors[article.articleJstorID],
+                )
+                for article in Article.objects.order_by("articleJstorID")
+            ],
+        }
+
+    def test_load_json_matches_ingest(self):
+        ingest_metadata(self.metadata)
+        update_journal_statistics(Journal.objects.values_list("pk", flat=True))
+        expected = self.catalogue()
+        Journal.objects.all().delete()
+        Author.objects.all().delete()
+
+        path = shutil.copy("fixtures/test_metadata_small.json", self.root)
+        totals, _ = self.load(path)
+
+        self.assertEqual(self.catalogue(), expected)
+        self.assertEqual(totals["records"], len(self.metadata))
+        self.assertEqual(totals["articles"], Article.objects.count())
+        self.assertEqual(totals["rejected"], 0)
+        # loaded issues count as just scraped, like ingested ones
+        self.assertEqual(
+            IssueScrape.objects.filter(due__gt=timezone.now()).count(),
+            Issue.objects.count(),
+        )
+
+    def test_load_ndjson_resumes_by_offset(self):
+        path = os.path.join(self.root, "metadata.ndjson")
+        lines = [json.dumps(record) + "\n" for record in self.metadata]
+        lines.insert(2, '{"title": "No journal"}\n')
+        with open(path, "w") as f:
+            f.writelines(lines)
+        third = len("".join(lines[:3]).encode())
+
+        totals, errors = self.load(path, offset=third)
+
+        self.assertEqual(totals["records"], len(lines) - 3)
+        self.assertEqual(Article.objects.count(), len(lines) - 3)
+        with open(path + ".offset") as f:
+            self.assertEqual(int(f.read()), os.path.getsize(path))
+
+        totals, errors = self.load(path, offset=0)
+
+        self.assertEqual(totals["records"], len(self.metadata))
+        self.assertEqual(totals["rejected"], 1)
+        self.assertIn(
+            "offset %d: missing field" % len("".join(lines[:2]).encode()),
+            errors.getvalue(),
+        )
+        self.assertEqual(Article.objects.count(), len(self.metadata))
+
+        totals, _ = self.load(path, resume=True)
+
+        self.assertEqual(totals["records"], 0)
+
+    def test_json_elements(self):
+        data = b' {"a": "}{"}, {"b": ["\\"]", 1]},\n{"c": "cut off'
+
+        self.assertEqual(
+            [data[start:end] for start, end in json_elements(data)],
+            [b'{"a": "}{"}', b'{"b": ["\\"]", 1]}'],
+        )
+        self.assertEqual(json_boundary(data), data.index(b"},\n") + 1)
+
+
+# refextract output for the sample PDFs, by their content
+SAMPLE_REFERENCES = {
+    b"%PDF-1.4 sample 1": [
+        {
+            "raw_ref": ["[1] R. Capildeo, https://www.jstor.org/stable/2"],
+            "url": ["https://www.jstor.org/stable/2"],
+        },
+        {
+            "raw_ref": ["[2] The Larval Inhabitants of Cow Pats. 1954."],
+            "title": ["The Larval Inhabitants of Cow Pats."],
+        },
+        {"raw_ref": ["[3] Unrelated, 1901."], "title": ["Unrelated"]},
+    ],
+    b"%PDF-1.4 sample 2": [
+        {"raw_ref": ["G. D. Waugh, doi:10.2307/1"], "doi": ["10.2307/1"]},
+    ],
+}
+
+
+@override_settings(CELERY_TASK_ALWAYS_EAGER=True, CELERY_TASK_STORE_EAGER_RESULT=True)
+class TestCitations(TestCase):
+    def setUp(self):
+        cache.clear()
+        call_command("loaddata", "fixtures/test_fixtures", verbosity=0)
+
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        # 3.pdf has the same content as 1.pdf and 4 isn't a stored article
+        for name, content in (
+            ("1.pdf", b"%PDF-1.4 sample 1"),
+            ("2.pdf", b"%PDF-1.4 sample 2"),
+            ("3.pdf", b"%PDF-1.4 sample 1"),
+            ("4.pdf", b"%PDF-1.4 sample 2"),
+        ):
+            with open(os.path.join(self.directory, name), "wb") as f:
+                f.write(content)
+
+        def extract(path):
+            with open(path, "rb") as f:
+                return SAMPLE_REFERENCES[f.read()]
+
+        patcher = mock.patch(
+            "aarons_kit_api.citations.extract_references_from_file",
+            side_effect=extract,
+        )
+        self.extract = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def extract_references(self):
+        stdout = io.StringIO()
+        call_command(
+            "extract_references",
+            self.directory,
+            wait=True,
+            stdout=stdout,
+            stderr=io.StringIO(),
+        )
+        return stdout.getvalue()
+
+    def get_ids(self, name, article_id):
+        response = client.get(reverse(name, kwargs={"article_id": article_id}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [article["articleID"] for article in response.data["results"]]
+
+    def test_extract_references(self):
+        output = self.extract_references()
+
+        self.assertIn("Extracted 3 PDFs (1 from the cache)", output)
+        self.assertEqual(self.extract.call_count, 2)
+        self.assertEqual(
+            set(Citation.objects.values_list("citing_id", "cited_id")),
+            {(1, 2), (1, 3), (2, 1), (3, 2)},
+        )
+
+        self.assertEqual(self.get_ids("get_article_references", 1), [2, 3])
+        self.assertEqual(self.get_ids("get_article_cited_by", 2), [1, 3])
+        self.assertEqual(self.get_ids("get_article_cited_by", 1), [2])
+        response = client.get(
+            reverse("get_article_references", kwargs={"article_id": 100})
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_citations_only_invalidate_citation_responses(self):
+        self.assertEqual(self.get_ids("get_article_references", 1), [])
+        version = get_catalogue_version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.extract_references()
+
+        self.assertEqual(get_catalogue_version(), version)
+        self.assertEqual(self.get_ids("get_article_references", 1), [2, 3])
+
+    def test_rerun_reads_the_cache(self):
+        self.extract_references()
+        self.extract.reset_mock()
+
+        output = self.extract_references()
+
+        self.assertIn("Extracted 3 PDFs (3 from the cache)", output)
+        self.extract.assert_not_called()
+        self.assertEqual(Citation.objects.count(), 4)
+
+    def test_extract_stored_pdfs(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+
+        with override_settings(MEDIA_ROOT=media_root):
+            for article_id in (1, 2):
+                with open(
+                    os.path.join(self.directory, "%d.pdf" % article_id), "rb"
+                ) as f:
+                    Article.objects.filter(pk=article_id).update(pdf=store_pdf(f))
+
+            call_command("extract_references", stdout=io.StringIO())
+
+        self.assertEqual(
+            set(Citation.objects.values_list("citing_id", "cited_id")),
+            {(1, 2), (1, 3), (2, 1)},
+        )
+
+    def test_resolve_references(self):
+        Article.objects.filter(pk=3).update(title=Article.objects.get(pk=2).title)
+
+        self.assertEqual(
+            resolve_references(
+                [
+                    {"raw_ref": ["see JSTOR.org/stable/1 and 10.2307/3"]},
+                    # two stored articles have this title
+                    {
+                        "title": [
+                            "The Mathematics of Bird Population Growth and Decline"
+                        ]
+                    },
+                ]
+            ),
+            {1, 3},
+        )
+
+
+# refextract reads PDFs with pdftotext, from poppler-utils
+@skipUnless(
+    extract_references_from_file and shutil.which("pdftotext"),
+    "refextract or pdftotext is not installed",
 )
+@override_settings(CELERY_TASK_ALWAYS_EAGER=True, CELERY_TASK_STORE_EAGER_RESULT=True)
+class TestReferenceExtraction(TestCase):
+    def setUp(self):
+        cache.clear()
+        call_command("loaddata", "fixtures/test_fixtures", verbosity=0)
+
+    def test_extract_references_from_pdf(self):
+        references = extract_references("fixtures/sample_references.pdf")
+
+        self.assertTrue(all("raw_ref" in reference for reference in references))
+        self.assertEqual(resolve_references(references), {1, 2})
+
+    def test_extract_references_command(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        shutil.copy("fixtures/sample_references.pdf", os.path.join(directory, "3.pdf"))
+
+        call_command("extract_references", directory, wait=True, stdout=io.StringIO())
+
+        self.assertEqual(
+            set(Citation.objects.filter(citing=3).values_list("cited", flat=True)),
+            {1, 2},
+        )
+
+
+class TestArticlePDF(TestCase):
+    content = b"%PDF-1.4\n" + b"sample " * 20000
+
+    def setUp(self):
+        call_command("loaddata", "fixtures/test_fixtures", verbosity=0)
+
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        editor = User.objects.create_user("editor", password="secret")
+        editor.user_permissions.add(Permission.objects.get(codename="change_article"))
+        User.objects.create_user("reader", password="secret")
+
+    def put(self, article_id, content, username="editor", **extra):
+        credentials = base64.b64encode(b"%s:secret" % username.encode()).decode()
+        return client.put(
+            reverse("article_pdf", kwargs={"article_id": article_id}),
+            data=content,
+            content_type="application/pdf",
+            HTTP_AUTHORIZATION="Basic %s" % credentials,
+            **extra,
+        )
+
+    def stored_files(self):
+        return sorted(
+            name for _, _, names in os.walk(self.media_root) for name in names
+        )
+
+    def test_upload_pdf(self):
+        sha256 = hashlib.sha256(self.content).hexdigest()
+
+        for article_id in (1, 2):
+            response = self.put(article_id, self.content)
+
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.json()["sha256"], sha256)
+            self.assertEqual(response.json()["size"], len(self.content))
+
+        # both articles share one copy
+        self.assertEqual(self.stored_files(), ["%s.pdf" % sha256])
+        self.assertEqual(PDF.objects.count(), 1)
+        self.assertEqual(
+            list(Article.objects.filter(pdf=sha256).values_list("pk", flat=True)),
+            [1, 2],
+        )
+        with open(pdf_path(sha256), "rb") as f:
+            self.assertEqual(f.read(), self.content)
 
-client = Client()
+    def test_download_pdf(self):
+        sha256 = self.put(1, self.content).json()["sha256"]
+        url = reverse("article_pdf", kwargs={"article_id": 1})
 
+        response = client.get(url)
 
-class TestArticle(TestCase):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/pdf")
+        self.assertEqual(
+            response["X-Accel-Redirect"],
+            "/protected/media/pdfs/%s/%s/%s.pdf" % (sha256[:2], sha256[2:4], sha256),
+        )
+        self.assertEqual(response.content, b"")
+
+        with override_settings(PDF_ACCEL_REDIRECT=False):
+            response = client.get(url)
+
+            self.assertEqual(b"".join(response.streaming_content), self.content)
+
+        for article_id in (2, 100):
+            response = client.get(
+                reverse("article_pdf", kwargs={"article_id": article_id})
+            )
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_rejected_uploads(self):
+        self.assertEqual(
+            self.put(1, b"<html></html>").status_code,
+            status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+        )
+        self.assertEqual(self.put(1, b"").status_code, status.HTTP_400_BAD_REQUEST)
+        with override_settings(PDF_MAX_UPLOAD_SIZE=100):
+            self.assertEqual(
+                self.put(1, self.content).status_code,
+                status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+            # uploads without a Content-Length are cut off while streaming
+            with self.assertRaises(PDFUploadError):
+                store_pdf(io.BytesIO(self.content), chunk_size=64)
+
+        self.assertEqual(
+            self.put(1, self.content, CONTENT_LENGTH="lots").status_code,
+            status.HTTP_400_BAD_REQUEST,
+        )
+
+        self.assertEqual(self.stored_files(), [])
+        self.assertIsNone(Article.objects.get(pk=1).pdf_id)
+
+    def test_upload_requires_permission(self):
+        response = client.put(
+            reverse("article_pdf", kwargs={"article_id": 1}),
+            data=self.content,
+            content_type="application/pdf",
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn("Basic", response["WWW-Authenticate"])
+
+        for username in ("reader", "nobody"):
+            with self.subTest(username=username):
+                response = self.put(1, self.content, username=username)
+
+                self.assertEqual(
+                    response.status_code,
+                    status.HTTP_403_FORBIDDEN
+                    if username == "reader"
+                    else status.HTTP_401_UNAUTHORIZED,
+                )
+
+        self.assertEqual(self.stored_files(), [])
+
+    def test_delete_unused_pdfs(self):
+        old = self.put(1, self.content).json()["sha256"]
+        self.put(2, self.content)
+        new = self.put(1, self.content + b"new").json()["sha256"]
+
+        # article 2 still has the old PDF
+        call_command("delete_unused_pdfs", seconds=0, stdout=io.StringIO())
+        self.assertEqual(self.stored_files(), sorted(["%s.pdf" % old, "%s.pdf" % new]))
+
+        self.put(2, self.content + b"new")
+        # uploaded too recently
+        call_command("delete_unused_pdfs", stdout=io.StringIO())
+        self.assertEqual(PDF.objects.count(), 2)
+
+        call_command("delete_unused_pdfs", seconds=0, stdout=io.StringIO())
+        self.assertEqual(self.stored_files(), ["%s.pdf" % new])
+        self.assertEqual(list(PDF.objects.values_list("sha256", flat=True)), [new])
+
+
+class TestChanges(TestCase):
     def setUp(self):
+        cache.clear()
         call_command("loaddata", "fixtures/test_fixtures", verbosity=0)
 
-    def test_get_available_articles(self):
-        response = client.get(reverse("get_available_articles"))
+    def sync(self, since=0, page_size=2):
+        """
+        Follows the change feed from since to the end, like a client would,
+        and returns the changes and the seq to sync from next time.
+        """
+        changes = []
+        url = "%s?since=%d&page_size=%d" % (reverse("get_changes"), since, page_size)
+        while url:
+            response = client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            data = response.json()
+            self.assertLessEqual(len(data["results"]), page_size)
+            changes.extend(data["results"])
+            url = data["next"]
+        return changes, data["seq"]
 
-        articles = Article.objects.all()
+    def test_sync_from_start(self):
+        changes, seq = self.sync()
+
+        seqs = [change["seq"] for change in changes]
+        self.assertEqual(seqs, sorted(set(seqs)))
+        self.assertEqual(seq, seqs[-1])
+        for table, model in (
+            ("journals", Journal),
+            ("issues", Issue),
+            ("authors", Author),
+            ("articles", Article),
+        ):
+            with self.subTest(table=table):
+                self.assertEqual(
+                    sorted(
+                        change["row"][model._meta.pk.name]
+                        for change in changes
+                        if change["table"] == table
+                    ),
+                    list(model.objects.order_by("pk").values_list("pk", flat=True)),
+                )
+
+        self.assertEqual(self.sync(seq), ([], seq))
+
+    def test_sync_inserts_and_updates(self):
+        _, seq = self.sync()
+        authors = Author.objects.count()
+
+        Article.objects.filter(pk=2).update(title="Retitled")
+        Article.objects.get(pk=1).authors.add(1)
+        number_changes()
+        ingest_metadata(generate_corpus(3, journals=1, issues=1))
+        number_changes()
+
+        changes, _ = self.sync(seq)
+
+        self.assertEqual(
+            [(change["table"], change["type"]) for change in changes[:2]],
+            [("articles", "upsert")] * 2,
+        )
+        self.assertEqual(changes[0]["row"]["title"], "Retitled")
+        self.assertEqual(
+            [author["authorID"] for author in changes[1]["row"]["authors"]], [1]
+        )
+        self.assertEqual(
+            Counter(change["table"] for change in changes[2:]),
+            {
+                "journals": 1,
+                "issues": 1,
+                "articles": 3,
+                "authors": Author.objects.count() - authors,
+            },
+        )
+
+    def test_cached_page_follows_changes(self):
+        _, seq = self.sync()
+        self.assertEqual(self.sync(seq), ([], seq))
+        with self.assertNumQueries(1):
+            self.assertEqual(self.sync(seq), ([], seq))
+
+        # writes that don't bump the catalogue version still show up
+        Article.objects.filter(pk=2).update(title="Retitled")
+        number_changes()
+        changes, _ = self.sync(seq)
+
+        self.assertEqual([change["row"]["title"] for change in changes], ["Retitled"])
+
+    def test_invalid_since(self):
+        response = client.get(reverse("get_changes"), {"since": "yesterday"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TestConcurrentChanges(TransactionTestCase):
+    def test_change_committed_while_reading(self):
+        records = list(generate_corpus(20, journals=2, issues=2))
+        ingest_metadata(records[:10])
+        _, since, _ = changes_since(0, 1000)
+        ingested = []
+
+        def ingest():
+            try:
+                ingest_metadata(records[10:])
+            finally:
+                connection.close()
+
+        # commits a new journal with its issue and articles once the first
+        # query of the read has run
+        def ingest_after_first_query(execute, sql, params, many, context):
+            result = execute(sql, params, many, context)
+            if not ingested:
+                ingested.append(sql)
+                thread = threading.Thread(target=ingest)
+                thread.start()
+                thread.join()
+            return result
+
+        with connection.execute_wrapper(ingest_after_first_query):
+            changes, since, _ = changes_since(since, 1000)
+        later, _, _ = changes_since(since, 1000)
+
+        self.assertEqual(
+            [
+                change["row"]["issn"]
+                for change in changes + later
+                if change["table"] == "journals"
+            ],
+            [records[10]["issn"]],
+        )
+
+    def test_concurrent_ingests_are_numbered_in_commit_order(self):
+        records = list(generate_corpus(20, journals=2, issues=2))
+        for record in records[:10]:
+            record["authors"] = "Ada Lovelace"
+        for record in records[10:]:
+            record["authors"] = "Alan Turing"
+        ingested = threading.Event()
+        release = threading.Event()
+
+        def ingest(batch, hold=False):
+            try:
+                with transaction.atomic():
+                    ingest_metadata(batch)
+                    if hold:
+                        ingested.set()
+                        release.wait(10)
+            finally:
+                connection.close()
+
+        first = threading.Thread(target=ingest, args=(records[:10], True))
+        second = threading.Thread(target=ingest, args=(records[10:],))
+        first.start()
+        try:
+            self.assertTrue(ingested.wait(10))
+            # writers only wait for each other while they commit
+            second.start()
+            second.join(5)
+            self.assertFalse(second.is_alive())
+        finally:
+            release.set()
+            first.join()
+            second.join()
+
+        changes, _, _ = changes_since(0, 1000)
+        self.assertEqual(
+            [
+                change["row"]["issueJstorID"]
+                for change in changes
+                if change["table"] == "issues"
+            ],
+            [records[10]["issueJstorID"], records[0]["issueJstorID"]],
+        )
+
+
+class TestScraping(TestCase):
+    def setUp(self):
+        ingest_metadata(generate_corpus(20, journals=2, issues=10))
+        # as if they had never been scraped
+        IssueScrape.objects.update(due=timezone.now(), scraped=None)
+
+    def claim(self, **body):
+        return client.post(
+            reverse("claim_scrape_issues"),
+            {"owner": "scraper-1", **body},
+            content_type="application/json",
+        )
+
+    def lease_url(self, name, lease):
+        return reverse(name, kwargs={"lease": lease})
+
+    def test_ingested_issues_are_not_due(self):
+        # 10 more articles in 5 new issues
+        ingest_metadata(list(generate_corpus(30, journals=2, issues=15))[20:])
+
+        self.assertEqual(
+            set(IssueScrape.objects.values_list("issue_id", flat=True)),
+            set(Issue.objects.values_list("pk", flat=True)),
+        )
+        # they were just scraped, so only the stale ones are claimed
+        self.assertEqual(len(self.claim(count=100).data["issues"]), 10)
+        self.assertEqual(
+            IssueScrape.objects.filter(scraped__isnull=False, lease=None).count(), 5
+        )
+
+    def test_claim(self):
+        response = self.claim(count=4, lease_seconds=60)
 
-        self.assertEqual(len(response.data), len(articles))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+        issue_ids = [issue["issueID"] for issue in response.data["issues"]]
+        self.assertEqual(len(issue_ids), 4)
+        self.assertEqual(
+            set(
+                IssueScrape.objects.filter(lease=response.data["lease"]).values_list(
+                    "issue_id", flat=True
+                )
+            ),
+            set(issue_ids),
+        )
 
-    def test_get_article_by_title(self):
-        title = "The Larval Inhabitants of Cow Pats"
+        # the rest are left for other scrapers
+        response = self.claim(count=100)
+        self.assertEqual(len(response.data["issues"]), 6)
+        self.assertFalse(
+            set(issue_ids) & {i["issueID"] for i in response.data["issues"]}
+        )
+        self.assertEqual(self.claim().data["issues"], [])
 
-        response = client.get("%s?title=%s" % (reverse("get_article_by_title"), title))
+    def test_claim_journal(self):
+        journal = Journal.objects.first()
 
-        article = Article.objects.select_related("issue").get(title=title)
+        response = self.claim(journal=journal.pk, count=100)
+
+        self.assertEqual(
+            {issue["journal"] for issue in response.data["issues"]}, {journal.pk}
+        )
+        self.assertEqual(
+            len(response.data["issues"]), Issue.objects.filter(journal=journal).count()
+        )
+
+    def test_invalid_claim(self):
+        for body in ({"owner": ""}, {"count": "lots"}, {"journal": "Nature"}):
+            with self.subTest(body=body):
+                response = self.claim(**body)
+
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_renew_and_complete(self):
+        lease = self.claim(count=3, lease_seconds=60).data["lease"]
+
+        response = client.post(
+            self.lease_url("renew_scrape_lease", lease),
+            {"lease_seconds": 600},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["issues"], 3)
+        self.assertGreater(
+            IssueScrape.objects.filter(lease=lease).first().due,
+            timezone.now() + timedelta(seconds=500),
+        )
+
+        issue_id = IssueScrape.objects.filter(lease=lease).first().issue_id
+        response = client.post(
+            self.lease_url("complete_scrape_lease", lease),
+            {"issues": [issue_id]},
+            content_type="application/json",
+        )
+        self.assertEqual(response.data["completed"], 1)
+        response = client.post(self.lease_url("complete_scrape_lease", lease))
+        self.assertEqual(response.data["completed"], 2)
+
+        scrapes = IssueScrape.objects.filter(scraped__isnull=False)
+        self.assertEqual(scrapes.count(), 3)
+        self.assertFalse(scrapes.exclude(lease=None).exists())
+        # not due again until they go stale
+        self.assertEqual(len(self.claim(count=100).data["issues"]), 7)
+
+        # the lease is gone
+        response = client.post(self.lease_url("renew_scrape_lease", lease))
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_stale_issues_are_due_again(self):
+        lease = self.claim(count=1).data["lease"]
+        client.post(self.lease_url("complete_scrape_lease", lease))
+
+        IssueScrape.objects.filter(scraped__isnull=False).update(
+            due=timezone.now() - timedelta(seconds=1)
+        )
+
+        self.assertEqual(len(self.claim(count=100).data["issues"]), 10)
+
+    def test_expired_lease_is_reclaimed(self):
+        lease = self.claim(count=2).data["lease"]
+        IssueScrape.objects.filter(lease=lease).update(
+            due=timezone.now() - timedelta(seconds=1)
+        )
+
+        response = self.claim(count=100, owner="scraper-2")
+        self.assertEqual(len(response.data["issues"]), 10)
+
+        # the first scraper can neither renew nor complete its lost lease
+        for name in ("renew_scrape_lease", "complete_scrape_lease"):
+            with self.subTest(name=name):
+                response = client.post(self.lease_url(name, lease))
+
+                self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(IssueScrape.objects.filter(scraped__isnull=False).exists())
+
+
+class TestConcurrentScraping(TransactionTestCase):
+    def test_concurrent_claims_are_disjoint(self):
+        ingest_metadata(generate_corpus(20, journals=2, issues=10))
+        IssueScrape.objects.update(due=timezone.now())
+        held = []
+        claimed = threading.Event()
+        release = threading.Event()
+
+        def hold_claim():
+            try:
+                with transaction.atomic():
+                    held.extend(claim_issues("scraper-1", 4, 60)[2])
+                    claimed.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=hold_claim)
+        thread.start()
+        try:
+            self.assertTrue(claimed.wait(10))
+            # the first claim hasn't committed, so its issues are still due
+            # but locked, and are skipped rather than waited for
+            _, _, issue_ids = claim_issues("scraper-2", 100, 60)
+        finally:
+            release.set()
+            thread.join()
+
+        self.assertEqual(len(held), 4)
+        self.assertEqual(len(issue_ids), 6)
+        self.assertEqual(
+            set(held) | set(issue_ids), set(Issue.objects.values_list("pk", flat=True))
+        )
+        self.assertEqual(
+            IssueScrape.objects.filter(owner="scraper-1").count(), len(held)
+        )
+
+
+class TestMetrics(TestCase):
+    def setUp(self):
+        cache.clear()
+        call_command("loaddata", "fixtures/test_fixtures", verbosity=0)
+
+    def get_sample_value(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_request_metrics(self):
+        route = {"route": "get_available_articles"}
+        names = (
+            "aarons_kit_request_sql_queries_total",
+            "aarons_kit_request_sql_seconds_total",
+            "aarons_kit_request_serializer_seconds_total",
+            "aarons_kit_request_render_seconds_total",
+            "aarons_kit_response_bytes_count",
+        )
+        before = {name: self.get_sample_value(name, **route) for name in names}
+        requests = self.get_sample_value(
+            "aarons_kit_requests_total", method="GET", status="200", **route
+        )
+
+        client.get(reverse("get_available_articles"))
+
+        for name in names:
+            with self.subTest(name=name):
+                self.assertGreater(self.get_sample_value(name, **route), before[name])
+        self.assertEqual(
+            self.get_sample_value(
+                "aarons_kit_requests_total", method="GET", status="200", **route
+            ),
+            requests + 1,
+        )
+        self.assertEqual(
+            self.get_sample_value("aarons_kit_request_sql_queries_total", **route),
+            before["aarons_kit_request_sql_queries_total"] + 2,
+        )
+
+    @override_settings(
+        CELERY_TASK_ALWAYS_EAGER=True, CELERY_TASK_STORE_EAGER_RESULT=True
+    )
+    def test_task_metrics(self):
+        task = {"task": "aarons_kit_api.tasks.ingest_metadata_task"}
+        tasks = self.get_sample_value("aarons_kit_tasks_total", state="SUCCESS", **task)
+        queries = self.get_sample_value("aarons_kit_task_sql_queries_total", **task)
+
+        with open("fixtures/test_metadata_small.json") as f:
+            client.post(
+                "%s?async=true" % reverse("store_metadata"),
+                data={"metadata": f.read()},
+            )
+
+        self.assertEqual(
+            self.get_sample_value("aarons_kit_tasks_total", state="SUCCESS", **task),
+            tasks + 1,
+        )
+        self.assertGreater(
+            self.get_sample_value("aarons_kit_task_sql_queries_total", **task), queries
+        )
+
+    @override_settings(TASK_METRICS_PORT=9808)
+    def test_worker_serves_task_metrics(self):
+        with mock.patch("aarons_kit_api.metrics.start_http_server") as start:
+            start_task_metrics_server(sender=None)
+
+        start.assert_called_once_with(9808, registry=REGISTRY)
+
+    def test_get_metrics(self):
+        client.get(reverse("get_available_journals"))
+
+        response = client.get(reverse("get_metrics"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        self.assertIn(
+            b'aarons_kit_request_seconds_count{method="GET",route="get_available_journals"}',
+            response.content,
+        )
+
+
+# async views query on their own threads and connections, so they only see
+# committed rows
+class TestAsyncViews(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        call_command("loaddata", "fixtures/test_fixtures", verbosity=0)
+
+    def test_async_read_views(self):
+        for name, params in (
+            ("get_available_articles", {"page_size": 2}),
+            ("get_article_by_title", {"title": "The Larval Inhabitants of Cow Pats"}),
+            ("get_articles_by_year_range", {"year_from": 1950}),
+            ("get_journal_catalogue", {}),
+            ("check_article_by_journal_name", {"journal": "Journal of Animal Ecology"}),
+        ):
+            with self.subTest(name=name):
+                expected = client.get(reverse(name), params)
+                cache.clear()
+
+                with override_settings(ROOT_URLCONF="aarons_kit.async_urls"):
+                    url = reverse(name)
+                    self.assertTrue(asyncio.iscoroutinefunction(resolve(url).func))
+                    response = async_to_sync(self.async_client.get)(url, params)
+
+                self.assertEqual(response.status_code, expected.status_code)
+                self.assertEqual(response.content, expected.content)
+
+    def test_asgi_application(self):
+        messages = []
+
+        async def receive():
+            return {"type": "http.request", "body": b""}
+
+        async def send(message):
+            messages.append(message)
+
+        async_to_sync(application.__call__)(
+            {
+                "type": "http",
+                "method": "GET",
+                "path": reverse("get_available_journals"),
+                "query_string": b"",
+                "headers": [(b"host", b"testserver")],
+            },
+            receive,
+            send,
+        )
+
+        self.assertEqual(messages[0]["status"], status.HTTP_200_OK)
+        body = b"".join(message.get("body", b"") for message in messages[1:])
+        self.assertEqual(
+            [journal["issn"] for journal in json.loads(body)["results"]],
+            list(Journal.objects.order_by("journalID").values_list("issn", flat=True)),
+        )
+
+
+@override_settings(DATABASE_REPLICAS=["replica"], DATABASE_REPLICA_LAG_SECONDS=0)
+class TestReplicas(TransactionTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # a second connection to the test database stands in for a replica
+        connections.settings["replica"] = {
+            **connections.settings["default"],
+            "TEST": {"MIRROR": "default"},
+        }
+
+    @classmethod
+    def tearDownClass(cls):
+        connections["replica"].close()
+        del connections["replica"]
+        del connections.settings["replica"]
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        _unavailable.clear()
+        call_command("loaddata", "fixtures/test_fixtures", verbosity=0)
+
+    def get(self, url, client=None):
+        with CaptureQueriesContext(connection) as primary:
+            with CaptureQueriesContext(connections["replica"]) as replica:
+                response = (client or Client()).get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(primary), len(replica)
+
+    def test_reads_from_replica(self):
+        primary, replica = self.get(reverse("get_available_articles"))
+
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+    @override_settings(DATABASE_REPLICA_LAG_SECONDS=60)
+    def test_writes_stick_to_primary(self):
+        writer = Client()
+        with open("fixtures/test_metadata_small.json") as f:
+            response = writer.post(
+                reverse("store_metadata"), data={"metadata": f.read()}
+            )
 
-        self.assertEqual(response.data["articleID"], article.articleID)
-        self.assertEqual(response.data["issue"], article.issue.issueID)
-        self.assertEqual(response.data["articleJstorID"], article.articleJstorID)
-        self.assertEqual(response.data["title"], article.title)
-        self.assertEqual(response.data["abstract"], article.abstract)
-        self.assertEqual(response.data["url"], article.url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(STICKY_COOKIE, response.cookies)
+
+        # once the catalogue settles only the writer still reads the primary
+        cache.set(CATALOGUE_MODIFIED_KEY, 0, None)
+
+        primary, replica = self.get(reverse("get_available_articles"), client=writer)
+
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+        primary, replica = self.get(reverse("get_available_journals"))
+
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+    def test_replica_safe_post(self):
+        with CaptureQueriesContext(connection) as primary:
+            with CaptureQueriesContext(connections["replica"]) as replica:
+                response = Client().post(
+                    reverse("find_missing_metadata"),
+                    data={"articleJstorIDs": ["1", "9"]},
+                    content_type="application/json",
+                )
+
+        self.assertEqual(response.data, {"articleJstorIDs": ["9"]})
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+        self.assertEqual(len(primary), 0)
+        self.assertGreater(len(replica), 0)
+
+    @override_settings(DATABASE_REPLICA_LAG_SECONDS=60)
+    def test_catalogue_change_reads_from_primary(self):
+        bump_catalogue_version()
+
+        primary, replica = self.get(reverse("get_available_journals"))
+
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+    def test_unavailable_replica_falls_back_to_primary(self):
+        connections["replica"].close()
+
+        with mock.patch.dict(connections["replica"].settings_dict, {"PORT": 1}):
+            with CaptureQueriesContext(connection) as primary:
+                response = Client().get(reverse("get_available_journals"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertGreater(len(primary), 0)
+        self.assertIn("replica", _unavailable)
+
+
+class TestJournalCatalogue(TestCase):
+    def setUp(self):
+        cache.clear()
+
+        with open("fixtures/test_metadata_small.json") as f:
+            metadata = json.load(f)
+        ingest_metadata(metadata)
+
+    def test_sparse_fields(self):
+        response = client.get(
+            "%s?fields=journalName,articleCount" % reverse("get_journal_catalogue")
+        )
+
+        self.assertEqual(
+            response.data["results"],
+            [
+                {
+                    "journalName": "14th Century English Mystics Newsletter",
+                    "articleCount": 2,
+                }
+            ],
+        )
+
+    def test_get_journal_catalogue(self):
+        ingest_metadata(
+            [
+                {
+                    "issn": "07375840",
+                    "journal": "14th Century English Mystics Newsletter",
+                    "number": "1",
+                    "title": "Julian of Norwich",
+                    "volume": "12",
+                    "year": "1986",
+                    "articleJstorID": "3",
+                    "issueJstorID": "2",
+                    "authors": "blah 2 and blah 3",
+                }
+            ]
+        )
+
+        with self.assertNumQueries(1):
+            response = client.get(reverse("get_journal_catalogue"))
+
+        self.assertEqual(
+            response.data["results"][0],
+            {
+                "journalID": Journal.objects.get(issn="07375840").journalID,
+                "issn": "07375840",
+                "altISSN": "",
+                "journalName": "14th Century English Mystics Newsletter",
+                "articleCount": 3,
+                "issueCount": 2,
+                "authorCount": 3,
+                "firstYear": 1983,
+                "lastYear": 1986,
+            },
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_resent_records_are_not_recounted(self):
+        with open("fixtures/test_metadata_small.json") as f:
+            metadata = json.load(f)
+
+        with CaptureQueriesContext(connection) as queries:
+            ingest_metadata(metadata)
+
+        self.assertFalse(
+            [q for q in queries.captured_queries if "journalstatistics" in q["sql"]]
+        )
+
+    def test_recount_every_journal(self):
+        ingest_metadata(generate_corpus(20, journals=5, issues=10))
+        expected = list(JournalStatistics.objects.order_by("pk").values())
+        JournalStatistics.objects.all().delete()
+
+        with CaptureQueriesContext(connection) as queries:
+            update_all_journal_statistics(chunk_size=2)
+
+        self.assertEqual(
+            list(JournalStatistics.objects.order_by("pk").values()), expected
+        )
+        # each chunk in its own transaction
+        self.assertEqual(
+            len([q for q in queries.captured_queries if "SAVEPOINT" in q["sql"]]),
+            2 * ((Journal.objects.count() + 1) // 2),
+        )
+
+    def test_journal_without_statistics(self):
+        Journal.objects.create(issn="123", altISSN="", journalName="Empty")
+
+        response = client.get(reverse("get_journal_catalogue"))
+
+        self.assertEqual(response.data["results"][1]["articleCount"], None)
+
+
+class TestConcurrentIngest(TransactionTestCase):
+    def test_overlapping_ingests_of_a_journal(self):
+        records = list(generate_corpus(40, journals=1, issues=4))
+        ingest_metadata(records[:20])
+        ingested = threading.Event()
+        release = threading.Event()
+
+        def ingest(batch, hold=False):
+            try:
+                with transaction.atomic():
+                    ingest_metadata(batch)
+                    if hold:
+                        ingested.set()
+                        release.wait(10)
+            finally:
+                connection.close()
+
+        first = threading.Thread(target=ingest, args=(records[20:], True))
+        # re-sends stored records, so it inserts nothing and doesn't wait for
+        # the first ingest before counting the journal
+        second = threading.Thread(target=ingest, args=(records[:20],))
+        first.start()
+        try:
+            self.assertTrue(ingested.wait(10))
+            second.start()
+            time.sleep(0.5)
+        finally:
+            release.set()
+            first.join()
+        second.join()
+
+        statistics = JournalStatistics.objects.get()
+        self.assertEqual(statistics.articleCount, 40)
+        self.assertEqual(statistics.issueCount, 4)
+        self.assertEqual(
+            statistics.authorCount,
+            Author.objects.filter(article__isnull=False).distinct().count(),
+        )
 
 
 class TestMetadata(TestCase):
+    def setUp(self):
+        cache.clear()
+
     def test_upload_metadata(self):
         headers = {"Content-Type": "application/json", "Accept": "application/json"}
 
@@ -88,3 +2070,133 @@ class TestMetadata(TestCase):
         self.assertEqual(len(author_2.article_set.all()), 1)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_ingest_query_count_is_constant(self):
+        def make_records(start, count):
+            return [
+                {
+                    "issn": "issn-%d-%d" % (start, i % 3),
+                    "journal": "Journal %d-%d" % (start, i % 3),
+                    "number": "1",
+                    "volume": "1",
+                    "year": "2000",
+                    "title": "Article %d" % i,
+                    "articleJstorID": "article-%d" % i,
+                    "issueJstorID": "issue-%d-%d" % (start, i % 5),
+                    "authors": "author %d and author %d" % (i, i + 1),
+                }
+                for i in range(start, start + count)
+            ]
+
+        with CaptureQueriesContext(connection) as small_batch:
+            ingest_metadata(make_records(0, 10))
+
+        with CaptureQueriesContext(connection) as large_batch:
+            ingest_metadata(make_records(10, 500))
+
+        self.assertEqual(len(small_batch), len(large_batch))
+        self.assertEqual(Article.objects.count(), 510)
+        self.assertEqual(Issue.objects.count(), 10)
+        self.assertEqual(Journal.objects.count(), 6)
+        self.assertEqual(Author.objects.count(), 511)
+
+    def test_ingest_is_idempotent(self):
+        with open("fixtures/test_metadata_small.json") as f:
+            metadata = json.load(f)
+
+        ingest_metadata(metadata)
+        counts = ingest_metadata(metadata)
+
+        self.assertEqual(
+            counts,
+            {"records": 2, "journals": 0, "issues": 0, "articles": 0, "authors": 0},
+        )
+        self.assertEqual(Journal.objects.count(), 1)
+        self.assertEqual(Issue.objects.count(), 1)
+        self.assertEqual(Article.objects.count(), 2)
+        self.assertEqual(Article.authors.through.objects.count(), 3)
+
+    def test_natural_keys_are_unique(self):
+        Journal.objects.create(issn="07375840", altISSN="", journalName="A")
+
+        with self.assertRaises(IntegrityError):
+            Journal.objects.create(issn="07375840", altISSN="", journalName="B")
+
+    def test_stream_metadata(self):
+        with open("fixtures/test_metadata_small.json") as f:
+            metadata = json.load(f)
+
+        lines = [
+            json.dumps(metadata[0]),
+            "{not json",
+            json.dumps({"title": "No identifiers"}),
+            json.dumps(metadata[1]),
+        ]
+
+        response = client.post(
+            "%s?batch_size=1" % reverse("stream_metadata"),
+            data="\n".join(lines),
+            content_type="application/x-ndjson",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["batches"]), 2)
+        self.assertEqual(response.data["batches"][0]["articles"], 1)
+        self.assertEqual(response.data["batches"][1]["authors"], 1)
+        self.assertEqual(
+            [rejected["line"] for rejected in response.data["rejected"]], [2, 3]
+        )
+
+        self.assertEqual(Article.objects.count(), 2)
+        self.assertEqual(
+            len(Author.objects.get(authorName="blah").article_set.all()), 2
+        )
+
+    def test_upload_metadata_rejects_invalid_records(self):
+        with open("fixtures/test_metadata_small.json") as f:
+            metadata = json.load(f)
+
+        response = client.post(
+            reverse("store_metadata"),
+            data={
+                "metadata": json.dumps(
+                    [metadata[0], {"title": "No identifiers"}, metadata[1]]
+                )
+            },
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [rejected["line"] for rejected in response.data["rejected"]], [2]
+        )
+        self.assertEqual(Article.objects.count(), 2)
+
+    @override_settings(
+        CELERY_TASK_ALWAYS_EAGER=True, CELERY_TASK_STORE_EAGER_RESULT=True
+    )
+    def test_upload_metadata_async(self):
+        with open("fixtures/test_metadata_small.json") as f:
+            metadata = json.load(f)
+
+        response = client.post(
+            "%s?async=true" % reverse("store_metadata"),
+            data={
+                "metadata": json.dumps(
+                    metadata + [metadata[0], {"title": "No identifiers"}]
+                )
+            },
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+        job_response = client.get(
+            reverse("get_ingest_job", kwargs={"job_id": response.data["job"]})
+        )
+
+        self.assertEqual(job_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(job_response.data["status"], "SUCCESS")
+        self.assertEqual(job_response.data["result"]["processed"], 4)
+        self.assertEqual(job_response.data["result"]["created"], 2)
+        self.assertEqual(job_response.data["result"]["skipped"], 1)
+        self.assertEqual(len(job_response.data["result"]["rejected"]), 1)
+        self.assertEqual(Article.objects.count(), 2)
@@ -1,18 +1,40 @@
 from django.urls import re_path
 from aarons_kit_api import views
 
+UUID_PATTERN = "[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}"
+
 urlpatterns = [
     re_path(
         r"^api/articles/metadata$",
         views.store_metadata,
         name="store_metadata",
     ),
+    re_path(
+        r"^api/articles/metadata/stream$",
+        views.stream_metadata,
+        name="stream_metadata",
+    ),
+    re_path(
+        r"^api/articles/metadata/jobs/(?P<job_id>[0-9a-f-]+)$",
+        views.get_ingest_job,
+        name="get_ingest_job",
+    ),
     re_path(
         r"^api/articles$", views.get_available_articles, name="get_available_articles"
     ),
+    re_path(
+        r"^api/articles/export\.(?P<export_format>json|ndjson)$",
+        views.export_articles,
+        name="export_articles",
+    ),
     re_path(
         r"^api/articles/title$", views.get_article_by_title, name="get_article_by_title"
     ),
+    re_path(
+        r"^api/articles/search$",
+        views.search_articles,
+        name="search_articles",
+    ),
     re_path(
         r"^api/articles/year$",
         views.get_articles_by_year_range,
@@ -23,6 +45,11 @@ urlpatterns = [
         views.check_article_by_title,
         name="check_article_by_title",
     ),
+    re_path(
+        r"^api/articles/missing$",
+        views.find_missing_metadata,
+        name="find_missing_metadata",
+    ),
     re_path(
         r"^api/articles/author$",
         views.get_articles_by_author,
@@ -33,6 +60,21 @@ urlpatterns = [
         views.get_articles_from_journal,
         name="get_articles_from_journal",
     ),
+    re_path(
+        r"^api/articles/(?P<article_id>[0-9]+)/references$",
+        views.get_article_references,
+        name="get_article_references",
+    ),
+    re_path(
+        r"^api/articles/(?P<article_id>[0-9]+)/cited_by$",
+        views.get_article_cited_by,
+        name="get_article_cited_by",
+    ),
+    re_path(
+        r"^api/articles/(?P<article_id>[0-9]+)/pdf$",
+        views.article_pdf,
+        name="article_pdf",
+    ),
     re_path(
         r"^api/author/check$",
         views.check_article_by_author,
@@ -43,9 +85,29 @@ urlpatterns = [
         views.get_available_journals,
         name="get_available_journals",
     ),
+    re_path(
+        r"^api/journals/catalogue$",
+        views.get_journal_catalogue,
+        name="get_journal_catalogue",
+    ),
     re_path(
         r"^api/journals/check$",
         views.check_article_by_journal_name,
         name="check_article_by_journal_name",
     ),
+    re_path(
+        r"^api/scrape/claim$", views.claim_scrape_issues, name="claim_scrape_issues"
+    ),
+    re_path(
+        r"^api/scrape/leases/(?P<lease>%s)/renew$" % UUID_PATTERN,
+        views.renew_scrape_lease,
+        name="renew_scrape_lease",
+    ),
+    re_path(
+        r"^api/scrape/leases/(?P<lease>%s)/complete$" % UUID_PATTERN,
+        views.complete_scrape_lease,
+        name="complete_scrape_lease",
+    ),
+    re_path(r"^api/changes$", views.get_changes, name="get_changes"),
+    re_path(r"^metrics$", views.get_metrics, name="get_metrics"),
 ]
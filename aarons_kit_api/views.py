@@ -1,9 +1,24 @@
 # Create your views here.
+from celery.result import AsyncResult
+from django.conf import settings
+from django.contrib.auth import authenticate
 from django.core import serializers
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.shortcuts import get_object_or_404
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_http_methods
 
 from rest_framework import status
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.decorators import api_view
+import base64
 import json
 
 from aarons_kit_api.models import (
@@ -12,12 +27,32 @@ from aarons_kit_api.models import (
     Article,
     Author,
 )
+from aarons_kit_api.authors import author_name_key
+from aarons_kit_api.cache import cache_response, get_citations_version
+from aarons_kit_api.changes import changes_since, get_changes_version
+from aarons_kit_api.export import iter_articles, render_json, render_ndjson
+from aarons_kit_api.filters import filter_articles
+from aarons_kit_api.ingest import ingest_lines, ingest_records
+from aarons_kit_api.membership import NATURAL_KEYS, find_missing
+from aarons_kit_api.metrics import render_metrics
+from aarons_kit_api.pdfs import PDFUploadError, pdf_name, pdf_path, store_pdf
+from aarons_kit_api.pagination import (
+    ArticleCursorPagination,
+    JournalCursorPagination,
+    SearchPagination,
+    paginate,
+)
+from aarons_kit_api.replicas import replica_safe
+from aarons_kit_api.scraping import claim_issues, complete_lease, renew_lease
+from aarons_kit_api.search import ranked_articles
 from aarons_kit_api.serializers import (
     JournalSerializer,
+    JournalCatalogueSerializer,
     IssueSerializer,
     ArticleSerializer,
     AuthorSerializer,
 )
+from aarons_kit_api.tasks import ingest_metadata_task
 
 ##### articles #####
 
@@ -26,132 +61,491 @@ from aarons_kit_api.serializers import (
 def store_metadata(request):
     articles_metadata = json.loads(request.data["metadata"])
 
-    for metadata in articles_metadata:
-        # store journal
-        journal_result = Journal.objects.get_or_create(
-            issn=metadata["issn"],
-            defaults={
-                "journalName": metadata["journal"],
-                "altISSN": metadata.get("altISSN", ""),
-            },
-        )
-        # store issue
-        issue_result = Issue.objects.get_or_create(
-            issueJstorID=metadata["issueJstorID"],
-            defaults={
-                "journal": journal_result[0],
-                "issueJstorID": metadata["issueJstorID"],
-                "volume": metadata["volume"],
-                "number": metadata["number"],
-                "year": metadata["year"],
-            },
-        )
-        # store article
-        article_result = Article.objects.get_or_create(
-            articleJstorID=metadata["articleJstorID"],
-            defaults={
-                "issue": issue_result[0],
-                "articleJstorID": metadata["articleJstorID"],
-                "title": metadata["title"],
-                "abstract": metadata.get("abstract", ""),
-                "url": metadata.get("url", ""),
-            },
-        )
-        # store author
-        if metadata.get("authors"):
-            names = metadata.get("authors").split("and")
-            for name in names:
-                author_result = Author.objects.get_or_create(authorName=name.strip())
-                article_result[0].authors.add(author_result[0])
+    if request.GET.get("async") == "true":
+        job = ingest_metadata_task.delay(articles_metadata)
+        return Response(
+            {"message": "Metadata queued for storage", "job": job.id},
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+    # validated like queued and streamed metadata, so all three accept the
+    # same records
+    batches, rejected = ingest_records(
+        enumerate(articles_metadata, start=1), settings.INGEST_BATCH_SIZE
+    )
+
+    return Response(
+        {
+            "message": "Metadata successfully stored",
+            "batches": batches,
+            "rejected": rejected,
+        },
+        status=status.HTTP_200_OK,
+    )
+
+
+@api_view(["POST"])
+def stream_metadata(request):
+    try:
+        batch_size = int(request.GET.get("batch_size", settings.INGEST_BATCH_SIZE))
+    except ValueError:
+        return Response(
+            {"message": "batch_size must be an integer"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    batch_size = max(1, min(batch_size, settings.INGEST_MAX_BATCH_SIZE))
+
+    # read the NDJSON body line by line instead of parsing it all up front
+    batches, rejected = ingest_lines(request._request, batch_size)
 
     return Response(
-        {"message": "Metadata successfully stored"}, status=status.HTTP_200_OK
+        {
+            "message": "Metadata successfully stored",
+            "batches": batches,
+            "rejected": rejected,
+        },
+        status=status.HTTP_200_OK,
     )
 
 
+@cache_response
 @api_view(["GET"])
 def get_available_articles(request):
-    articles = Article.objects.all()
+    articles = filter_articles(Article.objects.all(), request.GET)
 
-    # Pagination?
     if request.method == "GET":
-        articles_serializer = ArticleSerializer(articles, many=True)
-        return Response(articles_serializer.data)
+        return paginate(request, articles, ArticleSerializer, ArticleCursorPagination)
+
 
+# a plain Django view, as DRF would buffer the response and reject the
+# application/x-ndjson Accept header during content negotiation
+@require_GET
+def export_articles(request, export_format):
+    articles = iter_articles(settings.EXPORT_CHUNK_SIZE)
 
+    if export_format == "ndjson":
+        return StreamingHttpResponse(
+            render_ndjson(articles), content_type="application/x-ndjson"
+        )
+
+    return StreamingHttpResponse(render_json(articles), content_type="application/json")
+
+
+@cache_response
 @api_view(["GET"])
 def get_article_by_title(request):
     title = request.GET.get("title")
 
-    article = Article.objects.get(title=title)
-    # article.get_related_data()
+    fields = ArticleSerializer.get_requested_fields(request)
+    article = (
+        ArticleSerializer.setup_eager_loading(
+            Article.objects.filter(title=title), fields
+        )
+        .order_by("articleID")
+        .first()
+    )
+    if article is None:
+        raise Http404
 
     if request.method == "GET":
-        article_serializer = ArticleSerializer(article, many=False)
+        article_serializer = ArticleSerializer(article, many=False, fields=fields)
         return Response(article_serializer.data)
 
 
+@cache_response
+@api_view(["GET"])
+def search_articles(request):
+    text = request.GET.get("q", "").strip()
+    if not text:
+        return Response(
+            {"message": "q is required"}, status=status.HTTP_400_BAD_REQUEST
+        )
+
+    articles = ranked_articles(text)
+
+    if request.method == "GET":
+        return paginate(request, articles, ArticleSerializer, SearchPagination)
+
+
+@cache_response
 @api_view(["GET"])
 def get_articles_by_year_range(request):
-    articles = Article.objects.all()
+    articles = filter_articles(Article.objects.all(), request.GET)
 
     if request.method == "GET":
-        articles_serializer = ArticleSerializer(articles, many=True)
-        return Response(articles_serializer.data)
+        return paginate(request, articles, ArticleSerializer, ArticleCursorPagination)
 
 
+@cache_response
 @api_view(["GET"])
 def check_article_by_title(request):
-    articles = Article.objects.all()
+    title = request.GET.get("title", "")
+    if not title:
+        return Response(
+            {"message": "title is required"}, status=status.HTTP_400_BAD_REQUEST
+        )
 
     if request.method == "GET":
-        articles_serializer = ArticleSerializer(articles, many=True)
-        return Response(articles_serializer.data)
+        return Response(
+            {"title": title, "exists": Article.objects.filter(title=title).exists()}
+        )
 
 
+@replica_safe
+@api_view(["POST"])
+def find_missing_metadata(request):
+    keys = {name: request.data[name] for name in NATURAL_KEYS if name in request.data}
+    for name, values in keys.items():
+        if not isinstance(values, list) or not all(
+            isinstance(value, str) for value in values
+        ):
+            return Response(
+                {"message": "%s must be a list of strings" % name},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(values) > settings.MEMBERSHIP_CHECK_MAX_KEYS:
+            return Response(
+                {
+                    "message": "%s can have at most %d values"
+                    % (name, settings.MEMBERSHIP_CHECK_MAX_KEYS)
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+    missing = {}
+    for name, values in keys.items():
+        model, field_name = NATURAL_KEYS[name]
+        missing[name] = find_missing(model, field_name, values)
+
+    return Response(missing)
+
+
+@cache_response
 @api_view(["GET"])
 def get_articles_by_author(request):
-    articles = Article.objects.all()
+    name = request.GET.get("author", "")
+    if not name.strip():
+        return Response(
+            {"message": "author is required"}, status=status.HTTP_400_BAD_REQUEST
+        )
+
+    # joins on the unique name_key index rather than scanning author names
+    articles = filter_articles(
+        Article.objects.filter(authors__name_key=author_name_key(name)), request.GET
+    )
 
     if request.method == "GET":
-        articles_serializer = ArticleSerializer(articles, many=True)
-        return Response(articles_serializer.data)
+        return paginate(request, articles, ArticleSerializer, ArticleCursorPagination)
 
 
+@cache_response
 @api_view(["GET"])
 def get_articles_from_journal(request):
-    articles = Article.objects.all()
+    articles = filter_articles(Article.objects.all(), request.GET)
 
     if request.method == "GET":
-        articles_serializer = ArticleSerializer(articles, many=True)
-        return Response(articles_serializer.data)
+        return paginate(request, articles, ArticleSerializer, ArticleCursorPagination)
 
 
+@cache_response
 @api_view(["GET"])
 def check_article_by_author(request):
-    articles = Article.objects.all()
+    name = request.GET.get("author", "")
+    if not name.strip():
+        return Response(
+            {"message": "author is required"}, status=status.HTTP_400_BAD_REQUEST
+        )
+
+    author = Author.objects.filter(name_key=author_name_key(name)).first()
+    if author is None:
+        raise Http404
+
+    if request.method == "GET":
+        author_serializer = AuthorSerializer(author, many=False)
+        return Response(author_serializer.data)
+
+
+@cache_response(get_version=get_citations_version)
+@api_view(["GET"])
+def get_article_references(request, article_id):
+    if not Article.objects.filter(pk=article_id).exists():
+        raise Http404
+
+    # the citing, cited index yields the cited articles in articleID order
+    articles = Article.objects.filter(cited_by__citing=article_id)
 
     if request.method == "GET":
-        articles_serializer = ArticleSerializer(articles, many=True)
-        return Response(articles_serializer.data)
+        return paginate(request, articles, ArticleSerializer, ArticleCursorPagination)
+
+
+@cache_response(get_version=get_citations_version)
+@api_view(["GET"])
+def get_article_cited_by(request, article_id):
+    if not Article.objects.filter(pk=article_id).exists():
+        raise Http404
+
+    # the cited, citing index yields the citing articles in articleID order
+    articles = Article.objects.filter(references__cited=article_id)
+
+    if request.method == "GET":
+        return paginate(request, articles, ArticleSerializer, ArticleCursorPagination)
+
+
+def basic_auth_user(request):
+    """
+    Returns the active user whose username and password the request sent with
+    HTTP Basic authentication, or None.
+    """
+    scheme, _, credentials = request.META.get("HTTP_AUTHORIZATION", "").partition(" ")
+    if scheme.lower() != "basic":
+        return None
+    try:
+        credentials = base64.b64decode(credentials, validate=True).decode()
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+    username, _, password = credentials.partition(":")
+    return authenticate(request, username=username, password=password)
+
+
+# a plain Django view, so downloads aren't subject to DRF's content
+# negotiation and uploads are read from the request stream as they arrive.
+# Uploads authenticate with HTTP Basic rather than the session cookie, so
+# they're exempt from CSRF checks
+@csrf_exempt
+@require_http_methods(["GET", "PUT"])
+def article_pdf(request, article_id):
+    article = get_object_or_404(Article.objects.only("pdf"), pk=article_id)
+
+    if request.method == "PUT":
+        user = basic_auth_user(request)
+        if user is None:
+            response = JsonResponse(
+                {"message": "Uploading PDFs requires a username and password"},
+                status=401,
+            )
+            response["WWW-Authenticate"] = 'Basic realm="api"'
+            return response
+        if not user.has_perm("aarons_kit_api.change_article"):
+            return JsonResponse({"message": "You may not change articles"}, status=403)
+
+        try:
+            content_length = int(request.META.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            return JsonResponse({"message": "Invalid Content-Length"}, status=400)
+        if content_length > settings.PDF_MAX_UPLOAD_SIZE:
+            return JsonResponse(
+                {
+                    "message": "PDFs can be at most %d bytes"
+                    % settings.PDF_MAX_UPLOAD_SIZE
+                },
+                status=413,
+            )
+
+        try:
+            pdf = store_pdf(request)
+        except PDFUploadError as error:
+            return JsonResponse({"message": str(error)}, status=error.status)
+
+        # the PDF it replaces is left to manage.py delete_unused_pdfs
+        Article.objects.filter(pk=article_id).update(pdf=pdf)
+        return JsonResponse(
+            {
+                "message": "PDF successfully stored",
+                "sha256": pdf.sha256,
+                "size": pdf.size,
+            }
+        )
+
+    if article.pdf_id is None:
+        raise Http404
+
+    filename = "%s.pdf" % article_id
+    if not settings.PDF_ACCEL_REDIRECT:
+        return FileResponse(
+            open(pdf_path(article.pdf_id), "rb"),
+            content_type="application/pdf",
+            filename=filename,
+        )
+
+    # nginx sends the file, with range requests and its own caching headers
+    response = HttpResponse(content_type="application/pdf")
+    response["X-Accel-Redirect"] = settings.PDF_ACCEL_REDIRECT_URL + pdf_name(
+        article.pdf_id
+    )
+    response["Content-Disposition"] = 'inline; filename="%s"' % filename
+    return response
+
+
+@api_view(["GET"])
+def get_ingest_job(request, job_id):
+    job = AsyncResult(job_id)
+
+    data = {"job": job.id, "status": job.state}
+    if job.state == "PROGRESS":
+        data["progress"] = job.info
+    elif job.state == "SUCCESS":
+        data["result"] = job.result
+    elif job.state == "FAILURE":
+        data["error"] = str(job.result)
+
+    return Response(data)
 
 
 ##### journals #####
 
 
+@cache_response
 @api_view(["GET"])
 def get_available_journals(request):
     journals = Journal.objects.all()
 
     if request.method == "GET":
-        journals_serializer = ArticleSerializer(journals, many=True)
-        return Response(journals_serializer.data)
+        return paginate(request, journals, JournalSerializer, JournalCursorPagination)
 
 
+@cache_response
 @api_view(["GET"])
-def check_article_by_journal_name(request):
+def get_journal_catalogue(request):
     journals = Journal.objects.all()
 
     if request.method == "GET":
-        journals_serializer = ArticleSerializer(journals, many=True)
-        return Response(journals_serializer.data)
+        return paginate(
+            request, journals, JournalCatalogueSerializer, JournalCursorPagination
+        )
+
+
+@cache_response
+@api_view(["GET"])
+def check_article_by_journal_name(request):
+    name = request.GET.get("journal", "")
+    if not name:
+        return Response(
+            {"message": "journal is required"}, status=status.HTTP_400_BAD_REQUEST
+        )
+
+    if request.method == "GET":
+        return Response(
+            {
+                "journal": name,
+                "exists": Journal.objects.filter(journalName=name).exists(),
+            }
+        )
+
+
+##### scraping #####
+
+
+def lease_seconds(data):
+    seconds = int(data.get("lease_seconds", settings.SCRAPE_LEASE_SECONDS))
+    return max(1, min(seconds, settings.SCRAPE_MAX_LEASE_SECONDS))
+
+
+@api_view(["POST"])
+def claim_scrape_issues(request):
+    owner = str(request.data.get("owner", "")).strip()
+    if not owner:
+        return Response(
+            {"message": "owner is required"}, status=status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        count = int(request.data.get("count", settings.SCRAPE_CLAIM_SIZE))
+        seconds = lease_seconds(request.data)
+        journal = request.data.get("journal")
+        journal = None if journal is None else int(journal)
+    except (TypeError, ValueError):
+        return Response(
+            {"message": "count, lease_seconds and journal must be integers"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    count = max(1, min(count, settings.SCRAPE_MAX_CLAIM_SIZE))
+
+    lease, expires, issue_ids = claim_issues(owner[:200], count, seconds, journal)
+    issues = Issue.objects.filter(pk__in=issue_ids).order_by("issueID")
+
+    return Response(
+        {
+            "lease": lease,
+            "expires": expires,
+            "issues": IssueSerializer(issues, many=True).data,
+        }
+    )
+
+
+@api_view(["POST"])
+def renew_scrape_lease(request, lease):
+    try:
+        seconds = lease_seconds(request.data)
+    except (TypeError, ValueError):
+        return Response(
+            {"message": "lease_seconds must be an integer"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    expires, renewed = renew_lease(lease, seconds)
+    if not renewed:
+        return Response(
+            {"message": "The lease ran out and its issues were claimed again"},
+            status=status.HTTP_409_CONFLICT,
+        )
+
+    return Response({"lease": lease, "expires": expires, "issues": renewed})
+
+
+@api_view(["POST"])
+def complete_scrape_lease(request, lease):
+    issue_ids = request.data.get("issues")
+    if issue_ids is not None:
+        try:
+            issue_ids = [int(issue_id) for issue_id in issue_ids]
+        except (TypeError, ValueError):
+            return Response(
+                {"message": "issues must be a list of issue IDs"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+    completed = complete_lease(lease, issue_ids)
+    if not completed:
+        return Response(
+            {"message": "The lease holds none of these issues"},
+            status=status.HTTP_409_CONFLICT,
+        )
+
+    return Response({"lease": lease, "completed": completed})
+
+
+##### changes #####
+
+
+@cache_response(get_version=get_changes_version)
+@api_view(["GET"])
+def get_changes(request):
+    try:
+        since = int(request.GET.get("since", 0))
+        page_size = int(request.GET.get("page_size", settings.CHANGES_PAGE_SIZE))
+    except ValueError:
+        return Response(
+            {"message": "since and page_size must be integers"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    page_size = max(1, min(page_size, settings.CHANGES_MAX_PAGE_SIZE))
+
+    changes, seq, more = changes_since(since, page_size)
+
+    # clients keep the last seq and pass it as since on their next sync
+    next_url = None
+    if more:
+        next_url = replace_query_param(request.build_absolute_uri(), "since", seq)
+
+    return Response({"next": next_url, "seq": seq, "results": changes})
+
+
+##### metrics #####
+
+
+# a plain Django view, Prometheus expects its own text format
+@require_GET
+def get_metrics(request):
+    content, content_type = render_metrics()
+    return HttpResponse(content, content_type=content_type)